@@ -0,0 +1,94 @@
+"""
+LED Matrix Controller - Built-in Asset Data
+
+The characters and icons compiled in by buildscripts/build.py, for devices
+without an asset pack. assets.load_assets() only imports this module when
+there is no pack to read, so it never takes up memory otherwise.
+"""
+
+# --------------------------------------------------------------------------------
+# Icon Definitions
+# --------------------------------------------------------------------------------
+# BEGIN COMPRESSED ICON DATA
+ICONS_RAW = [
+    {
+        'animations': [['steam', 1200, 200, 'FF28142800000000000442434445044A4B4C4DFF2850280000000000044142434404494A4B4C', [3], True]],
+        'body_color': (40, 26, 13),
+        'id': 'coffee',
+        'image': '5555555555556AA56FE96FE96FE55A95',
+        'name': 'Coffee Break',
+        'palette': ['body', (255, 255, 255), (101, 67, 33)]
+    }
+]
+# END COMPRESSED ICON DATA
+    
+# --------------------------------------------------------------------------------
+# Character Definitions
+# --------------------------------------------------------------------------------
+# BEGIN COMPRESSED CHARACTER DATA
+CHARACTERS_RAW = [
+    {
+        'animations': [['blink', 3000, 50, 'FF0000000024240000026265026A6D', [2], False]],
+        'id': 'ghost_plain',
+        'image': '3C7EFFFFFFFFFFAA',
+        'name': 'Plain Ghost',
+        'palette': ['body', (255, 255, 255)]
+    },
+    {
+        'animations': [['blink_heart', 7000, 50, 'FF0000002424000000025A5D026265', [4], False]],
+        'id': 'heart',
+        'image': '00001428555AD55635540D5003400000',
+        'name': 'Heart',
+        'palette': ['body', 'hl', 'sdw', (255, 255, 255)]
+    },
+    {
+        'animations': [['blik_invader', 7000, 50, 'FF0000002400000000025A5D', [2], False]],
+        'id': 'invader',
+        'image': '423C7EFF7E422400',
+        'name': 'Space Invader',
+        'palette': ['body', (255, 255, 255)]
+    },
+    {
+        'animations': [['blik_invader', 7000, 50, 'FF006666187E7E420004494A4D4E0451525556', [2], False]],
+        'id': 'creeper',
+        'image': 'FFFFFFFFFFFFFFFF',
+        'name': 'Creeper',
+        'palette': ['body', (255, 255, 255)]
+    },
+    {
+        'animations': [['cat_walk', 1200, 300, 'FF000000000000AA00027377027377027175', [5], False]],
+        'id': 'cat',
+        'image': '0000001001010201011100010111313101113131012111110111331144444444',
+        'name': 'The Cat',
+        'palette': ['body', 'hl', 'sdw', (195, 126, 74), (0, 0, 0)]
+    },
+    {
+        'animations': [['cat_blink', 7000, 50, 'FF0000000050000000026163', [4], False]],
+        'id': 'cat2',
+        'image': '5555555565956A956A956A9E5AA65EEA',
+        'name': 'The Sitting Cat',
+        'palette': ['body', (20, 20, 20), (50, 50, 50), (255, 255, 0)]
+    },
+    {
+        'animations': [['squack', 11000, 500, 'FF60202020383E1800FF6020273E3C3E1800', [4], False]],
+        'id': 'goose',
+        'image': '5555A55555555555555555575D7D5695',
+        'name': 'The Goose',
+        'palette': ['body', (255, 127, 0), (140, 140, 140), (255, 255, 255)]
+    },
+    {
+        'animations': [['wag', 4000, 100, 'FF000040202000000002516002585A02516202516202585A025160', [5], True]],
+        'id': 'pika',
+        'image': '0310000300310001030123313231411432331223020111100211111000113310',
+        'name': 'Toothless',
+        'palette': ['body', 'hl', 'sdw', (255, 255, 255), (0, 0, 0)]
+    },
+    {
+        'animations': [['blink_doggo', 6000, 60, 'FF0000000000000000045A5B5C5D', [2], False]],
+        'id': 'smoking_doggo',
+        'image': '1111111123113311123321111245451112222241322222112222655722228111',
+        'name': 'Smoking Doggo',
+        'palette': ['body', (118, 82, 50), (190, 135, 85), (0, 0, 0), (246, 246, 246), (237, 121, 36), (223, 38, 44), (50, 35, 20)]
+    }
+]
+# END COMPRESSED CHARACTER DATA
@@ -0,0 +1,269 @@
+"""
+LED Matrix Controller - Assets
+
+The binary asset pack and the catalogs the states read characters from.
+The built-in character and icon data lives in assetdata.py.
+"""
+import struct
+import sys
+
+from config import *
+from display import CharacterDefinition, Character
+
+# --------------------------------------------------------------------------------
+# Asset Pack and Catalogs
+# --------------------------------------------------------------------------------
+class AssetPack:
+    """
+    Reader for the binary asset pack written by buildscripts/build.py.
+
+    Layout (little endian):
+      header   '<4sBBHHIIIH' magic, format, reserved, characters, icons,
+                             revision, index offset, lookup offset, largest record
+      index    '<16sIH'      id, record offset, record size - characters
+                             first, then icons, in authoring order
+      lookup   '<16sH'       id, index position - per kind, sorted by id
+      records  name, flags, optional body color, palette, a 1/2/4 bpp
+               palette-indexed image and animations with delta-encoded frames
+      streams  frames of streamed animations, fixed-size packed sprites
+
+    Only the header is read at boot. Index entries and records are read from
+    flash on demand, with readinto() into buffers allocated once.
+
+    Images and frame data used by more than one asset are stored once and
+    referenced by file offset. They're kept in self.shared once read, so every
+    character using them holds the same bytes.
+    """
+    MAGIC = b"DNDP"
+    FORMAT = 7
+    HEADER = '<4sBBHHIIIH'
+    HEADER_SIZE = 24
+    ENTRY = '<16sIH'
+    ENTRY_SIZE = 22
+    LOOKUP = '<16sH'
+    LOOKUP_SIZE = 18
+    ID_SIZE = 16
+    CHARACTER = 0
+    ICON = 1
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            header = f.read(self.HEADER_SIZE)
+        (magic, fmt, _, chars, icons, self.revision,
+         self.index_offset, self.lookup_offset, largest) = struct.unpack(self.HEADER, header)
+        if magic != self.MAGIC or fmt != self.FORMAT:
+            raise ValueError("Unsupported asset pack")
+        self.counts = (chars, icons)
+        self.entry = bytearray(self.ENTRY_SIZE)
+        self.lookup = bytearray(self.LOOKUP_SIZE)
+        self.record = bytearray(largest)
+        self.shared = {}  # File offset -> bytes of shared images and frame data
+
+    @classmethod
+    def load(cls, path):
+        """Open the pack at path, or return None if it's missing or invalid."""
+        try:
+            return cls(path)
+        except Exception as e:
+            print(f"No asset pack ({e}), using built-in assets")
+            return None
+
+    def _read_entry(self, f, kind, index):
+        f.seek(self.index_offset + (kind * self.counts[0] + index) * self.ENTRY_SIZE)
+        f.readinto(self.entry)
+        asset_id, offset, size = struct.unpack(self.ENTRY, self.entry)
+        return asset_id.rstrip(b'\0').decode(), offset, size
+
+    def id_at(self, kind, index):
+        with open(self.path, 'rb') as f:
+            return self._read_entry(f, kind, index)[0]
+
+    def index_of(self, kind, asset_id):
+        """Binary search the sorted lookup table: O(log n) small reads."""
+        key = asset_id.encode()
+        key += b'\0' * (self.ID_SIZE - len(key))
+        base = self.lookup_offset + kind * self.counts[0] * self.LOOKUP_SIZE
+        lo, hi = 0, self.counts[kind]
+        with open(self.path, 'rb') as f:
+            while lo < hi:
+                mid = (lo + hi) // 2
+                f.seek(base + mid * self.LOOKUP_SIZE)
+                f.readinto(self.lookup)
+                probe, index = struct.unpack(self.LOOKUP, self.lookup)
+                if probe == key:
+                    return index
+                if probe < key:
+                    lo = mid + 1
+                else:
+                    hi = mid
+        return None
+
+    def read(self, kind, index):
+        """Read one asset into the same dict shape as the built-in raw data."""
+        with open(self.path, 'rb') as f:
+            asset_id, offset, size = self._read_entry(f, kind, index)
+            f.seek(offset)
+            record = memoryview(self.record)[:size]
+            f.readinto(record)
+            return self._decode(asset_id, record, f, offset)
+
+    def _blob(self, f, rec, pos, offset, size, flags):
+        """Return (data, next pos) for the image or frame data at rec[pos], which is at file offset + pos."""
+        if flags & 0x80:
+            # Reference to a copy elsewhere in the pack
+            at = struct.unpack_from('<I', rec, pos)[0]
+            pos += 4
+        else:
+            at = offset + pos
+            pos += size
+            if not flags & 0x40:
+                return bytes(rec[pos - size:pos]), pos
+
+        blob = self.shared.get(at)
+        if blob is None:
+            if flags & 0x80:
+                f.seek(at)
+                blob = f.read(size)
+            else:
+                blob = bytes(rec[pos - size:pos])
+            self.shared[at] = blob
+        return blob, pos
+
+    def _decode(self, asset_id, rec, f, offset):
+        n = rec[0]
+        data = {'id': asset_id, 'name': bytes(rec[1:1 + n]).decode()}
+        flags = rec[1 + n]
+        pos = 2 + n
+
+        if flags & 0x08:
+            data['body_color'] = (rec[pos], rec[pos + 1], rec[pos + 2])
+            pos += 3
+
+        # Palette: the mode-relative roles flagged, then fixed colors
+        palette = [role for bit, role in ((0x01, 'body'), (0x02, 'hl'), (0x04, 'sdw')) if flags & bit]
+        count = rec[pos]
+        pos += 1
+        for p in range(pos, pos + 3 * count, 3):
+            palette.append((rec[p], rec[p + 1], rec[p + 2]))
+        pos += 3 * count
+        data['palette'] = palette
+
+        bpp = rec[pos]
+        data['image'], pos = self._blob(f, rec, pos + 1, offset, 8 * (bpp & 0x0F), bpp)
+        if bpp & 0xC0:
+            data['shared_image'] = True
+
+        count = rec[pos]
+        pos += 1
+        if count:
+            data['animations'] = []
+            for _ in range(count):
+                n = rec[pos]
+                name = bytes(rec[pos + 1:pos + 1 + n]).decode()
+                pos += 1 + n
+                interval, frame_duration, anim_flags, colors, size = struct.unpack_from('<IHBBH', rec, pos)
+                pos += 10
+                frame_colors = list(rec[pos:pos + colors])
+                pos += colors
+                if anim_flags & 0x02:
+                    # Streamed: frames stay on flash, read during playback
+                    stream_offset, count = struct.unpack_from('<II', rec, pos)
+                    frames = (self.path, stream_offset, count)
+                    pos += 8
+                else:
+                    frames, pos = self._blob(f, rec, pos, offset, size & 0x3FFF, size >> 8)
+                data['animations'].append([
+                    name, interval, frame_duration, frames, frame_colors, bool(anim_flags & 0x01)
+                ])
+        return data
+
+class Catalog:
+    """
+    Characters or icons by position, with a small LRU cache of decoded
+    Character objects so browsing back and forth doesn't decode again.
+    """
+    def __init__(self, cache_size=CHARACTER_CACHE_SIZE):
+        self.cache_size = cache_size
+        self.cache = []  # [(index, Character)], least recently used first
+
+    def character(self, index):
+        """Get a Character for the asset at index, decoding it on a cache miss."""
+        for i, (cached_index, character) in enumerate(self.cache):
+            if cached_index == index:
+                if i != len(self.cache) - 1:
+                    self.cache.append(self.cache.pop(i))
+                return character
+
+        character = Character(self.get(index))
+        self.cache.append((index, character))
+        if len(self.cache) > self.cache_size:
+            self.cache.pop(0)
+        return character
+
+    def prefetch(self, index):
+        """Decode the neighbours of index ahead of time, keeping index most recent."""
+        count = len(self)
+        for neighbour in ((index + 1) % count, (index - 1) % count):
+            self.character(neighbour)
+        self.character(index)
+
+    def clear_cache(self):
+        self.cache = []
+
+class PackCatalog(Catalog):
+    """Characters or icons stored in the asset pack, decoded one at a time."""
+    def __init__(self, pack, kind):
+        super().__init__()
+        self.pack = pack
+        self.kind = kind
+
+    def __len__(self):
+        return self.pack.counts[self.kind]
+
+    def get(self, index):
+        return CharacterDefinition.create_character(self.pack.read(self.kind, index))
+
+    def id_at(self, index):
+        return self.pack.id_at(self.kind, index)
+
+    def index_of(self, asset_id):
+        return self.pack.index_of(self.kind, asset_id)
+
+class RawCatalog(Catalog):
+    """Fallback catalog over the built-in raw definitions, decoded on demand."""
+    def __init__(self, raw):
+        super().__init__()
+        self.raw = raw
+        self.ids = {data['id']: index for index, data in enumerate(raw)}
+
+    def __len__(self):
+        return len(self.raw)
+
+    def get(self, index):
+        return CharacterDefinition.create_character(self.raw[index])
+
+    def id_at(self, index):
+        return self.raw[index]['id']
+
+    def index_of(self, asset_id):
+        return self.ids.get(asset_id)
+
+def load_assets():
+    """
+    (Re)load the asset pack into the CHARACTERS and ICONS catalogs.
+    Prefers the asset pack; the built-in data covers devices that don't have one yet.
+    """
+    global ASSET_PACK, CHARACTERS, ICONS
+    CharacterDefinition.shared = {}
+    ASSET_PACK = AssetPack.load(ASSET_PACK_FILE)
+    if ASSET_PACK:
+        CHARACTERS = PackCatalog(ASSET_PACK, AssetPack.CHARACTER)
+        ICONS = PackCatalog(ASSET_PACK, AssetPack.ICON)
+        sys.modules.pop('assetdata', None)  # Built-in data loaded before the pack arrived
+    else:
+        import assetdata
+        CHARACTERS = RawCatalog(assetdata.CHARACTERS_RAW)
+        ICONS = RawCatalog(assetdata.ICONS_RAW)
+
+load_assets()
@@ -0,0 +1,123 @@
+"""
+LED Matrix Controller - Bootstrap
+
+Moves a device from the single-file firmware (1.0.17 and older) to the module
+layout. Those devices update by downloading the "url" of firmware.json and
+installing it as main.py, so firmware.json points at this file, and this file
+needs nothing but the MicroPython firmware and wifi_config.py.
+
+At boot it downloads every file listed in manifest.json, checks their hashes,
+moves them into place (main.py last) and resets into the new firmware. If
+anything fails it stays main.py and tries again later, so the device always
+keeps a way to update.
+"""
+import network
+import machine
+import neopixel
+import urequests
+import time
+import os
+import gc
+import json
+import hashlib
+import binascii
+
+MANIFEST_URL = "https://raw.githubusercontent.com/underverket/dnd/main/manifest.json"
+LED_PIN = 0
+NUM_LEDS = 64
+WIFI_TIMEOUT_SECONDS = 20       # Seconds to wait for WiFi
+RETRY_DELAY = 300               # Seconds before trying again after a failure
+CHUNK_SIZE = 512                # Download buffer
+
+WORKING = (0, 0, 40)            # Dim blue while downloading
+FAILED = (40, 0, 0)             # Dim red while waiting to retry
+
+def show(color):
+    np = neopixel.NeoPixel(machine.Pin(LED_PIN), NUM_LEDS)
+    np.fill(color)
+    np.write()
+
+def connect():
+    from wifi_config import WIFI_SSID, WIFI_PASSWORD
+    wlan = network.WLAN(network.STA_IF)
+    wlan.active(True)
+    if not wlan.isconnected():
+        print(f"Connecting to WiFi: {WIFI_SSID}")
+        wlan.connect(WIFI_SSID, WIFI_PASSWORD)
+        start = time.time()
+        while not wlan.isconnected():
+            if time.time() - start > WIFI_TIMEOUT_SECONDS:
+                raise Exception("WiFi connection timed out")
+            time.sleep(0.5)
+
+def fetch_manifest():
+    response = urequests.get(MANIFEST_URL)
+    try:
+        if response.status_code != 200:
+            raise Exception(f"Manifest download failed: {response.status_code}")
+        return json.loads(response.text)
+    finally:
+        response.close()
+
+def download(url, path):
+    """Stream url to path; returns the file's sha256 hex digest."""
+    response = urequests.get(url, stream=True)
+    try:
+        if response.status_code != 200:
+            raise Exception(f"Download of {url} failed: {response.status_code}")
+        digest = hashlib.sha256()
+        with open(path, 'wb') as f:
+            while True:
+                chunk = response.raw.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                f.write(chunk)
+                digest.update(chunk)
+    finally:
+        response.close()
+    return binascii.hexlify(digest.digest()).decode()
+
+def migrate():
+    connect()
+    manifest = fetch_manifest()
+    files = manifest.get('files') or {}
+    if 'main.py' not in files:
+        raise Exception("Manifest lists no module firmware")
+
+    # Files sit next to the manifest's main.py; main.py goes last
+    base = manifest['url'].rsplit('/', 1)[0]
+    names = sorted(files, key=lambda name: name == 'main.py')
+    for name in names:
+        gc.collect()
+        print(f"Downloading {name}...")
+        digest = download(f"{base}/{name}", name + '.new')
+        if files[name] and digest != files[name]:
+            raise Exception(f"Hash mismatch for {name}")
+
+    # A reset part way through boots this file again, which starts over
+    for name in names:
+        try:
+            os.remove(name)
+        except OSError:
+            pass
+        os.rename(name + '.new', name)
+
+def main():
+    show(WORKING)
+    try:
+        migrate()
+        print("Module firmware installed, rebooting...")
+    except Exception as e:
+        print(f"Bootstrap failed: {e}")
+        show(FAILED)
+        time.sleep(RETRY_DELAY)
+
+    # Radio off first, or CYW43 can get stuck across the reset
+    try:
+        network.WLAN(network.STA_IF).active(False)
+    except Exception:
+        pass
+    time.sleep(1)
+    machine.reset()
+
+main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Render Benchmark
+
+Times the render and power limiting kernels (kernels.py) in their Python and
+viper versions, and a full SOCIAL mode frame (rainbow, so never served from the
+prerender cache) against the FRAME_TIME budget. Frames go through the power
+budget but not out to the LEDs. On a device it also times how long a write()
+blocks with the neopixel and the PIO/DMA output drivers.
+
+Usage:
+    mpremote run bench_render.py    On a device with the firmware installed
+    python3 bench_render.py         On a computer (Python kernels only)
+"""
+import sys
+
+if sys.implementation.name != 'micropython':
+    import os
+    os.chdir(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+    sys.path.insert(0, os.getcwd())
+
+    # display.py times animations with MicroPython's tick clock
+    import time
+    time.ticks_ms = lambda: time.monotonic_ns() // 1000000
+    time.ticks_diff = lambda a, b: a - b
+
+from config import *
+from profiler import ticks_us, ticks_diff
+import kernels
+import assets
+from display import Character, PowerBudget, panel_map, pack_palette, pack_diagonal, wheel_lut
+
+# --------------------------------------------------------------------------------
+# Benchmark Configuration
+# --------------------------------------------------------------------------------
+ROUNDS = 200                    # Calls timed per kernel
+FRAMES = 100                    # Social mode frames timed
+
+class Frame:
+    """Stand-in for the LEDs object: its buffer and power budget, without driving the LEDs"""
+    def __init__(self):
+        self.buf = bytearray(64 * 3)
+        self.power = PowerBudget()
+
+    def write(self):
+        self.power.apply(self.buf)
+
+def timed(fn, args, rounds=ROUNDS):
+    """Average microseconds per call"""
+    start = ticks_us()
+    for _ in range(rounds):
+        fn(*args)
+    return ticks_diff(ticks_us(), start) / rounds
+
+def main():
+    character = Character(assets.CHARACTERS.get(0))
+    buf = bytearray(64 * 3)
+    lut = wheel_lut(BRIGHTNESS)
+    palette = bytearray(kernels.PALETTE_SIZE)
+    pack_palette(palette, character._resolve_palette('social', BRIGHTNESS, rainbow=True))
+    pack_diagonal(palette, lut, 0, Character.RAINBOW_STEP)
+    columns = bytearray(range(64))
+    panel = panel_map(16, 16, "rows_serpentine", 0)  # The canvas scaled up on a 16x16 panel
+    leds = bytearray(256 * 3)
+
+    scenes = (
+        ('fill', (buf, 192, 0x102030)),
+        ('blit', (buf, character.image, palette, 0)),
+        ('rainbow_fill', (buf, lut, 0, 8)),
+        ('blit_columns', (buf, columns, 0, 0xFFFFFF)),
+        ('present', (leds, buf, panel, 256)),
+        ('channel_sum', (buf, 192)),
+        ('scale', (buf, 192, 255)),
+    )
+    print(f"Kernels, {ROUNDS} calls each ({character.name})")
+    print("kernel           python us   viper us  speedup")
+    for name, args in scenes:
+        python = timed(getattr(kernels, name + '_py'), args)
+        if kernels.VIPER:
+            viper = timed(getattr(kernels, name + '_viper'), args)
+            print("%-14s %11.1f %10.1f %7.1fx" % (name, python, viper, python / max(viper, 0.1)))
+        else:
+            print("%-14s %11.1f          -        -" % (name, python))
+
+    np = Frame()
+    frame = timed(lambda: character.render('social', np, BRIGHTNESS), (), FRAMES)
+    verdict = "fits" if frame < FRAME_TIME * 1000 else "over"
+    print(f"Social frame: {frame / 1000:.2f} ms of the {FRAME_TIME} ms budget ({verdict})")
+
+    if sys.implementation.name == 'micropython':
+        bench_output()
+
+def bench_output():
+    """Time how long each LED driver's write() holds up a frame (drives the LED pin)"""
+    import machine
+    import neopixel
+    import ledstrip
+
+    pin = machine.Pin(LED_PIN)
+    drivers = [('neopixel', neopixel.NeoPixel(pin, NUM_LEDS))]
+    if ledstrip.rp2:
+        drivers.append(('pio + dma', ledstrip.PioStrip(pin, NUM_LEDS)))
+    print(f"Output, {NUM_LEDS} LEDs")
+    for name, strip in drivers:
+        total = 0
+        for _ in range(FRAMES):
+            if hasattr(strip, 'wait'):
+                strip.wait()  # Last frame out, as between real frames
+            start = ticks_us()
+            strip.write()
+            total += ticks_diff(ticks_us(), start)
+        print("%-14s %8.1f us per write" % (name, total / FRAMES))
+
+if __name__ == '__main__':
+    main()
@@ -4,8 +4,13 @@ Character Pattern Compression Tool
 
 This script:
 1. Reads character definitions from chars.py
-2. Compresses patterns into hex format
+2. Validates them and compresses changed ones into hex format
 3. Outputs compressed definitions for copy-pasting
+4. Writes the binary asset pack (assets.bin) loaded by the device
+5. Reports flash and memory use per asset and fails when over budget
+
+Compiled assets are cached in .build_cache, so only changed definitions are
+processed again. Run with --clean to rebuild everything.
 """
 
 # --------------------------------------------------------------------------------
@@ -30,27 +35,355 @@ This script:
 # - body: The main character outline
 # - hl: Highlights (brighter areas)
 # - sdw: Shadows (darker areas)
-# - custom: Fixed-color pixels
+# - custom/paint: Fixed-color pixels
+#
+# The layers are then flattened into one palette-indexed sprite:
+# - palette: 'body', 'hl' and 'sdw' (colored from the mode on the device) first,
+#   then fixed (r, g, b) colors. Index 0 is transparent, index 1 the first entry.
+# - image: 8x8 palette indices at 1, 2 or 4 bits per pixel (16, 32 or 64 hex
+#   characters), row by row with the first pixel in the high bits
+# - animation frames use the same packing, indexing a short list of palette
+#   indices per animation, so a single-color animation stays at 1 bit per pixel.
+#   Only the first frame is stored whole; the others are XOR deltas against the
+#   previous frame (see encode_frames)
+# - animations marked "stream" keep every frame whole at the end of the asset
+#   pack and are read from flash while they play, so they can be any length.
+#   They're left out of the built-in copy in assetdata.py.
 # --------------------------------------------------------------------------------
 
 import os
 import sys
+import ast
 import pprint
+import hashlib
+import struct
+import zlib
+
+# --------------------------------------------------------------------------------
+# Binary Asset Pack
+# --------------------------------------------------------------------------------
+# Must match AssetPack in assets.py. All values are little endian.
+#
+# header   '<4sBBHHIIIH' magic, format, reserved, character count, icon count,
+#                        revision, index offset, lookup offset, largest record
+# index    '<16sIH'      id (NUL padded), record offset, record size
+#                        - characters first, then icons, in authoring order
+# lookup   '<16sH'       id, position in the index - characters first, then
+#                        icons, each sorted by id for binary search
+# records  u8 name length, name
+#          u8 flags (1=body, 2=hl, 4=sdw palette roles, 8=body_color)
+#          [3 bytes body_color]
+#          u8 fixed color count, 3 bytes (r, g, b) per color - the palette is
+#              the flagged roles in that order, then the fixed colors
+#          u8 image bpp, 8 * bpp bytes image
+#          u8 animation count, then per animation:
+#              u8 name length, name, '<IHBBH' interval, frame duration,
+#              flags (1=reverse, 2=streamed), color count, frame data size,
+#              u8 palette index per color, then frame data (see encode_frames)
+#              or, when streamed, '<II' stream offset, frame count
+# streams  frames of streamed animations, 8 * bpp bytes each
+#
+# Images and frame data are content addressed: a copy that already appears
+# earlier in the pack is written as a u32 file offset to it instead, flagged
+# with 0x80 in the bpp byte / 0x8000 in the size. The first copy of one that is
+# referenced later is flagged 0x40 / 0x4000, so the device keeps just one copy.
+# --------------------------------------------------------------------------------
+ASSET_PACK_FILE = "../assets.bin"
+ASSET_PACK_URL = "https://raw.githubusercontent.com/underverket/dnd/main/assets.bin"
+MANIFEST_FILE = "../manifest.json"
+ASSETS_MODULE = "../assetdata.py"  # Firmware module the built-in definitions are injected into
+ASSET_MAGIC = b"DNDP"
+ASSET_FORMAT = 7
+ASSET_HEADER = '<4sBBHHIIIH'
+ASSET_ENTRY = '<16sIH'
+ASSET_LOOKUP = '<16sH'
+ASSET_ID_SIZE = 16
+ASSET_ROLES = (("body", 0x01), ("hl", 0x02), ("sdw", 0x04))
+ASSET_BODY_COLOR = 0x08
+ASSET_SHARED = 0x40
+ASSET_REVERSE = 0x01
+ASSET_STREAM = 0x02
+
+# --------------------------------------------------------------------------------
+# Build cache and budgets
+# --------------------------------------------------------------------------------
+BUILD_CACHE_FILE = ".build_cache"
+BUDGET_ASSET_FLASH = 1024       # Max asset pack bytes per character/icon, streamed frames excluded
+BUDGET_ASSET_RAM = 12288        # Max estimated RAM per decoded character/icon
+BUDGET_PACK = 262144            # Max asset pack size
 
-def pattern_to_hex(pattern):
-    """Convert a text pattern (8x8) to hex representation"""
-    hex_result = ""
+# Rough MicroPython heap costs used for the RAM estimate
+RAM_CHARACTER = 400             # Character object, dicts and palette
+RAM_SPRITE = 80                 # One unpacked sprite: 64 palette indices in a bytearray
+RAM_ANIMATION = 200             # Per animation: dict and frame decoder
+STREAM_RING_FRAMES = 8          # Must match STREAM_RING_FRAMES in config.py
+
+PATTERN_CELLS = ("X", "_")
+ASSET_REF = 0x80
+
+def pattern_cells(pattern):
+    """Split a text pattern (8x8) into its 64 cell characters, row by row"""
+    cells = []
     for row in pattern:
-        # Remove spaces and convert to binary (X=1, _=0)
-        binary = ''.join('1' if char == 'X' else '0' for char in row if char in 'X_')
-        # Convert binary to hex
-        hex_byte = f"{int(binary, 2):02X}"
-        hex_result += hex_byte
-    return hex_result
+        cells += row.split()
+    if len(cells) != 64:
+        raise ValueError(f"Pattern must be 8x8, got {len(cells)} cells")
+    return cells
+
+def sprite_bpp(colors):
+    """Bits per pixel needed for a sprite using this many colors (plus transparent)"""
+    for bpp in (1, 2, 4):
+        if colors < 1 << bpp:
+            return bpp
+    raise ValueError(f"Too many colors in one sprite: {colors}")
+
+def pack_sprite(indices, bpp):
+    """Pack 64 palette indices into hex, first pixel in the high bits"""
+    per_byte = 8 // bpp
+    data = bytearray(8 * bpp)
+    for i, index in enumerate(indices):
+        data[i // per_byte] |= index << (8 - bpp * (i % per_byte + 1))
+    return data.hex().upper()
+
+def encode_frames(frames, bpp):
+    """
+    Encode animation frames (lists of 64 indices) as a keyframe plus XOR deltas, in hex.
+
+    Each frame starts with a count byte. 0xFF marks a keyframe, followed by the
+    packed sprite. Otherwise it's the number of changed pixels, each stored as
+    one byte (xor << 6 | position) at 1-2 bpp or two bytes (position, xor) at
+    4 bpp. A frame is stored whole whenever that's smaller than its delta.
+    """
+    data = ""
+    previous = None
+    for frame in frames:
+        changes = [] if previous is None else [
+            (position, old ^ new) for position, (old, new) in enumerate(zip(previous, frame)) if old != new
+        ]
+        delta_size = len(changes) * (2 if bpp == 4 else 1)
+        if previous is None or len(changes) >= 0xFF or delta_size >= 8 * bpp:
+            data += "FF" + pack_sprite(frame, bpp)
+        else:
+            data += f"{len(changes):02X}"
+            for position, xor in changes:
+                data += f"{position:02X}{xor:02X}" if bpp == 4 else f"{xor << 6 | position:02X}"
+        previous = frame
+    return data
+
+def compress_asset(asset):
+    """Flatten a character/icon definition into a palette-indexed sprite"""
+    colors = asset.get("colors", {})
+
+    # Flatten the layers; later layers win, like they did when drawn in order
+    cells = [None] * 64
+    for key, _ in ASSET_ROLES:
+        if key in asset:
+            for i, cell in enumerate(pattern_cells(asset[key])):
+                if cell == "X":
+                    cells[i] = key
+    for pixel in asset.get("custom", []):
+        cells[pixel["row"] * 8 + pixel["col"]] = tuple(pixel["color"])
+    if "paint" in asset:
+        for i, cell in enumerate(pattern_cells(asset["paint"])):
+            if cell != "_":
+                cells[i] = tuple(colors[cell])
+
+    # Roles first, in the fixed order the asset pack flags them, then fixed colors
+    palette = [key for key, _ in ASSET_ROLES if key in cells]
+    for cell in cells:
+        if cell is not None and cell not in palette:
+            palette.append(cell)
+    image = [0 if cell is None else palette.index(cell) + 1 for cell in cells]
+
+    compressed = {
+        "id": asset["id"],
+        "name": asset["name"],
+        "palette": palette,
+        "image": pack_sprite(image, sprite_bpp(len(palette)))
+    }
+    if "body_color" in asset:
+        compressed["body_color"] = asset["body_color"]
 
-def compress_frames(frames):
-    """Compress animation frames to hex patterns"""
-    return [pattern_to_hex(frame) for frame in frames]
+    if "animations" in asset:
+        compressed["animations"] = []
+        compressed["streams"] = []
+        for anim in asset["animations"]:
+            # "X" is the animation color, other letters name colors of the asset
+            color = tuple(anim.get("color", (255, 255, 255)))
+            frames = []
+            frame_colors = []
+            for frame in anim["frames"]:
+                indices = []
+                for cell in pattern_cells(frame):
+                    if cell == "_":
+                        indices.append(0)
+                        continue
+                    cell_color = color if cell == "X" else tuple(colors[cell])
+                    if cell_color not in palette:
+                        palette.append(cell_color)
+                    index = palette.index(cell_color) + 1
+                    if index not in frame_colors:
+                        frame_colors.append(index)
+                    indices.append(frame_colors.index(index) + 1)
+                frames.append(indices)
+            bpp = sprite_bpp(len(frame_colors))
+            if anim.get("stream"):
+                frame_data = [pack_sprite(frame, bpp) for frame in frames]
+            else:
+                frame_data = encode_frames(frames, bpp)
+            compressed["streams" if anim.get("stream") else "animations"].append([
+                anim["name"],                                   # Index 0: name
+                anim["interval"],                               # Index 1: interval
+                anim["frame_duration"],                         # Index 2: frame_duration
+                frame_data,                                     # Index 3: frame data (keyframes when streamed)
+                frame_colors,                                   # Index 4: palette index per frame color
+                anim.get("reverse", False)                      # Index 5: reverse
+            ])
+        for key in ("animations", "streams"):
+            if not compressed[key]:
+                del compressed[key]
+    return compressed
+
+def builtin_assets(assets):
+    """The definitions as built into assetdata.py, which can't stream animations from the pack"""
+    return [{key: value for key, value in asset.items() if key != "streams"} for asset in assets]
+
+def count_blobs(assets):
+    """Count how often each image and animation frame stream appears across all assets"""
+    counts = {}
+    for asset in assets:
+        for blob in [asset["image"]] + [anim[3] for anim in asset.get("animations", [])]:
+            counts[blob] = counts.get(blob, 0) + 1
+    return counts
+
+def encode_asset_record(asset, offset, counts, seen, streams, stream_offset):
+    """
+    Encode one compressed character/icon definition as an asset pack record
+    starting at file offset. Images and frame data already in seen (hex -> file
+    offset) become references; shared ones are added to seen when first written.
+    Frames of streamed animations are appended to streams, which starts at
+    stream_offset in the file.
+    Returns the record and the number of bytes references saved.
+    """
+    name = asset["name"].encode()
+    flags = 0
+    fixed = []
+    for entry in asset["palette"]:
+        if isinstance(entry, str):
+            flags |= dict(ASSET_ROLES)[entry]
+        else:
+            fixed.append(entry)
+    if "body_color" in asset:
+        flags |= ASSET_BODY_COLOR
+
+    record = bytearray([len(name)]) + name + bytes([flags])
+    if "body_color" in asset:
+        record += bytes(asset["body_color"])
+    record.append(len(fixed))
+    for color in fixed:
+        record += bytes(color)
+    saved = 0
+
+    def blob_flags(blob):
+        if blob in seen:
+            return ASSET_REF
+        # A reference is 4 bytes, so only longer copies are worth sharing
+        return ASSET_SHARED if counts[blob] > 1 and len(blob) > 8 else 0
+
+    def add_blob(blob, flag):
+        # Inline data, or a reference to the copy written earlier
+        nonlocal saved
+        data = bytes.fromhex(blob)
+        if flag == ASSET_REF:
+            record.extend(struct.pack('<I', seen[blob]))
+            saved += len(data) - 4
+        else:
+            if flag == ASSET_SHARED:
+                seen[blob] = offset + len(record)
+            record.extend(data)
+
+    image = asset["image"]
+    flag = blob_flags(image)
+    record.append(len(image) // 16 | flag)
+    add_blob(image, flag)
+
+    animations = asset.get("animations", [])
+    stream_anims = asset.get("streams", [])
+    record.append(len(animations) + len(stream_anims))
+    for anim_name, interval, frame_duration, frames, colors, reverse in animations:
+        anim_name = anim_name.encode()
+        record += bytes([len(anim_name)]) + anim_name
+        if len(frames) // 2 > 0x3FFF:
+            raise ValueError(f"Animation '{anim_name.decode()}' has too much frame data")
+        flag = blob_flags(frames)
+        record += struct.pack('<IHBBH', interval, frame_duration, ASSET_REVERSE if reverse else 0,
+                              len(colors), len(frames) // 2 | flag << 8)
+        record += bytes(colors)
+        add_blob(frames, flag)
+
+    for anim_name, interval, frame_duration, frames, colors, reverse in stream_anims:
+        anim_name = anim_name.encode()
+        record += bytes([len(anim_name)]) + anim_name
+        record += struct.pack('<IHBBH', interval, frame_duration,
+                              ASSET_STREAM | (ASSET_REVERSE if reverse else 0), len(colors), 0)
+        record += bytes(colors)
+        record += struct.pack('<II', stream_offset + len(streams), len(frames))
+        for frame in frames:
+            streams += bytes.fromhex(frame)
+    return bytes(record), saved
+
+def build_asset_pack(chars, icons):
+    """
+    Build the binary asset pack from compressed character and icon definitions.
+    Returns the pack and the number of bytes saved by storing shared images and
+    frame data once.
+    """
+    assets = chars + icons
+
+    header_size = struct.calcsize(ASSET_HEADER)
+    index_size = len(assets) * struct.calcsize(ASSET_ENTRY)
+    lookup_size = len(assets) * struct.calcsize(ASSET_LOOKUP)
+
+    counts = count_blobs(assets)
+
+    def encode_records(stream_offset):
+        seen = {}
+        saved = 0
+        index = b""
+        records = []
+        streams = bytearray()
+        offset = header_size + index_size + lookup_size
+        for asset in assets:
+            asset_id = asset["id"].encode()
+            if len(asset_id) > ASSET_ID_SIZE:
+                raise ValueError(f"Asset id '{asset['id']}' is longer than {ASSET_ID_SIZE} bytes")
+            record, record_saved = encode_asset_record(asset, offset, counts, seen, streams, stream_offset)
+            index += struct.pack(ASSET_ENTRY, asset_id, offset, len(record))
+            records.append(record)
+            offset += len(record)
+            saved += record_saved
+        return index, records, bytes(streams), saved, offset
+
+    # Record sizes don't depend on where the streams go, so a first pass finds
+    # the end of the records and the second fills in the stream offsets
+    records_end = encode_records(0)[4]
+    index, records, streams, saved, offset = encode_records(records_end)
+
+    lookup = b""
+    for group in (chars, icons):
+        ids = [asset["id"].encode() for asset in group]
+        if len(set(ids)) != len(ids):
+            raise ValueError("Duplicate asset ids")
+        for asset_id, position in sorted((asset_id, i) for i, asset_id in enumerate(ids)):
+            lookup += struct.pack(ASSET_LOOKUP, asset_id, position)
+
+    body = index + lookup + b"".join(records) + streams
+    # The revision identifies the pack contents, so identical builds match
+    revision = zlib.crc32(body)
+    largest = max((len(record) for record in records), default=0)
+    header = struct.pack(ASSET_HEADER, ASSET_MAGIC, ASSET_FORMAT, 0, len(chars), len(icons),
+                         revision, header_size, header_size + index_size, largest)
+    return header + body, saved
 
 def custom_format(obj, indent=0):
     """Custom formatter that keeps certain arrays on a single line"""
@@ -125,6 +458,214 @@ def custom_format(obj, indent=0):
         # Simple value
         return repr(obj)
 
+def validate_pattern(pattern, what, cells=PATTERN_CELLS):
+    """Return the problems with an 8x8 text pattern"""
+    if not isinstance(pattern, (list, tuple)) or len(pattern) != 8:
+        return [f"{what}: needs 8 rows"]
+    errors = []
+    for number, row in enumerate(pattern):
+        row_cells = row.split() if isinstance(row, str) else []
+        if len(row_cells) != 8:
+            errors.append(f"{what} row {number}: needs 8 cells, got {len(row_cells)}")
+        bad = sorted(set(cell for cell in row_cells if cell not in cells))
+        if bad:
+            errors.append(f"{what} row {number}: unknown cells {', '.join(bad)}")
+    return errors
+
+def validate_color(color, what):
+    if (not isinstance(color, (list, tuple)) or len(color) != 3
+            or not all(isinstance(c, int) and 0 <= c <= 255 for c in color)):
+        return [f"{what}: color must be (r, g, b) with values 0-255, got {color!r}"]
+    return []
+
+def validate_asset(asset):
+    """Return the problems with a character/icon definition, prefixed with its id"""
+    name = asset.get("id", "?")
+    errors = []
+    if not isinstance(asset.get("id"), str) or not asset["id"]:
+        errors.append("missing id")
+    elif len(asset["id"].encode()) > ASSET_ID_SIZE:
+        errors.append(f"id is longer than {ASSET_ID_SIZE} bytes")
+    if not isinstance(asset.get("name"), str) or len(asset["name"].encode()) > 255:
+        errors.append("missing or too long name")
+    if "body" not in asset:
+        errors.append("missing body")
+
+    for key, _ in ASSET_ROLES:
+        if key in asset:
+            errors += validate_pattern(asset[key], key)
+    if "body_color" in asset:
+        errors += validate_color(asset["body_color"], "body_color")
+
+    for number, pixel in enumerate(asset.get("custom", [])):
+        if not all(isinstance(pixel.get(key), int) and 0 <= pixel[key] <= 7 for key in ("row", "col")):
+            errors.append(f"custom pixel {number}: row and col must be 0-7, got {pixel.get('row')!r}, {pixel.get('col')!r}")
+        errors += validate_color(pixel.get("color"), f"custom pixel {number}")
+
+    colors = asset.get("colors", {})
+    for letter, color in colors.items():
+        if len(letter) != 1 or letter in PATTERN_CELLS:
+            errors.append(f"colors: '{letter}' must be a single letter other than X and _")
+        errors += validate_color(color, f"colors '{letter}'")
+    letters = PATTERN_CELLS + tuple(colors)
+    if "paint" in asset:
+        errors += validate_pattern(asset["paint"], "paint", ("_",) + tuple(colors))
+
+    for anim in asset.get("animations", []):
+        what = f"animation '{anim.get('name')}'"
+        if not isinstance(anim.get("name"), str) or not anim["name"]:
+            errors.append(f"{what}: missing name")
+        for key in ("interval", "frame_duration"):
+            if not isinstance(anim.get(key), int) or anim[key] <= 0:
+                errors.append(f"{what}: {key} must be a positive number of ms")
+        if "color" in anim:
+            errors += validate_color(anim["color"], what)
+        if not anim.get("frames"):
+            errors.append(f"{what}: needs at least one frame")
+        for number, frame in enumerate(anim.get("frames", [])):
+            errors += validate_pattern(frame, f"{what} frame {number}", letters)
+
+    if not errors:
+        try:
+            compress_asset(asset)
+        except ValueError as e:
+            errors.append(str(e))
+    return [f"{name}: {error}" for error in errors]
+
+def load_build_cache():
+    """Compiled assets from earlier builds, by source hash"""
+    try:
+        with open(BUILD_CACHE_FILE) as f:
+            return ast.literal_eval(f.read())
+    except (OSError, ValueError, SyntaxError):
+        return {}
+
+def source_hash(asset, salt):
+    """Hash a source definition together with the build script that compiles it"""
+    return hashlib.sha256(salt + repr(asset).encode()).hexdigest()
+
+def compile_assets(sources, cache, salt, errors):
+    """
+    Validate and compress changed definitions, taking unchanged ones from cache.
+    Returns the compressed assets and how many were compiled.
+    """
+    compressed = []
+    compiled = 0
+    for asset in sources:
+        key = source_hash(asset, salt)
+        if key not in cache:
+            problems = validate_asset(asset)
+            if problems:
+                errors += problems
+                continue
+            cache[key] = compress_asset(asset)
+            compiled += 1
+        compressed.append(cache[key])
+    ids = [asset["id"] for asset in sources]
+    errors += [f"{asset_id}: duplicate id" for asset_id in sorted(set(ids)) if ids.count(asset_id) > 1]
+    return compressed, compiled
+
+def unpack_sprite(data, bpp):
+    """Unpack a packed sprite (bytes) into its 64 palette indices"""
+    per_byte = 8 // bpp
+    return [(data[i // per_byte] >> (8 - bpp * (i % per_byte + 1))) & ((1 << bpp) - 1) for i in range(64)]
+
+def decode_frames(data, colors):
+    """Decode delta-encoded frame data (see encode_frames) back into lists of 64 indices"""
+    data = bytes.fromhex(data)
+    bpp = sprite_bpp(len(colors))
+    frames = []
+    pos = 0
+    while pos < len(data):
+        count = data[pos]
+        pos += 1
+        if count == 0xFF:
+            frame = unpack_sprite(data[pos:pos + 8 * bpp], bpp)
+            pos += 8 * bpp
+        else:
+            frame = list(frames[-1])
+            for _ in range(count):
+                if bpp == 4:
+                    frame[data[pos]] ^= data[pos + 1]
+                    pos += 2
+                else:
+                    frame[data[pos] & 63] ^= data[pos] >> 6
+                    pos += 1
+        frames.append(frame)
+    return frames
+
+def estimate_ram(asset):
+    """Rough heap bytes for a decoded character/icon on the device"""
+    ram = RAM_CHARACTER + RAM_SPRITE
+    for anim in asset.get("animations", []):
+        # Encoded frames and the unpacked current frame
+        ram += RAM_ANIMATION + len(anim[3]) // 2 + RAM_SPRITE
+    for anim in asset.get("streams", []):
+        # Frame ring plus the pinned first frame, and the unpacked current frame
+        frame_size = len(anim[3][0]) // 2
+        ram += RAM_ANIMATION + frame_size * (min(STREAM_RING_FRAMES, len(anim[3])) + 1) + RAM_SPRITE
+    return ram
+
+def pack_record_sizes(pack):
+    """Record size per asset id, read back from the pack index"""
+    header = struct.unpack_from(ASSET_HEADER, pack)
+    entry_size = struct.calcsize(ASSET_ENTRY)
+    sizes = {}
+    for i in range(header[3] + header[4]):
+        asset_id, _, size = struct.unpack_from(ASSET_ENTRY, pack, header[6] + i * entry_size)
+        sizes[asset_id.rstrip(b"\0").decode()] = size
+    return sizes
+
+def budget_report(assets, pack):
+    """Print flash, RAM and frame counts per asset and return the budget problems"""
+    sizes = pack_record_sizes(pack)
+    errors = []
+    print(f"\n{'Asset':<17}{'Flash':>7}{'Stream':>8}{'RAM est':>9}  Frames")
+    for asset in assets:
+        flash = sizes[asset["id"]]
+        stream = sum(len(frame) // 2 for anim in asset.get("streams", []) for frame in anim[3])
+        ram = estimate_ram(asset)
+        frames = [str(len(decode_frames(anim[3], anim[4]))) for anim in asset.get("animations", [])]
+        frames += [f"{len(anim[3])}s" for anim in asset.get("streams", [])]
+        print(f"{asset['id']:<17}{flash:>7}{stream:>8}{ram:>9}  {' '.join(frames) or '-'}")
+        if flash > BUDGET_ASSET_FLASH:
+            errors.append(f"{asset['id']}: {flash} bytes of flash, budget is {BUDGET_ASSET_FLASH}")
+        if ram > BUDGET_ASSET_RAM:
+            errors.append(f"{asset['id']}: ~{ram} bytes of RAM, budget is {BUDGET_ASSET_RAM}")
+    print(f"{'Total':<17}{len(pack):>7}")
+    if len(pack) > BUDGET_PACK:
+        errors.append(f"asset pack is {len(pack)} bytes, budget is {BUDGET_PACK}")
+    return errors
+
+def write_if_changed(path, content):
+    """Write content (str or bytes) to path unless it's already there. Returns True if written."""
+    mode = "b" if isinstance(content, bytes) else ""
+    try:
+        with open(path, "r" + mode) as f:
+            if f.read() == content:
+                return False
+    except OSError:
+        pass
+    with open(path, "w" + mode) as f:
+        f.write(content)
+    return True
+
+def update_manifest(pack):
+    """Point the update manifest at the asset pack so devices can fetch it without a firmware update."""
+    import json
+    with open(MANIFEST_FILE) as f:
+        manifest = json.load(f)
+    manifest["assets"] = {
+        "revision": struct.unpack_from(ASSET_HEADER, pack)[5],
+        "url": ASSET_PACK_URL,
+        "sha256": hashlib.sha256(pack).hexdigest(),
+    }
+    with open(MANIFEST_FILE, "w") as f:
+        json.dump(manifest, f, indent=2)
+        f.write("\n")
+    print(f"Manifest updated with asset revision {manifest['assets']['revision']}")
+
+
 def main():
     # Import the raw character definitions
     try:
@@ -134,109 +675,49 @@ def main():
     except ImportError:
         print("Error: Could not import CHARACTERS_RAW from chars.py")
         return
-    
-    # Create compressed definitions
-    compressed_chars = []
-    
-    for char in CHARACTERS_RAW:
-        compressed_char = {
-            "id": char["id"],
-            "name": char["name"],
-            "body": pattern_to_hex(char["body"])
-        }
-        
-        # Handle highlight if present
-        if "hl" in char:
-            compressed_char["hl"] = pattern_to_hex(char["hl"])
-            
-        # Handle shadow if present
-        if "sdw" in char:
-            compressed_char["sdw"] = pattern_to_hex(char["sdw"])
-            
-        # Handle custom pixels - compress format
-        if "custom" in char:
-            compressed_char["custom"] = []
-            for pixel in char["custom"]:
-                compressed_char["custom"].append(
-                    [pixel['col'], pixel['row'], pixel['color']]
-                )
-                
-        # Handle animations - compress format
-        if "animations" in char:
-            compressed_char["animations"] = []
-            for anim in char["animations"]:
-                compressed_anim = [
-                    anim["name"],                                 # Index 0: name
-                    anim["interval"],                             # Index 1: interval
-                    anim["frame_duration"],                       # Index 2: frame_duration
-                    compress_frames(anim["frames"]),              # Index 3: frames
-                    anim.get("color", (255, 255, 255)),          # Index 4: color
-                    anim.get("reverse", False)                    # Index 5: reverse
-                ]
-                compressed_char["animations"].append(compressed_anim)
-
-        compressed_chars.append(compressed_char)
-
-    # Create compressed icons
-    compressed_icons = []
-    for icon in ICONS_RAW:
-        compressed_icon = {
-            "id": icon["id"],
-            "name": icon["name"],
-            "body": pattern_to_hex(icon["body"])
-        }
-        
-        # Handle body_color if present - ONLY FOR ICONS
-        if "body_color" in icon:
-            compressed_icon["body_color"] = icon["body_color"]
-        
-        # Handle highlight if present
-        if "hl" in icon:
-            compressed_icon["hl"] = pattern_to_hex(icon["hl"])
-            
-        # Handle shadow if present
-        if "sdw" in icon:
-            compressed_icon["sdw"] = pattern_to_hex(icon["sdw"])
-            
-        # Handle custom pixels
-        if "custom" in icon:
-            compressed_icon["custom"] = []
-            for pixel in icon["custom"]:
-                compressed_icon["custom"].append(
-                    [pixel['col'], pixel['row'], pixel['color']]
-                )
-                
-        # Handle animations
-        if "animations" in icon:
-            compressed_icon["animations"] = []
-            for anim in icon["animations"]:
-                compressed_anim = [
-                    anim["name"],
-                    anim["interval"],
-                    anim["frame_duration"],
-                    compress_frames(anim["frames"]),
-                    anim.get("color", (255, 255, 255)),
-                    anim.get("reverse", False)
-                ]
-                compressed_icon["animations"].append(compressed_anim)
-
-        compressed_icons.append(compressed_icon)
-    
+
+    # Compile changed definitions; any change to this script invalidates the cache
+    with open(os.path.abspath(__file__), "rb") as f:
+        salt = f.read()
+    cache = {} if "--clean" in sys.argv else load_build_cache()
+    errors = []
+    compressed_chars, compiled_chars = compile_assets(CHARACTERS_RAW, cache, salt, errors)
+    compressed_icons, compiled_icons = compile_assets(ICONS_RAW, cache, salt, errors)
+    if errors:
+        print("Build failed - invalid definitions:")
+        for error in errors:
+            print(f"  {error}")
+        sys.exit(1)
+
+    # Check the budgets before writing anything, so an over-budget build
+    # leaves assetdata.py, the asset pack and the manifest as they were
+    pack, dedup_saved = build_asset_pack(compressed_chars, compressed_icons)
+    budget_errors = budget_report(compressed_chars + compressed_icons, pack)
+    if budget_errors:
+        print("Build failed - over budget:")
+        for error in budget_errors:
+            print(f"  {error}")
+        sys.exit(1)
+
+    # Only keep what's still in use
+    used = set(source_hash(asset, salt) for asset in CHARACTERS_RAW + ICONS_RAW)
+    write_if_changed(BUILD_CACHE_FILE, pprint.pformat({key: value for key, value in cache.items() if key in used}))
+    print(f"Compiled {compiled_chars + compiled_icons} changed definitions, "
+          f"{len(used) - compiled_chars - compiled_icons} unchanged")
+
     # Format with our custom formatter
     output_content = "# Auto-generated from build_chars.py\n\n"
     output_content += "CHARACTERS_RAW = "
-    output_content += custom_format(compressed_chars)
+    output_content += custom_format(builtin_assets(compressed_chars))
     
     # Write to output.py
-    with open("output.py", "w") as f:
-        f.write(output_content)
-    
+    if write_if_changed("output.py", output_content):
+        print("Output written to output.py")
     print(f"Successfully compressed {len(compressed_chars)} characters")
-    print("Output written to output.py")
 
-    # Now inject the compressed character data into main.py
+    # Now inject the compressed character data into the firmware
     try:
-        with open("../main.py", "r") as f:
+        with open(ASSETS_MODULE, "r") as f:
             main_content = f.read()
         
         # Handle characters
@@ -248,7 +729,7 @@ def main():
         
         if start_index != -1 and end_index != -1:
             end_index += len(end_marker)
-            new_section = f"{start_marker}\nCHARACTERS_RAW = {custom_format(compressed_chars)}\n{end_marker}"
+            new_section = f"{start_marker}\nCHARACTERS_RAW = {custom_format(builtin_assets(compressed_chars))}\n{end_marker}"
             main_content = main_content[:start_index] + new_section + main_content[end_index:]
         
         # Handle icons (new section)
@@ -260,18 +741,24 @@ def main():
         
         if icon_start_index != -1 and icon_end_index != -1:
             icon_end_index += len(icon_end_marker)
-            new_icon_section = f"{icon_start_marker}\nICONS_RAW = {custom_format(compressed_icons)}\n{icon_end_marker}"
+            new_icon_section = f"{icon_start_marker}\nICONS_RAW = {custom_format(builtin_assets(compressed_icons))}\n{icon_end_marker}"
             main_content = main_content[:icon_start_index] + new_icon_section + main_content[icon_end_index:]
             
-        with open("../main.py", "w") as f:
-            f.write(main_content)
-            
-        print("Successfully injected compressed data into main.py")
+        if write_if_changed(ASSETS_MODULE, main_content):
+            print(f"Successfully injected compressed data into {ASSETS_MODULE}")
+        else:
+            print(f"{ASSETS_MODULE} is up to date")
     except Exception as e:
-        print(f"Error updating main.py: {e}")
+        print(f"Error updating {ASSETS_MODULE}: {e}")
+
+    # Write the binary asset pack
+    if write_if_changed(ASSET_PACK_FILE, pack):
+        print(f"Asset pack written to {ASSET_PACK_FILE} ({len(pack)} bytes)")
+        update_manifest(pack)
+    else:
+        print(f"{ASSET_PACK_FILE} is up to date")
     
     # Calculate size differences
-    import json
     raw_size = len(str(CHARACTERS_RAW))
     compressed_size = len(str(compressed_chars))
     compression_ratio = (1 - compressed_size / raw_size) * 100
@@ -279,6 +766,15 @@ def main():
     print(f"Raw size: {raw_size} bytes")
     print(f"Compressed size: {compressed_size} bytes")
     print(f"Compression ratio: {compression_ratio:.1f}%")
+
+    # Deduplication: identical frames within an animation are absorbed by the
+    # delta encoding, identical images and animations across assets by the pack
+    frames = [str(frame) for asset in CHARACTERS_RAW + ICONS_RAW
+              for anim in asset.get("animations", []) for frame in anim["frames"]]
+    blobs = count_blobs(compressed_chars + compressed_icons)
+    print(f"Animation frames: {len(frames)} authored, {len(set(frames))} unique")
+    print(f"Shared images/animations: {sum(1 for count in blobs.values() if count > 1)}, "
+          f"saving {dedup_saved} bytes in the asset pack")
     
     # Also print the output for immediate copy-paste
     print("\n--- COPY BELOW THIS LINE ---\n")
@@ -286,4 +782,4 @@ def main():
     print("\n--- COPY ABOVE THIS LINE ---\n")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -49,6 +49,23 @@
 #        {'row': 5, 'col': 5, 'color': (255, 127, 0)},  # Orange
 #    ],
 #
+# Or paint them: name the colors with a letter each and draw with those letters.
+# Each character can use up to 15 colors, including body, hl and sdw.
+#    "colors": {
+#        "R": (255, 0, 0),    # Red
+#        "O": (255, 127, 0),  # Orange
+#    },
+#    "paint": [
+#        "_ _ _ _ _ _ _ _",
+#        "_ _ _ _ _ _ _ _",
+#        "_ _ _ _ _ _ _ _",
+#        "_ _ _ _ _ _ _ _",
+#        "_ _ R _ _ R _ _",
+#        "_ _ O _ _ O _ _",
+#        "_ _ _ _ _ _ _ _",
+#        "_ _ _ _ _ _ _ _"
+#    ],
+#
 # Fancy an animation? Add an animation object, no limit to frames:
 # "animations": [
 #     {
@@ -56,7 +73,8 @@
 #         "interval": 5000, // Pause between animation cycles ms
 #         "frame_duration": 50, // Duration of each frame in ms
 #         "reverse": False, // If animation should reverse back to first frame.
-#         "color": (255, 255, 255), // Color of the animation, no support for multiple colors.
+#         "stream": False, // Optional. Read frames from flash while playing, for long sequences.
+#         "color": (255, 255, 255), // Color of the "X" pixels. Frames can also use the letters from "colors".
 #         "frames": [
 #             [   # Example: Frame 1 - Eyes open
 #                 "_ _ _ _ _ _ _ _",
@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""
+Release Build Tool
+
+This script turns the firmware modules into the smaller files devices download:
+1. Strips docstrings and comments
+2. Removes print() diagnostics and `if DEBUG:` blocks (keep them with --debug).
+   Error reports stay: prints in except handlers, and prints whose message
+   mentions a failure (ERROR_PRINT), so a device's log still shows what went wrong
+3. Folds integer config constants with micropython.const(), and inlines them
+   in the modules that star-import config
+4. Re-indents with single spaces
+5. Writes a source map per module, so tracebacks from a device can be traced
+   back to the source
+
+Usage:
+    python3 release.py                      Build release/*.py and their .map files
+    python3 release.py --debug              Same, but keep prints and DEBUG blocks
+    python3 release.py --publish            Also point manifest.json at the release build
+    python3 release.py --line states.py:123 Show the source line for a release line
+                                            (the module defaults to main.py)
+    python3 release.py --traceback          Rewrite the line numbers of a traceback read from stdin
+"""
+
+import ast
+import copy
+import hashlib
+import json
+import os
+import re
+import sys
+
+# --------------------------------------------------------------------------------
+# Release Configuration
+# --------------------------------------------------------------------------------
+SOURCE_DIR = ".."
+RELEASE_DIR = "../release"
+FIRMWARE_FILES = ["main.py", "config.py", "profiler.py", "kernels.py", "ledstrip.py", "dualcore.py", "display.py", "assets.py", "assetdata.py", "states.py", "netota.py"]
+CONFIG_FILE = "config.py"
+MANIFEST_FILE = "../manifest.json"
+RELEASE_URL = "https://raw.githubusercontent.com/underverket/dnd/main/release/main.py"
+CONST_NAME = re.compile(r"^[A-Z][A-Z0-9_]*$")
+# Functions whose prints all stay: REPL tools whose prints are their output, and
+# error reporters that take the failure as an argument
+KEEP_PRINTS = {"profiler.py": {"summary"}, "netota.py": {"_handle_error"}}
+ERROR_PRINT = re.compile(r"error|fail|invalid|warning|mismatch|unavailable", re.IGNORECASE)
+
+# --------------------------------------------------------------------------------
+# Transformations
+# --------------------------------------------------------------------------------
+def is_docstring(node):
+    return (isinstance(node, ast.Expr) and isinstance(node.value, ast.Constant)
+            and isinstance(node.value.value, str))
+
+def is_print(node):
+    return (isinstance(node, ast.Expr) and isinstance(node.value, ast.Call)
+            and isinstance(node.value.func, ast.Name) and node.value.func.id == "print")
+
+def is_error_print(node):
+    """True for a print() whose literal text reports a failure"""
+    text = ""
+    for arg in node.value.args:
+        parts = arg.values if isinstance(arg, ast.JoinedStr) else [arg]
+        text += "".join(part.value for part in parts
+                        if isinstance(part, ast.Constant) and isinstance(part.value, str))
+    return bool(ERROR_PRINT.search(text))
+
+def is_debug_test(node):
+    return isinstance(node, ast.Name) and node.id == "DEBUG"
+
+class ReleaseTransformer(ast.NodeTransformer):
+    """Drop docstrings, and diagnostic prints plus `if DEBUG:` blocks unless debug is set"""
+    def __init__(self, debug, keep_prints=()):
+        self.debug = debug
+        self.keep_prints = keep_prints
+        self.handlers = 0  # Depth of except handlers being visited
+
+    def visit_ExceptHandler(self, node):
+        self.handlers += 1
+        node = self.generic_visit(node)
+        self.handlers -= 1
+        return node
+
+    def visit_FunctionDef(self, node):
+        if node.name not in self.keep_prints:
+            return self.generic_visit(node)
+        debug, self.debug = self.debug, True
+        node = self.generic_visit(node)
+        self.debug = debug
+        return node
+
+    def generic_visit(self, node):
+        super().generic_visit(node)
+        for field in ("body", "orelse", "finalbody"):
+            statements = getattr(node, field, None)
+            if not isinstance(statements, list) or not statements or not isinstance(statements[0], ast.stmt):
+                continue
+            kept = []
+            for index, statement in enumerate(statements):
+                if index == 0 and field == "body" and is_docstring(statement) and isinstance(
+                        node, (ast.Module, ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef)):
+                    continue
+                if not self.debug and is_print(statement) and not (self.handlers or is_error_print(statement)):
+                    continue
+                if not self.debug and isinstance(statement, ast.If) and is_debug_test(statement.test):
+                    kept += statement.orelse
+                    continue
+                kept.append(statement)
+            if not kept and field == "body" and not isinstance(node, ast.Module):
+                kept = [ast.Pass()]
+            setattr(node, field, kept)
+        return node
+
+def fold_constants(tree):
+    """
+    Wrap module-level integer constants in const(), so MicroPython substitutes
+    them at compile time. Only names assigned exactly once, and never declared
+    global elsewhere, are folded. Returns {name: value} of the folded names.
+    """
+    assigned = {}
+    for node in ast.walk(tree):
+        targets = []
+        if isinstance(node, ast.Assign):
+            targets = node.targets
+        elif isinstance(node, (ast.AugAssign, ast.AnnAssign)):
+            targets = [node.target]
+        elif isinstance(node, ast.Global):
+            for name in node.names:
+                assigned[name] = assigned.get(name, 0) + 2
+        for target in targets:
+            for name in ast.walk(target):
+                if isinstance(name, ast.Name):
+                    assigned[name.id] = assigned.get(name.id, 0) + 1
+
+    folded = {}
+    for node in tree.body:
+        if not (isinstance(node, ast.Assign) and len(node.targets) == 1
+                and isinstance(node.targets[0], ast.Name)):
+            continue
+        name = node.targets[0].id
+        value = node.value
+        if isinstance(value, ast.UnaryOp) and isinstance(value.op, ast.USub):
+            value = value.operand
+        if (CONST_NAME.match(name) and assigned.get(name) == 1 and isinstance(value, ast.Constant)
+                and type(value.value) is int):
+            folded[name] = node.value
+            node.value = ast.Call(func=ast.Name(id="const", ctx=ast.Load()), args=[node.value], keywords=[])
+
+    if folded:
+        tree.body.insert(0, ast.ImportFrom(module="micropython", names=[ast.alias(name="const")], level=0))
+    return folded
+
+class ConstantInliner(ast.NodeTransformer):
+    """
+    Replace reads of config constants with their values. const() only folds
+    within the module that defines a name, so other modules would otherwise
+    look each one up in their globals at run time.
+    """
+    def __init__(self, constants, tree):
+        # Names a module binds itself shadow the star import
+        bound = {target.id for node in ast.walk(tree) if isinstance(node, (ast.Assign, ast.AugAssign, ast.AnnAssign))
+                 for target in ast.walk(node.targets[0] if isinstance(node, ast.Assign) else node.target)
+                 if isinstance(target, ast.Name)}
+        self.constants = {name: value for name, value in constants.items() if name not in bound}
+        self.inlined = 0
+
+    def visit_Name(self, node):
+        if isinstance(node.ctx, ast.Load) and node.id in self.constants:
+            self.inlined += 1
+            return ast.copy_location(copy.deepcopy(self.constants[node.id]), node)
+        return node
+
+def imports_config(tree):
+    return any(isinstance(node, ast.ImportFrom) and node.module == "config"
+               and any(alias.name == "*" for alias in node.names) for node in tree.body)
+
+def set_debug(tree, debug):
+    """Pin the DEBUG config constant to the build type"""
+    for node in tree.body:
+        if (isinstance(node, ast.Assign) and len(node.targets) == 1
+                and isinstance(node.targets[0], ast.Name) and node.targets[0].id == "DEBUG"):
+            node.value = ast.Constant(value=debug)
+
+def minify(source):
+    """Re-indent unparsed source with one space per level"""
+    lines = []
+    for line in source.splitlines():
+        stripped = line.lstrip(" ")
+        lines.append(" " * ((len(line) - len(stripped)) // 4) + stripped)
+    return "\n".join(lines) + "\n"
+
+def source_map(tree, release_source):
+    """
+    Map release line numbers to source line numbers. Parsing the release
+    source gives a tree of the same shape as the transformed one, whose nodes
+    still carry their original line numbers, so statements pair up in order.
+    """
+    release_tree = ast.parse(release_source)
+    lines = {}
+    for original, released in zip(ast.walk(tree), ast.walk(release_tree)):
+        if type(original) is not type(released):
+            raise ValueError("Release source doesn't match the transformed tree")
+        if isinstance(released, ast.stmt) and getattr(original, "lineno", None):
+            lines.setdefault(released.lineno, original.lineno)
+    return lines
+
+# --------------------------------------------------------------------------------
+# Source Map Lookups
+# --------------------------------------------------------------------------------
+def source_map_file(name):
+    return os.path.join(RELEASE_DIR, name + ".map")
+
+def load_source_map(name):
+    with open(source_map_file(name)) as f:
+        return {int(line): original for line, original in json.load(f)["lines"].items()}
+
+def original_line(lines, line):
+    """The source line for a release line, using the closest mapped statement at or above it"""
+    while line > 0 and line not in lines:
+        line -= 1
+    return lines.get(line)
+
+def translate_traceback(text):
+    """Rewrite 'File "module.py", line N' references to source line numbers"""
+    maps = {}
+    def replace(match):
+        name = match.group(2)
+        if name not in FIRMWARE_FILES:
+            return match.group(0)
+        if name not in maps:
+            maps[name] = load_source_map(name)
+        line = original_line(maps[name], int(match.group(4)))
+        return f'{match.group(1)}{name}{match.group(3)}{line} (release line {match.group(4)})' if line else match.group(0)
+    return re.sub(r'(File "(?:[^"]*/)?)([\w]+\.py)(", line )(\d+)', replace, text)
+
+# --------------------------------------------------------------------------------
+# Release
+# --------------------------------------------------------------------------------
+def transform(name, source, debug, constants):
+    """Build the release source of one module; returns (source, tree, folded, inlined)"""
+    tree = ast.parse(source)
+    set_debug(tree, debug)
+    tree = ReleaseTransformer(debug, KEEP_PRINTS.get(name, ())).visit(tree)
+    folded = fold_constants(tree)
+    inlined = 0
+    if imports_config(tree):
+        inliner = ConstantInliner(constants, tree)
+        tree = inliner.visit(tree)
+        inlined = inliner.inlined
+    ast.fix_missing_locations(tree)
+    return minify(ast.unparse(tree)), tree, folded, inlined
+
+def publish(releases):
+    """Point the update manifest at the release build"""
+    with open(MANIFEST_FILE) as f:
+        manifest = json.load(f)
+    manifest["url"] = RELEASE_URL
+    manifest["sha256"] = hashlib.sha256(releases["main.py"]).hexdigest()
+    manifest["files"] = {name: hashlib.sha256(release).hexdigest() for name, release in releases.items()}
+    with open(MANIFEST_FILE, "w") as f:
+        json.dump(manifest, f, indent=2)
+        f.write("\n")
+    print(f"Manifest now points at {RELEASE_URL}")
+
+def main():
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+    if "--line" in sys.argv:
+        name, _, line = sys.argv[sys.argv.index("--line") + 1].rpartition(":")
+        name = name or "main.py"
+        print(f"release {name} line {line} -> source line {original_line(load_source_map(name), int(line))}")
+        return
+    if "--traceback" in sys.argv:
+        print(translate_traceback(sys.stdin.read()), end="")
+        return
+
+    debug = "--debug" in sys.argv
+    sources = {}
+    for name in FIRMWARE_FILES:
+        with open(os.path.join(SOURCE_DIR, name)) as f:
+            sources[name] = f.read()
+
+    # config.py goes first: its folded constants are inlined everywhere else
+    _, _, constants, _ = transform(CONFIG_FILE, sources[CONFIG_FILE], debug, {})
+
+    os.makedirs(RELEASE_DIR, exist_ok=True)
+    releases = {}
+    total_source = total_release = 0
+    print(f"{'module':<12} {'source':>8} {'release':>8}  folded  inlined")
+    for name in FIRMWARE_FILES:
+        source = sources[name]
+        release_source, tree, folded, inlined = transform(name, source, debug, constants)
+        lines = source_map(tree, release_source)
+
+        release = release_source.encode()
+        releases[name] = release
+        with open(os.path.join(RELEASE_DIR, name), "wb") as f:
+            f.write(release)
+        with open(source_map_file(name), "w") as f:
+            json.dump({"source": name, "sha256": hashlib.sha256(source.encode()).hexdigest(),
+                       "lines": lines}, f, separators=(",", ":"))
+
+        total_source += len(source.encode())
+        total_release += len(release)
+        print(f"{name:<12} {len(source.encode()):>8} {len(release):>8}  {len(folded):>6}  {inlined:>7}")
+
+    saving = (1 - total_release / total_source) * 100
+    print(f"{'total':<12} {total_source:>8} {total_release:>8}  ({saving:.1f}% smaller{', debug build' if debug else ''})")
+    print(f"Release and source maps written to {RELEASE_DIR}")
+
+    if "--publish" in sys.argv:
+        publish(releases)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+Host Stand-in for MicroPython's rp2 Module
+
+Enough of rp2 for ledstrip.PioStrip to run under CPython, e.g. to test the
+compositor and output path on a computer. PIO programs are run the way the
+real asm_pio runs them, with nothing but the PIO names as globals, and their
+instructions recorded rather than encoded. DMA transfers into a state
+machine's TX FIFO complete at once: each transfer is recorded in that
+StateMachine's frames.
+
+Scripts in buildscripts/ pick it up automatically; elsewhere, put this
+directory on sys.path before importing ledstrip.
+"""
+
+import types
+
+PIO0_BASE = 0x50200000
+PIO_BLOCK_SIZE = 0x100000
+PIO_TXF0 = 0x010
+DMA_CHANNELS = 16
+
+class PIO:
+    OUT_LOW = 0
+    OUT_HIGH = 1
+    IN_LOW = 0
+    IN_HIGH = 1
+    SHIFT_LEFT = 0
+    SHIFT_RIGHT = 1
+
+PIO_OPERANDS = ("gpio", "pin", "x", "y", "null", "isr", "osr", "pc", "exec", "status",
+                "pins", "pindirs", "not_x", "not_y", "x_dec", "y_dec", "x_not_y", "not_osre",
+                "clear", "rel", "invert", "reverse", "block", "noblock", "iffull", "ifempty")
+PIO_INSTRUCTIONS = ("nop", "jmp", "wait", "in_", "out", "push", "pull", "mov", "irq", "set", "word")
+PIO_MAX_INSTRUCTIONS = 32
+PIO_MAX_DELAY = 31
+
+class PIOASMError(Exception):
+    pass
+
+class Instruction:
+    """One recorded PIO instruction; .side(), .delay() and [cycles] set its fields"""
+    def __init__(self, op, args):
+        self.op = op
+        self.args = args
+        self.sideset = None
+        self.cycles = 0
+
+    def side(self, value):
+        self.sideset = value
+        return self
+
+    def delay(self, cycles):
+        if not 0 <= cycles <= PIO_MAX_DELAY:
+            raise PIOASMError(f"delay {cycles} out of range")
+        self.cycles = cycles
+        return self
+
+    def __getitem__(self, cycles):
+        return self.delay(cycles)
+
+def asm_pio(**options):
+    """
+    Run the program function with only the PIO names in scope, like
+    MicroPython does, and keep its instructions and options on it
+    """
+    def program(function):
+        instructions = []
+        labels = {}
+        names = {name: name for name in PIO_OPERANDS}
+
+        def emitter(op):
+            def emit(*args):
+                instruction = Instruction(op, args)
+                instructions.append(instruction)
+                return instruction
+            return emit
+
+        for op in PIO_INSTRUCTIONS:
+            names[op] = emitter(op)
+        names["label"] = lambda name: labels.__setitem__(name, len(instructions))
+        names["wrap_target"] = lambda: labels.__setitem__("_wrap_target", len(instructions))
+        names["wrap"] = lambda: labels.__setitem__("_wrap", len(instructions))
+
+        types.FunctionType(function.__code__, names, function.__name__, None, function.__closure__)()
+
+        if not 0 < len(instructions) <= PIO_MAX_INSTRUCTIONS:
+            raise PIOASMError(f"{len(instructions)} instructions")
+        for instruction in instructions:
+            target = instruction.args[-1] if instruction.op == "jmp" else None
+            if isinstance(target, str) and target not in labels:
+                raise PIOASMError(f"unknown label {target!r}")
+        function.options = options
+        function.instructions = instructions
+        function.labels = labels
+        return function
+    return program
+
+class StateMachine:
+    """A state machine that records what DMA writes into its TX FIFO"""
+    machines = {}
+
+    def __init__(self, id, program=None, freq=None, **kwargs):
+        if id in StateMachine.machines:
+            raise OSError("state machine in use")
+        self.id = id
+        self.program = program
+        self.freq = freq
+        self.kwargs = kwargs
+        self.running = False
+        self.frames = []
+        StateMachine.machines[id] = self
+
+    def active(self, value=None):
+        if value is None:
+            return self.running
+        self.running = bool(value)
+
+    def put(self, value, shift=0):
+        self.frames.append(bytes(value) if not isinstance(value, int) else bytes([value >> shift & 0xFF]))
+
+    @staticmethod
+    def at_txf(address):
+        """The state machine whose TX FIFO is at address"""
+        offset = address - PIO0_BASE
+        return StateMachine.machines.get(offset // PIO_BLOCK_SIZE * 4 + (offset % PIO_BLOCK_SIZE - PIO_TXF0) // 4)
+
+class DMA:
+    """A DMA channel whose transfers finish as soon as they are triggered"""
+    in_use = 0
+
+    def __init__(self):
+        if DMA.in_use >= DMA_CHANNELS:
+            raise OSError("no free DMA channel")
+        DMA.in_use += 1
+        self.open = True
+        self.transfers = 0
+        self.read = self.write = self.count = self.ctrl = None
+
+    def pack_ctrl(self, size=2, inc_read=True, inc_write=True, treq_sel=0x3F, **kwargs):
+        return {"size": size, "inc_read": inc_read, "inc_write": inc_write, "treq_sel": treq_sel}
+
+    def config(self, read=None, write=None, count=None, ctrl=None, trigger=False):
+        self.read, self.write, self.count, self.ctrl = read, write, count, ctrl
+        if trigger:
+            self._transfer()
+
+    def _transfer(self):
+        sm = StateMachine.at_txf(self.write)
+        if sm is None or not sm.running:
+            raise OSError("DMA write target isn't a running state machine")
+        size = 1 << self.ctrl["size"]
+        sm.frames.append(bytes(self.read[:self.count * size]))
+        self.transfers += 1
+
+    def active(self, value=None):
+        return False
+
+    def close(self):
+        if self.open:
+            self.open = False
+            DMA.in_use -= 1
@@ -0,0 +1,132 @@
+"""
+LED Matrix Controller - Configuration
+
+Every module does `from config import *`, so settings live in one place.
+"""
+
+# --------------------------------------------------------------------------------
+# Hardware Configuration
+# --------------------------------------------------------------------------------
+LED_PIN = 0
+BUTTON_PIN = 11
+# Panel geometry: the 8x8 picture is scaled up by whole pixels and centered on bigger panels
+PANEL_WIDTH = 8                 # LEDs per row, as the panel is built
+PANEL_HEIGHT = 8                # LEDs per column
+PANEL_WIRING = "rows"           # LED chain order: "rows", "rows_serpentine", "columns",
+                                # "columns_serpentine" or "tiles" (chained 8x8 row-major panels)
+PANEL_ROTATION = 0              # Degrees the panel is mounted turned clockwise: 0, 90, 180 or 270
+NUM_LEDS = PANEL_WIDTH * PANEL_HEIGHT
+# Output zones chained after the matrix on the same strip, as (name, LED count)
+EXTRA_ZONES = ()                # e.g. (("back", 1),) for a status LED on the back
+ZONE_LEVEL = 255                # Brightness level of solid color zones such as the back LED
+BRIGHTNESS = 148                # Perceived brightness level 0-255 (148 drives the LEDs at ~30%)
+GAMMA = 2.2                     # LED response curve applied by the brightness tables
+POWER_LIMIT_MA = 750            # LED current budget in mA, within a 1 A USB supply (0 = no limit)
+LED_CHANNEL_MA = 20             # mA of one LED color channel at full drive
+LED_IDLE_MA = 1                 # mA each LED draws while dark
+PIO_OUTPUT_ENABLED = True       # Send frames with PIO and DMA on RP2 boards (False = neopixel)
+PIO_STATE_MACHINE = 0           # State machine for the LEDs: 0-3 on PIO0, 4-7 on PIO1
+# Use 0 for mechanical button (pressed = low)
+# Use 1 for TTP223 touch sensor in AB=00 mode (touched = high)
+BUTTON_PRESSED_VALUE = 1
+
+# --------------------------------------------------------------------------------
+# Timing Configuration
+# --------------------------------------------------------------------------------
+# Button press timing
+LONG_PRESS_TIME = 700           # 0.7 seconds for mode switching
+CHARACTER_SELECT_TIME = 3000    # 3 seconds for character selection
+FORCE_UPDATE_TIME = 6000        # 6 seconds for force update
+BUTTON_DISCONNECT_THRESHOLD = 200  # Check at boot if button is disconnected
+BUTTON_POLL_TIME = 10           # ms between button reads
+
+# Features
+POMODORO_ENABLED = False # Enable or disable Pomodoro functionality
+DEBUG = True             # Diagnostic prints and `if DEBUG:` blocks - release builds drop them
+
+# Boot profiler (see profiler.py)
+BOOT_PROFILE_ENABLED = True     # Record where the time goes between power-on and the first frame
+BOOT_PROFILE_FILE = "boot.prof" # Timelines of the last boots
+BOOT_PROFILE_BOOTS = 8          # Boots kept in BOOT_PROFILE_FILE
+
+# Coffee combo detection
+COFFEE_COMBO_TAPS = 3           # Number of rapid taps needed
+RAPID_TAP_THRESHOLD = 200       # Max 300ms between taps
+COMBO_TIMEOUT = 1000           # 2 seconds to complete combo
+
+# Animation and timeout durations
+INTRO_DURATION = 1000           # 1 second for intro animations
+PRERENDER_FRAMES = 16           # Max finished LED frames kept for the character on screen
+PRERENDER_MIN_FREE = 16384      # Render live instead of caching frames below this much free memory
+STREAM_RING_FRAMES = 8          # Frame buffers per animation streamed from flash
+POMODORO_SETUP_TIMEOUT = 5000   # 5 seconds before auto-starting pomodoro
+
+# Scheduler
+FRAME_TIME = 10                 # ms between display frames
+SCHEDULER_RESOLUTION = 10       # ms per timer wheel slot
+SCHEDULER_SLOTS = 128           # Slots per wheel revolution (1.28 seconds)
+WALLCLOCK_RECHECK = 3600000     # Re-read the RTC at least once an hour
+
+# Scheduled update window (03:00-03:45)
+UPDATE_WINDOW_HOUR = 3
+UPDATE_WINDOW_MINUTES = 45
+UPDATE_STAGGER_MINUTES = 40     # Devices spread their checks over the first 40 minutes
+UPDATE_RETRY_JITTER = 60        # Max extra seconds added to a server Retry-After
+
+# GitHub OTA Update Configuration
+FORCE_UPDATE = True  # Set this to True to force update regardless of version
+WIFI_TIMEOUT_SECONDS = 10    # Seconds to wait before timeout
+WIFI_DISCONNECT_AFTER_USE = True  # Disconnect from WiFi after use
+NET_SESSION_BUDGET = 120000  # Shared time budget for all jobs in one radio window
+NET_SESSION_LINGER = 3000    # Keep the radio up this long for follow-up jobs
+
+# LAN peer firmware cache (opt-in)
+PEER_CACHE_ENABLED = False   # Share verified firmware with other devices on the LAN
+PEER_HTTP_PORT = 8266        # Port the firmware is served on
+PEER_UDP_PORT = 8267         # Port for discovery queries and announcements
+PEER_BROADCAST_ADDR = "255.255.255.255"
+PEER_DISCOVERY_TIME = 1500   # ms to collect announcements before falling back to origin
+PEER_TIMEOUT = 5             # Seconds a peer transfer may stall before it is dropped
+PEER_SERVE_CHUNK = 1024      # Bytes sent to a peer per network task step
+
+# Network job priorities (lower runs first)
+NET_PRIORITY_TIME = 0
+NET_PRIORITY_MANIFEST = 1
+NET_PRIORITY_NORMAL = 2
+NET_PRIORITY_DOWNLOAD = 3
+
+# Dual-core networking (see dualcore.py)
+NET_DUAL_CORE = False        # Run network jobs on the second core; False runs them in the network task
+NET_QUEUE_SIZE = 8           # Messages each way between the cores
+NET_STEP_PERIOD = 20         # ms between network session steps (network task, or core 1)
+NET_WORKER_STACK = 16384     # Stack bytes for the network core (TLS needs more than the default)
+CURRENT_VERSION = "1.0.17"
+GITHUB_USER = "underverket"
+GITHUB_REPO = "dnd"
+# Module firmware manifest; firmware.json is kept for single-file devices (see bootstrap.py)
+UPDATE_URL = f"http://raw.githubusercontent.com/{GITHUB_USER}/{GITHUB_REPO}/main/manifest.json"
+ASSET_PACK_FILE = "assets.bin"  # Binary character/icon pack written by build.py
+CHARACTER_CACHE_SIZE = 4        # Decoded characters kept per catalog (current, prev, next + 1)
+CHARACTER_PREFETCH_DELAY = 150  # ms after a browse press before neighbours are decoded
+ASSET_CHECK_INTERVAL = 21600000 # Check for a new asset pack every 6 hours...
+ASSET_CHECK_JITTER = 1800000    # ...plus up to 30 minutes per device
+MANIFEST_CACHE = "manifest.cache"  # Last manifest and its ETag, for conditional requests
+
+# HTTP client
+HTTP_TIMEOUT = 10            # Socket connect/read timeout in seconds
+HTTP_MAX_REDIRECTS = 3
+DOWNLOAD_BUFFER_SIZE = 512   # Reused buffer for streaming downloads to flash
+
+# --------------------------------------------------------------------------------
+# Device Identity
+# --------------------------------------------------------------------------------
+def device_hash(salt=""):
+    """
+    Stable 32-bit FNV-1a hash of the unique machine ID, optionally salted.
+    Used to give every device its own deterministic slot in fleet-wide events.
+    """
+    import machine  # Not at the top, so config also imports on a computer (see profiler.py)
+    h = 0x811C9DC5
+    for b in machine.unique_id() + salt.encode():
+        h = ((h ^ b) * 0x01000193) & 0xFFFFFFFF
+    return h
@@ -0,0 +1,573 @@
+"""
+LED Matrix Controller - Display Core
+
+Sprite decoding, animation frames and character rendering.
+"""
+import time
+import gc
+import binascii
+
+from config import *
+import kernels
+
+# --------------------------------------------------------------------------------
+# Color Pipeline
+# --------------------------------------------------------------------------------
+# Colors are (r, g, b) at full scale. Drawing turns them into LED drive values
+# through the gamma-corrected table of a brightness level (0-255, perceived),
+# so a frame only does table lookups.
+_level_tables = {}
+
+def level_table(level):
+    """LED drive value for each channel value 0-255 at a brightness level"""
+    table = _level_tables.get(level)
+    if table is None:
+        scale = level / (255 * 255)
+        table = _level_tables[level] = bytes(round(255 * (c * scale) ** GAMMA) for c in range(256))
+    return table
+
+def scale_color(color, level=BRIGHTNESS):
+    """A full scale color as LED drive values (r, g, b)"""
+    table = level_table(level)
+    return (table[color[0]], table[color[1]], table[color[2]])
+
+def grb(color, level=BRIGHTNESS):
+    """A full scale color as one 0xGGRRBB int for the kernels"""
+    table = level_table(level)
+    return table[color[1]] << 16 | table[color[0]] << 8 | table[color[2]]
+
+# --------------------------------------------------------------------------------
+# Character Definition and Processing
+# --------------------------------------------------------------------------------
+def sprite_bpp(colors):
+    """Bits per pixel of a sprite using this many colors (plus transparent)"""
+    return 1 if colors < 2 else 2 if colors < 4 else 4
+
+def unpack_sprite(data, bpp, out, offset=0):
+    """
+    Unpack a palette-indexed 8x8 sprite starting at data[offset] into out, one
+    index per byte. Pixels are packed row by row, the first in the high bits.
+    """
+    per_byte = 8 // bpp
+    mask = (1 << bpp) - 1
+    for i in range(64):
+        out[i] = (data[offset + i // per_byte] >> (8 - bpp * (i % per_byte + 1))) & mask
+
+def decode_sprite(data):
+    """
+    Unpack a palette-indexed 8x8 sprite (hex str or bytes) to 64 palette
+    indices, row by row. The bits per pixel follow from the length: 8, 16 or
+    32 bytes for 1, 2 or 4 bpp. Index 0 is transparent.
+    """
+    if isinstance(data, str):
+        data = binascii.unhexlify(data)
+    indices = bytearray(64)
+    unpack_sprite(data, len(data) // 8, indices)
+    return indices
+
+class DeltaFrames:
+    """
+    Animation frames stored as a keyframe followed by XOR deltas, decoded one
+    frame at a time as the animation advances.
+
+    Each frame starts with a count byte: 0xFF is a keyframe (a packed sprite
+    follows), anything else is that many changed pixels - one byte each
+    (xor << 6 | position) at 1-2 bpp, two bytes (position, xor) at 4 bpp.
+    XOR deltas undo themselves, so stepping back is as cheap as stepping forward.
+    """
+    KEYFRAME = 0xFF
+
+    def __init__(self, data, colors):
+        if isinstance(data, str):
+            data = binascii.unhexlify(data)
+        self.data = data
+        self.colors = colors  # Palette index per frame color
+        self.bpp = sprite_bpp(len(colors))
+
+        self.offsets = []
+        step = 2 if self.bpp == 4 else 1
+        pos = 0
+        while pos < len(data):
+            self.offsets.append(pos)
+            count = data[pos]
+            pos += 1 + (8 * self.bpp if count == self.KEYFRAME else count * step)
+
+        self.indices = bytearray(64)
+        self.frame = -1
+        self.seek(0)
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def seek(self, frame):
+        """Move to frame and return its 64 frame color indices (see colors)."""
+        if frame == self.frame:
+            return self.indices
+
+        if frame < self.frame:
+            while self.frame > frame and self.data[self.offsets[self.frame]] != self.KEYFRAME:
+                self._apply(self.frame)
+                self.frame -= 1
+            if self.frame > frame:
+                self.frame = -1  # Can't step back past a keyframe, replay from the start
+        while self.frame < frame:
+            self.frame += 1
+            self._apply(self.frame)
+        return self.indices
+
+    def _apply(self, frame):
+        data = self.data
+        pos = self.offsets[frame]
+        count = data[pos]
+        pos += 1
+        if count == self.KEYFRAME:
+            unpack_sprite(data, self.bpp, self.indices, pos)
+        elif self.bpp == 4:
+            for p in range(pos, pos + 2 * count, 2):
+                self.indices[data[p]] ^= data[p + 1]
+        else:
+            for p in range(pos, pos + count):
+                self.indices[data[p] & 63] ^= data[p] >> 6
+
+class StreamFrames:
+    """
+    Animation frames streamed from flash, for sequences too long to keep in RAM.
+
+    Frames are packed sprites of a fixed size at offset in the file, so any
+    frame can be found directly. A ring of preallocated buffers is refilled
+    with readinto() ahead of playback, half a ring at a time, and frame 0 -
+    shown between cycles - is kept for good. Memory use doesn't depend on the
+    length of the animation.
+    """
+    def __init__(self, path, offset, count, colors, ring=STREAM_RING_FRAMES):
+        self.path = path
+        self.offset = offset
+        self.count = count
+        self.colors = colors
+        self.size = 8 * sprite_bpp(len(colors))
+        self.ring = [bytearray(self.size) for _ in range(min(ring, count))]
+        self.start = 0  # The ring holds frames start..end-1, frame n in ring[n % len(ring)]
+        self.end = 0
+        self.first = bytearray(self.size)
+        self.indices = bytearray(64)
+        self.frame = -1
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            f.readinto(self.first)
+        self.seek(0)
+
+    def __len__(self):
+        return self.count
+
+    def seek(self, frame):
+        """Move to frame and return its 64 frame color indices (see colors)."""
+        if frame == self.frame:
+            return self.indices
+
+        if frame == 0:
+            data = self.first
+        else:
+            if not self.start <= frame < self.end:
+                self._fill(frame, frame)  # Jumped outside the ring, read right away
+            elif self.end - frame <= len(self.ring) // 2 and self.end < self.count:
+                self._fill(frame, self.end)  # Past half way, read ahead
+            data = self.ring[frame % len(self.ring)]
+
+        unpack_sprite(data, self.size // 8, self.indices)
+        self.frame = frame
+        return self.indices
+
+    def _fill(self, start, read_from):
+        """Make the ring hold frames from start on, reading those from read_from onwards."""
+        end = min(start + len(self.ring), self.count)
+        with open(self.path, 'rb') as f:
+            f.seek(self.offset + read_from * self.size)
+            for frame in range(read_from, end):
+                f.readinto(self.ring[frame % len(self.ring)])
+        self.start = start
+        self.end = end
+
+class CharacterDefinition:
+    """Process compressed character definitions into pixel data"""
+    # Decoded images that several assets share, keyed by their data
+    shared = {}
+
+    @staticmethod
+    def create_character(data):
+        """
+        Convert a compressed sprite definition into processed pixel data.
+
+        The palette holds 'body', 'hl' and 'sdw' (colored from the mode at render
+        time) and fixed (r, g, b) colors. The image is 64 palette indices, with
+        index 1 being the first palette entry. Animation frames are decoded
+        lazily by DeltaFrames, into indices of the animation's own colors.
+        """
+        image = data['image']
+        if data.get('shared_image'):
+            indices = CharacterDefinition.shared.get(image)
+            if indices is None:
+                indices = CharacterDefinition.shared[image] = decode_sprite(image)
+        else:
+            indices = decode_sprite(image)
+
+        character = {
+            'id': data['id'],
+            'name': data['name'],
+            'palette': [None] + list(data['palette']),  # Index 0 is transparent
+            'image': indices
+        }
+
+        # Add body_color if present
+        if 'body_color' in data:
+            character['body_color'] = data['body_color']
+
+        # Process animations - handle list format
+        if 'animations' in data:
+            character['animations'] = []
+            for anim in data['animations']:
+                # Frame data, or (path, offset, count) for an animation streamed from flash
+                if isinstance(anim[3], tuple):
+                    path, offset, count = anim[3]
+                    frames = StreamFrames(path, offset, count, anim[4])
+                else:
+                    frames = DeltaFrames(anim[3], anim[4])
+
+                # Process list format
+                processed_anim = {
+                    'name': anim[0],                # Index 0: name
+                    'interval': anim[1],            # Index 1: interval
+                    'frame_duration': anim[2],      # Index 2: frame_duration
+                    'frames': frames,               # Index 3: frames, Index 4: frame colors
+                    'reverse': anim[5]              # Index 5: reverse
+                }
+                character['animations'].append(processed_anim)
+
+        return character
+
+# --------------------------------------------------------------------------------
+# Power Limiting
+# --------------------------------------------------------------------------------
+class PowerBudget:
+    """
+    Estimates the LED current of each frame from its channel values and dims
+    frames that would draw more than the budget, before they are written.
+    """
+    def __init__(self, leds=NUM_LEDS, limit_ma=POWER_LIMIT_MA):
+        self.leds = leds
+        # Highest channel value sum within the budget, after the idle current
+        self.limit_sum = max(0, limit_ma - leds * LED_IDLE_MA) * 255 // LED_CHANNEL_MA if limit_ma else 0
+        self.frame_ma = 0  # Estimate of the last frame as rendered, for telemetry
+        self.limited = 0   # Frames dimmed so far
+
+    def apply(self, buf):
+        """
+        Update frame_ma for the LED buffer and scale it down in place if it is
+        over budget. Returns True if it was scaled.
+        """
+        n = len(buf)
+        total = kernels.channel_sum(buf, n)
+        self.frame_ma = self.leds * LED_IDLE_MA + total * LED_CHANNEL_MA // 255
+        if self.limit_sum and total > self.limit_sum:
+            kernels.scale(buf, n, self.limit_sum * 256 // total)
+            self.limited += 1
+            return True
+        return False
+
+# --------------------------------------------------------------------------------
+# Output Zones
+# --------------------------------------------------------------------------------
+class SolidZone:
+    """Zone producer showing one color on all its LEDs, e.g. a status LED."""
+    def __init__(self, level=ZONE_LEVEL):
+        self.level = level
+        self.color = None
+        self.value = (0, 0, 0)
+
+    def set(self, color):
+        """Change the color; returns True if the zone needs redrawing."""
+        if color == self.color:
+            return False
+        self.color = color
+        self.value = scale_color(color, self.level)
+        return True
+
+    def __call__(self, buf, start, count):
+        r, g, b = self.value
+        for d in range(start * 3, (start + count) * 3, 3):
+            buf[d] = g
+            buf[d + 1] = r
+            buf[d + 2] = b
+
+# --------------------------------------------------------------------------------
+# Panel Geometry
+# --------------------------------------------------------------------------------
+def led_index(row, col, width=PANEL_WIDTH, height=PANEL_HEIGHT, wiring=PANEL_WIRING):
+    """Position along the LED chain of the LED at (row, col) of the panel as built."""
+    if wiring == "rows":
+        return row * width + col
+    if wiring == "rows_serpentine":
+        return row * width + (col if row % 2 == 0 else width - 1 - col)
+    if wiring == "columns":
+        return col * height + row
+    if wiring == "columns_serpentine":
+        return col * height + (row if col % 2 == 0 else height - 1 - row)
+    if wiring == "tiles":
+        return (col // 8) * 8 * height + row * 8 + col % 8
+    raise ValueError(f"Unknown PANEL_WIRING: {wiring}")
+
+def panel_map(width=PANEL_WIDTH, height=PANEL_HEIGHT, wiring=PANEL_WIRING, rotation=PANEL_ROTATION):
+    """
+    The canvas pixel (row * 8 + col) each LED shows, 255 for LEDs outside the
+    scaled and centered 8x8 picture. None when the panel shows the canvas as is.
+    """
+    # Size as seen, after the mounting rotation
+    seen_width, seen_height = (height, width) if rotation in (90, 270) else (width, height)
+    scale = max(1, min(seen_width // 8, seen_height // 8))
+    left = (seen_width - 8 * scale) // 2
+    top = (seen_height - 8 * scale) // 2
+
+    panel = bytearray(b'\xff' * (width * height))
+    for y in range(seen_height):
+        for x in range(seen_width):
+            if not (0 <= y - top < 8 * scale and 0 <= x - left < 8 * scale):
+                continue
+            canvas_row, canvas_col = (y - top) // scale, (x - left) // scale
+            # Where that point of the view is on the panel as built
+            if rotation == 90:
+                row, col = height - 1 - x, y
+            elif rotation == 180:
+                row, col = height - 1 - y, width - 1 - x
+            elif rotation == 270:
+                row, col = x, width - 1 - y
+            else:
+                row, col = y, x
+            panel[led_index(row, col, width, height, wiring)] = canvas_row * 8 + canvas_col
+
+    if panel == bytearray(range(64)):
+        return None
+    return panel
+
+def wheel_lut(level, cache=[None, None]):
+    """Character._wheel colors of hues 0-255 at a brightness level, as GRB bytes"""
+    if cache[0] != level:
+        table = level_table(level)
+        lut = bytearray(256 * 3)
+        for hue in range(256):
+            r, g, b = Character._wheel(hue)
+            lut[hue * 3] = table[g]
+            lut[hue * 3 + 1] = table[r]
+            lut[hue * 3 + 2] = table[b]
+        cache[0] = level
+        cache[1] = lut
+    return cache[1]
+
+def pack_palette(out, colors, mapping=None):
+    """
+    Write resolved colors into a kernels palette buffer, flagging None (rainbow)
+    entries. mapping gives the palette index of each animation frame color.
+    """
+    p = 4
+    for index in mapping or range(1, len(colors)):
+        color = colors[index]
+        if color is None:
+            out[p + 3] = 1
+        else:
+            out[p] = color[1]
+            out[p + 1] = color[0]
+            out[p + 2] = color[2]
+            out[p + 3] = 0
+        p += 4
+
+def pack_diagonal(out, lut, hue, step):
+    """Write the rainbow colors of the 15 diagonals into a kernels palette buffer"""
+    p = kernels.PALETTE_DIAGONAL
+    for diagonal in range(15):
+        s = (hue + diagonal * step) % 255 * 3
+        out[p:p + 3] = lut[s:s + 3]
+        p += 3
+
+class Character:
+    # Palette roles that take their color from the mode (or body color)
+    ROLES = ('body', 'hl', 'sdw')
+
+    # Set smoothness of gradient (Lower = smoother)
+    RAINBOW_STEP = 6
+
+    # Palette buffer for the render kernels, refilled for every sprite drawn
+    _palette = bytearray(kernels.PALETTE_SIZE)
+
+    # Finished LED buffers for static modes, keyed by animation frame numbers.
+    # Shared by all characters and only valid for _prerendered_key.
+    _prerendered = {}
+    _prerendered_key = None
+
+    def __init__(self, data):
+        self.id = data['id']
+        self.name = data['name']
+        self.palette = data['palette']
+        self.image = data['image']
+        self.rainbow_offset = 0
+
+        # Animation handling
+        self.animations = {}
+
+        # Store custom body color if present
+        if 'body_color' in data:
+            self.body_color = data['body_color']
+
+        # Process animations if they exist in the data
+        if 'animations' in data:
+            for anim in data['animations']:
+                self.animations[anim['name']] = {
+                    'interval': anim['interval'],
+                    'frame_duration': anim['frame_duration'],
+                    'reverse': anim.get('reverse', False),
+                    'frames': anim['frames'],
+                    'last_trigger': time.ticks_ms(),
+                    'current_frame': 0,
+                    'direction': 1
+                }
+
+    def _animation_frames(self, current_time):
+        """Return the current frame number of every animation, as a tuple"""
+        frame_numbers = []
+
+        for anim_name, anim in self.animations.items():
+            # Check time since last trigger
+            time_since_trigger = time.ticks_diff(current_time, anim['last_trigger'])
+
+            # If we haven't reached the interval yet, show first frame
+            if time_since_trigger < anim['interval']:
+                frame_numbers.append(0)
+                continue
+
+            # Calculate which frame to show
+            animation_duration = anim['frame_duration'] * len(anim['frames'])
+            time_into_interval = time_since_trigger % anim['interval']
+
+            if time_into_interval < animation_duration:
+                frame_number = (time_into_interval // anim['frame_duration'])
+                if frame_number >= len(anim['frames']):
+                    frame_number = 0
+            else:
+                frame_number = 0
+
+            frame_numbers.append(frame_number)
+
+        return tuple(frame_numbers)
+
+    def render(self, mode, np, brightness=BRIGHTNESS, row_offset=0, selection_color=None):
+        """
+        Render the character and its animations through the palette. Static
+        modes (no rainbow, no scrolling) are rendered once per animation frame
+        and then copied straight into the LED buffer.
+        """
+        # Determine what color to use for rendering
+        render_color = selection_color
+        if not render_color:
+            # Check if this character/icon has a custom body color
+            if hasattr(self, 'body_color'):
+                render_color = self.body_color
+
+        # Resolve the palette once per frame instead of coloring every pixel
+        rainbow = not render_color and mode == 'social'
+        if rainbow:
+            # Set speed of rainbow effect
+            self.rainbow_offset = (self.rainbow_offset + 3) % 255
+        frame_numbers = self._animation_frames(time.ticks_ms())
+
+        static = not rainbow and row_offset == 0
+        if static:
+            key = (self, mode, render_color, brightness)
+            if key != Character._prerendered_key:
+                # Character, mode or brightness changed
+                Character._prerendered = {}
+                Character._prerendered_key = key
+            frame = Character._prerendered.get(frame_numbers)
+            if frame:
+                np.buf[:] = frame
+                np.write()
+                return
+
+        buf = np.buf
+        kernels.fill(buf, len(buf), 0)
+        colors = self._resolve_palette(mode, brightness, render_color, rainbow)
+        palette = Character._palette
+        if rainbow:
+            pack_diagonal(palette, wheel_lut(brightness), self.rainbow_offset, self.RAINBOW_STEP)
+
+        # Render base character first
+        pack_palette(palette, colors)
+        kernels.blit(buf, self.image, palette, row_offset)
+
+        # Then overlay animation pixels, through the palette entries of their colors
+        for anim, frame_number in zip(self.animations.values(), frame_numbers):
+            frames = anim['frames']
+            indices = frames.seek(frame_number)
+            pack_palette(palette, colors, frames.colors)
+            kernels.blit(buf, indices, palette, row_offset)
+
+        if static:
+            if hasattr(gc, 'mem_free') and gc.mem_free() < PRERENDER_MIN_FREE:  # Not on CPython
+                Character._prerendered = {}  # Memory is tight, keep rendering live
+            elif len(Character._prerendered) < PRERENDER_FRAMES:
+                Character._prerendered[frame_numbers] = bytes(np.buf)
+
+        np.write()
+
+    def _resolve_palette(self, mode, brightness, override_color=None, rainbow=False):
+        """
+        Map each palette entry to a final LED color at brightness (a level
+        0-255). Mode-relative entries are None when rainbow is set, as their
+        color then depends on the position.
+        """
+        base_colors = {
+            'available': (0, 255, 0),  # Green
+            'busy': (255, 0, 0),      # Red
+        }
+        base_color = override_color if override_color else base_colors.get(mode, (255, 255, 255))
+
+        colors = [None]
+        for entry in self.palette[1:]:
+            if entry not in self.ROLES:
+                color = entry
+            elif rainbow:
+                colors.append(None)
+                continue
+            elif entry == 'hl':
+                color = tuple(min(255, c + 50) for c in base_color)
+            elif entry == 'sdw':
+                color = tuple(c * 3 // 10 for c in base_color)
+            else:  # 'body'
+                color = base_color
+            colors.append(scale_color(color, brightness))
+        return colors
+
+    @staticmethod
+    def _wheel(pos):
+        """Generate rainbow colors with softer tones."""
+        # Minimum value creates the "softness" - higher = softer colors
+        min_value = 10  # Try values between 50-100
+        # Max value stays at 255 but the difference between min and max is smaller
+        max_value = 255
+        
+        if pos < 85:
+            return (
+                min_value + int(pos * 3 * (max_value-min_value)/255), 
+                min_value + int((255 - pos * 3) * (max_value-min_value)/255), 
+                min_value
+            )
+        elif pos < 170:
+            pos -= 85
+            return (
+                min_value + int((255 - pos * 3) * (max_value-min_value)/255), 
+                min_value, 
+                min_value + int(pos * 3 * (max_value-min_value)/255)
+            )
+        else:
+            pos -= 170
+            return (
+                min_value, 
+                min_value + int(pos * 3 * (max_value-min_value)/255), 
+                min_value + int((255 - pos * 3) * (max_value-min_value)/255)
+            )
@@ -0,0 +1,189 @@
+"""
+LED Matrix Controller - Dual-Core Networking
+
+With NET_DUAL_CORE on, the NetworkSession (WiFi association, NTP sync, asset
+and firmware downloads) runs on the second core, started with _thread, so
+network I/O never holds up rendering and buttons on core 0. The RP2 port has
+no GIL, so the cores share nothing but two lock-protected, fixed-size queues:
+  commands  core 0 -> core 1: register, hold, release, close
+  events    core 1 -> core 0: job results, failures and progress, radio state
+
+Job run functions execute on core 1 and must not touch the LEDs or states;
+their on_done/on_fail/on_progress callbacks are delivered on core 0 from the
+network task. Everything a job imports is imported on core 0 before the job is
+queued (main.preload_network), so core 1 never changes sys.modules.
+
+Without _thread, or if the worker can't start, the session stays on core 0.
+On a computer _thread gives real threads, so this runs unchanged under CPython.
+"""
+import time
+
+from config import *
+
+try:
+    import _thread
+except ImportError:
+    _thread = None
+
+if hasattr(time, 'sleep_ms'):
+    ticks_ms = time.ticks_ms
+    sleep_ms = time.sleep_ms
+else:  # CPython
+    def ticks_ms():
+        return time.monotonic_ns() // 1000000
+
+    def sleep_ms(ms):
+        time.sleep(ms / 1000)
+
+class MessageQueue:
+    """Fixed-size ring of messages that one core puts and the other gets."""
+    def __init__(self, size=NET_QUEUE_SIZE):
+        self.slots = [None] * size
+        self.head = 0   # Oldest message
+        self.count = 0
+        self.lock = _thread.allocate_lock()
+
+    def put(self, message):
+        """Append message; returns False, leaving the queue as is, if it's full."""
+        with self.lock:
+            if self.count == len(self.slots):
+                return False
+            self.slots[(self.head + self.count) % len(self.slots)] = message
+            self.count += 1
+            return True
+
+    def get(self):
+        """Remove and return the oldest message, or None if the queue is empty."""
+        with self.lock:
+            if not self.count:
+                return None
+            message = self.slots[self.head]
+            self.slots[self.head] = None
+            self.head = (self.head + 1) % len(self.slots)
+            self.count -= 1
+            return message
+
+class NetworkWorker:
+    """
+    Runs a NetworkSession on core 1. Core 0 uses it exactly like the session:
+    register, hold, release, close, is_connected and update (which delivers
+    core 1's events). Jobs call progress() from core 1.
+    """
+    def __init__(self, session, prepare=None):
+        self.session = session
+        self.prepare = prepare        # Called on core 0 before register and hold; raises to fail
+        self.commands = MessageQueue()
+        self.events = MessageQueue()
+        self.outbox = []              # Commands waiting for room in the queue (core 0)
+        self.sent = 0                 # Commands queued by core 0
+        self.applied = 0              # Commands applied by core 1
+        self.state = session.IDLE     # Radio state as last reported by core 1
+        self.running = True
+        session.deliver = self._post  # On core 1, job outcomes go to core 0
+        _thread.start_new_thread(self._run, ())
+
+    # ---- Core 0 ----
+    def register(self, name, run, priority=NET_PRIORITY_NORMAL, on_fail=None, on_done=None, on_progress=None):
+        if self._prepared(name, on_fail):
+            self._send(('register', (name, run, priority, on_fail, on_done, on_progress)))
+
+    def hold(self, name):
+        if self._prepared(name):
+            self._send(('hold', name))
+
+    def release(self, name):
+        self._send(('release', name))
+
+    def close(self):
+        self._send(('close', None))
+
+    def is_connected(self):
+        return self.state == self.session.ACTIVE
+
+    def update(self, current_time):
+        """Pass on waiting commands and deliver core 1's events (network task, core 0)."""
+        while self.outbox and self.commands.put(self.outbox[0]):
+            self.outbox.pop(0)
+        while True:
+            event = self.events.get()
+            if event is None:
+                break
+            job, kind, value = event
+            if kind == 'state':
+                value, applied = value
+                self.state = value
+                if value == self.session.IDLE and (self.outbox or applied != self.sent):
+                    continue  # A new job is on its way - keep the network code loaded
+            type(self.session).deliver(self.session, job, kind, value)
+
+    def stop(self):
+        """End the core 1 loop (used by tests; on the device it runs until reset)."""
+        self.running = False
+
+    def _prepared(self, name, on_fail=None):
+        if self.prepare:
+            try:
+                self.prepare()
+            except Exception as e:
+                print(f"Network job '{name}' failed: {e}")
+                if on_fail:
+                    on_fail(e)
+                return False
+        return True
+
+    def _send(self, command):
+        self.sent += 1
+        if self.outbox or not self.commands.put(command):
+            self.outbox.append(command)  # Keeps the order; retried by update()
+
+    # ---- Core 1 ----
+    def progress(self, value):
+        self.session.progress(value)
+
+    def _post(self, job, kind, value):
+        if kind == 'state':
+            value = (value, self.applied)
+        while not self.events.put((job, kind, value)):
+            if kind == 'progress':
+                return  # The next report supersedes it
+            sleep_ms(NET_STEP_PERIOD)
+
+    def _apply(self, command):
+        kind, arg = command
+        self.applied += 1  # Before any state change the command causes
+        if kind == 'register':
+            self.session.register(*arg)
+        elif kind == 'hold':
+            self.session.hold(arg)
+        elif kind == 'release':
+            self.session.release(arg)
+        elif kind == 'close':
+            self.session.close()
+
+    def _run(self):
+        while self.running:
+            try:
+                while True:
+                    command = self.commands.get()
+                    if command is None:
+                        break
+                    self._apply(command)
+                self.session.update(ticks_ms())
+            except Exception as e:
+                print(f"Network core error: {e}")
+            sleep_ms(NET_STEP_PERIOD)
+
+def start_worker(session, prepare=None):
+    """Move session to core 1; returns the worker, or session itself if that isn't possible."""
+    if _thread is None:
+        print("No _thread module, networking stays on core 0")
+        return session
+    try:
+        try:
+            _thread.stack_size(NET_WORKER_STACK)
+        except ValueError:  # Below CPython's minimum; its default is plenty
+            pass
+        return NetworkWorker(session, prepare)
+    except Exception as e:
+        print(f"Network core unavailable, networking stays on core 0: {e}")
+        return session
@@ -0,0 +1,176 @@
+"""
+LED Matrix Controller - Render Kernels
+
+The per-pixel loops of rendering, working directly on the 8x8 LED buffer
+(np.buf: 3 bytes per LED in G, R, B order, row by row). On MicroPython they
+are compiled to machine code with @micropython.viper; elsewhere (CPython on a
+computer) the equivalent Python versions are used. Both are always available
+under their _py/_viper names for buildscripts/bench_render.py.
+
+Drawing kernels work on the 8x8 canvas; present() copies it onto the panel's
+LED buffer through a geometry map (see display.panel_map).
+
+Viper functions take at most four arguments, so colors are passed as one
+0xGGRRBB int and palettes as a single buffer:
+  palette  4 bytes per index (G, R, B, rainbow flag) for indices 0-15, then
+           3 bytes (G, R, B) per diagonal (row + col, 0-14) at PALETTE_DIAGONAL.
+           Flagged indices take the color of their pixel's diagonal.
+"""
+import sys
+
+PALETTE_DIAGONAL = 64
+PALETTE_SIZE = PALETTE_DIAGONAL + 15 * 3
+
+def fill_py(buf, n, color):
+    """Set the LEDs in the first n channel values to color (0xGGRRBB)."""
+    buf[:n] = bytes((color >> 16, (color >> 8) & 0xFF, color & 0xFF)) * (n // 3)
+
+def blit_py(buf, indices, palette, row_offset):
+    """Draw 64 palette indices (0 = transparent) shifted down by row_offset rows."""
+    for i in range(64):
+        index = indices[i]
+        if index:
+            row = (i >> 3) + row_offset
+            if 0 <= row < 8:
+                col = i & 7
+                p = index * 4
+                if palette[p + 3]:
+                    p = PALETTE_DIAGONAL + (row + col) * 3
+                d = (row * 8 + col) * 3
+                buf[d:d + 3] = palette[p:p + 3]
+
+def rainbow_fill_py(buf, lut, hue, step):
+    """Fill with diagonal stripes from a 256-entry GRB lut, step hues apart."""
+    for row in range(8):
+        for col in range(8):
+            s = ((hue + (row + col) * step) & 0xFF) * 3
+            d = (row * 8 + col) * 3
+            buf[d:d + 3] = lut[s:s + 3]
+
+def blit_columns_py(buf, columns, start, color):
+    """Draw columns[start:start + 8] (bit n = row n) in color (0xGGRRBB)."""
+    grb = bytes((color >> 16, (color >> 8) & 0xFF, color & 0xFF))
+    for col in range(8):
+        bits = columns[start + col]
+        for row in range(8):
+            if bits & (1 << row):
+                d = (row * 8 + col) * 3
+                buf[d:d + 3] = grb
+
+def present_py(leds, canvas, panel, n):
+    """Show the canvas on n LEDs: panel holds the canvas pixel of each LED, 255 for none."""
+    for i in range(n):
+        s = panel[i] * 3
+        d = i * 3
+        if s == 765:
+            leds[d:d + 3] = b'\0\0\0'
+        else:
+            leds[d:d + 3] = canvas[s:s + 3]
+
+def channel_sum_py(buf, n):
+    """Sum of the first n channel values, for the power estimate."""
+    return sum(buf) if n == len(buf) else sum(buf[:n])
+
+def scale_py(buf, n, k):
+    """Scale the first n channel values by k/256."""
+    for i in range(n):
+        buf[i] = buf[i] * k >> 8
+
+VIPER = sys.implementation.name == 'micropython'
+
+if VIPER:
+    import micropython
+
+    @micropython.viper
+    def fill_viper(buf: ptr8, n: int, color: int):
+        g = (color >> 16) & 0xFF
+        r = (color >> 8) & 0xFF
+        b = color & 0xFF
+        for d in range(0, n, 3):
+            buf[d] = g
+            buf[d + 1] = r
+            buf[d + 2] = b
+
+    @micropython.viper
+    def blit_viper(buf: ptr8, indices: ptr8, palette: ptr8, row_offset: int):
+        for i in range(64):
+            index = int(indices[i])
+            if index:
+                row = (i >> 3) + row_offset
+                if row >= 0:
+                    if row < 8:
+                        col = i & 7
+                        p = index * 4
+                        if palette[p + 3]:
+                            p = 64 + (row + col) * 3  # PALETTE_DIAGONAL
+                        d = ((row << 3) + col) * 3
+                        buf[d] = palette[p]
+                        buf[d + 1] = palette[p + 1]
+                        buf[d + 2] = palette[p + 2]
+
+    @micropython.viper
+    def rainbow_fill_viper(buf: ptr8, lut: ptr8, hue: int, step: int):
+        for row in range(8):
+            for col in range(8):
+                s = ((hue + (row + col) * step) & 0xFF) * 3
+                d = ((row << 3) + col) * 3
+                buf[d] = lut[s]
+                buf[d + 1] = lut[s + 1]
+                buf[d + 2] = lut[s + 2]
+
+    @micropython.viper
+    def blit_columns_viper(buf: ptr8, columns: ptr8, start: int, color: int):
+        g = (color >> 16) & 0xFF
+        r = (color >> 8) & 0xFF
+        b = color & 0xFF
+        for col in range(8):
+            bits = int(columns[start + col])
+            for row in range(8):
+                if bits & (1 << row):
+                    d = ((row << 3) + col) * 3
+                    buf[d] = g
+                    buf[d + 1] = r
+                    buf[d + 2] = b
+
+    @micropython.viper
+    def present_viper(leds: ptr8, canvas: ptr8, panel: ptr8, n: int):
+        for i in range(n):
+            s = int(panel[i])
+            d = i * 3
+            if s == 255:
+                leds[d] = 0
+                leds[d + 1] = 0
+                leds[d + 2] = 0
+            else:
+                s = s * 3
+                leds[d] = canvas[s]
+                leds[d + 1] = canvas[s + 1]
+                leds[d + 2] = canvas[s + 2]
+
+    @micropython.viper
+    def channel_sum_viper(buf: ptr8, n: int) -> int:
+        total = 0
+        for i in range(n):
+            total += int(buf[i])
+        return total
+
+    @micropython.viper
+    def scale_viper(buf: ptr8, n: int, k: int):
+        for i in range(n):
+            buf[i] = (int(buf[i]) * k) >> 8
+
+    fill = fill_viper
+    blit = blit_viper
+    rainbow_fill = rainbow_fill_viper
+    blit_columns = blit_columns_viper
+    present = present_viper
+    channel_sum = channel_sum_viper
+    scale = scale_viper
+else:
+    fill = fill_py
+    blit = blit_py
+    rainbow_fill = rainbow_fill_py
+    blit_columns = blit_columns_py
+    present = present_py
+    channel_sum = channel_sum_py
+    scale = scale_py
@@ -0,0 +1,104 @@
+"""
+LED Matrix Controller - LED Strip Output
+
+Sends the strip buffer to the WS2812 LEDs. On RP2 boards a PIO state machine
+clocks the bits out, fed by DMA from a second buffer, so the next frame is
+rendered while the current one is still on the wire. Without rp2, with
+PIO_OUTPUT_ENABLED off, or when no state machine or DMA channel is free, the
+blocking neopixel driver is used instead.
+
+Both drivers have the part of the NeoPixel interface the compositor uses:
+buf (G, R, B bytes per LED), n and write().
+
+On a computer, buildscripts/rp2.py stands in for the rp2 module.
+"""
+import time
+
+from config import *
+
+try:
+    import rp2
+except ImportError:
+    rp2 = None
+
+PIO_FREQ = 8000000              # 10 PIO cycles per bit (see ws2812) at 800 kHz
+
+BYTE_US = 10                    # Wire time of one byte at 800 kHz
+RESET_US = 300                  # Low time that latches a frame (280 us for newer WS2812B)
+
+# TX FIFO registers and DMA requests of the PIO state machines (same on RP2040 and RP2350)
+PIO0_BASE = 0x50200000
+PIO_BLOCK_SIZE = 0x100000       # PIO1 follows PIO0
+PIO_TXF0 = 0x010
+DREQ_PIO_TX0 = 0                # PIO1 TX0 is 8
+
+def pio_txf(sm_id):
+    return PIO0_BASE + (sm_id // 4) * PIO_BLOCK_SIZE + PIO_TXF0 + (sm_id % 4) * 4
+
+def pio_dreq(sm_id):
+    return DREQ_PIO_TX0 + (sm_id // 4) * 8 + sm_id % 4
+
+if rp2:
+    # One byte per FIFO entry: DMA byte writes fill all four byte lanes, and
+    # shifting left with an 8 bit threshold sends the top one.
+    # asm_pio runs the body with only the PIO names as globals, so the bit
+    # timing has to be local: high for T1 cycles, data for T2, low for T3.
+    @rp2.asm_pio(sideset_init=rp2.PIO.OUT_LOW, out_shiftdir=rp2.PIO.SHIFT_LEFT,
+                 autopull=True, pull_thresh=8)
+    def ws2812():
+        T1 = 2
+        T2 = 5
+        T3 = 3
+        wrap_target()
+        label("bitloop")
+        out(x, 1)               .side(0)    [T3 - 1]
+        jmp(not_x, "do_zero")   .side(1)    [T1 - 1]
+        jmp("bitloop")          .side(1)    [T2 - 1]
+        label("do_zero")
+        nop()                   .side(0)    [T2 - 1]
+        wrap()
+
+class PioStrip:
+    """
+    WS2812 output through PIO and DMA. write() copies buf to the wire buffer,
+    starts the transfer and returns; only a write that comes before the last
+    frame is out (and latched) waits.
+    """
+    def __init__(self, pin, n, sm_id=PIO_STATE_MACHINE):
+        self.n = n
+        self.buf = bytearray(n * 3)    # Drawn into
+        self.wire = bytearray(n * 3)   # Being sent
+        self.txf = pio_txf(sm_id)
+        self.dma = rp2.DMA()
+        try:
+            self.ctrl = self.dma.pack_ctrl(size=0, inc_write=False, treq_sel=pio_dreq(sm_id))
+            self.sm = rp2.StateMachine(sm_id, ws2812, freq=PIO_FREQ, sideset_base=pin)
+        except Exception:
+            self.dma.close()
+            raise
+        self.sm.active(1)
+        self.ready_at = time.ticks_us()
+
+    def wait(self):
+        """Block until the last frame is out and latched."""
+        wait = time.ticks_diff(self.ready_at, time.ticks_us())
+        if wait > 0:
+            time.sleep_us(wait)
+        while self.dma.active():
+            pass
+
+    def write(self):
+        self.wait()
+        self.wire[:] = self.buf
+        self.dma.config(read=self.wire, write=self.txf, count=len(self.wire), ctrl=self.ctrl, trigger=True)
+        self.ready_at = time.ticks_add(time.ticks_us(), len(self.wire) * BYTE_US + RESET_US)
+
+def open_strip(pin, n):
+    """The output driver for n LEDs on pin: PIO and DMA where possible, else neopixel."""
+    if PIO_OUTPUT_ENABLED and rp2:
+        try:
+            return PioStrip(pin, n)
+        except Exception as e:  # No free state machine or DMA channel
+            print(f"PIO output unavailable, using neopixel: {e}")
+    import neopixel
+    return neopixel.NeoPixel(pin, n)
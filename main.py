@@ -1,1194 +1,444 @@
 """
 LED Matrix Controller - Example with Small State Classes
+
+The firmware is split into modules so a boot only loads what it draws with:
+  config    settings shared by all modules
+  kernels   the per-pixel render loops, compiled with viper on the device
+  ledstrip  the LED output driver (PIO and DMA, or neopixel)
+  dualcore  runs the network session on the second core (NET_DUAL_CORE)
+  display   sprites, animation frames and character rendering
+  assets    built-in data, the asset pack and the character/icon catalogs
+  states    the display modes
+  netota    WiFi, HTTP, the update manifest, the LAN peer cache and
+            UpdateState - imported only while the radio is in use
+  main      the network session broker, scheduler, time, controller and the
+            asyncio tasks (input, render, schedule, network) that run them
 """
-import network
-import urequests
 import os
+import sys
 import machine
-import neopixel
 import time
+import asyncio
 import json
-import ntptime
 import gc
 
-# --------------------------------------------------------------------------------
-# Hardware Configuration
-# --------------------------------------------------------------------------------
-LED_PIN = 0
-BUTTON_PIN = 11
-NUM_LEDS = 64
-BRIGHTNESS = 0.3
-# Use 0 for mechanical button (pressed = low)
-# Use 1 for TTP223 touch sensor in AB=00 mode (touched = high)
-BUTTON_PRESSED_VALUE = 1
-
-# --------------------------------------------------------------------------------
-# Timing Configuration
-# --------------------------------------------------------------------------------
-# Button press timing
-LONG_PRESS_TIME = 700           # 0.7 seconds for mode switching
-CHARACTER_SELECT_TIME = 3000    # 3 seconds for character selection
-FORCE_UPDATE_TIME = 6000        # 6 seconds for force update
-BUTTON_DISCONNECT_THRESHOLD = 200  # Check at boot if button is disconnected
-
-# Features
-POMODORO_ENABLED = False # Enable or disable Pomodoro functionality
-
-# Coffee combo detection
-COFFEE_COMBO_TAPS = 3           # Number of rapid taps needed
-RAPID_TAP_THRESHOLD = 200       # Max 300ms between taps
-COMBO_TIMEOUT = 1000           # 2 seconds to complete combo
-
-# Animation and timeout durations
-INTRO_DURATION = 1000           # 1 second for intro animations
-POMODORO_SETUP_TIMEOUT = 5000   # 5 seconds before auto-starting pomodoro
-
-# Scheduled update check
-SCHEDULED_UPDATE_CHECK = 60000  # 1 minute
-SCHEDULED_FRIYAY_CHECK = 60000  # 10 seconds
-
-# GitHub OTA Update Configuration
-FORCE_UPDATE = True  # Set this to True to force update regardless of version
-WIFI_TIMEOUT_SECONDS = 10    # Seconds to wait before timeout
-WIFI_DISCONNECT_AFTER_USE = True  # Disconnect from WiFi after use
-CURRENT_VERSION = "1.0.17"
-GITHUB_USER = "underverket"
-GITHUB_REPO = "dnd"
-UPDATE_URL = f"http://raw.githubusercontent.com/{GITHUB_USER}/{GITHUB_REPO}/main/firmware.json"
+from config import *
+from profiler import BOOT  # Starts the boot timeline, so the imports below are timed
+import assets
+from display import PowerBudget, SolidZone, panel_map
+from ledstrip import open_strip
+import kernels
+BOOT.mark('assets')
+from states import DefaultSubState, DefaultState, CharactersState
+BOOT.mark('states')
 
 # --------------------------------------------------------------------------------
-# WiFi Management
+# Lazy Network Module
 # --------------------------------------------------------------------------------
-def safe_reset():
+NETWORK_MODULES = ('netota', 'ntptime')  # Dropped from sys.modules once the radio is off
+
+def load_network():
+    """Import the network and OTA module on first use."""
+    import netota
+    return netota
+
+def unload_network():
+    """Forget the network modules so their bytecode can be collected."""
+    unloaded = False
+    for name in NETWORK_MODULES:
+        if sys.modules.pop(name, None) is not None:
+            unloaded = True
+    if unloaded:
+        gc.collect()
+        print(f"Network code unloaded, {gc.mem_free()} bytes free")
+
+def preload_network():
     """
-    Reset the device, but first shut down WiFi to avoid CYW43 getting stuck
-    across soft resets.
+    Import everything network jobs use, on core 0, so the network core never
+    imports (see dualcore). Raises if the unit has no WiFi credentials.
     """
     try:
-        wlan = network.WLAN(network.STA_IF)
+        import wifi_config
+    except ImportError:
+        raise Exception("No WiFi credentials file")
+    load_network()
+    import ntptime
 
-        # Always try disconnect first (even if not active)
-        try:
-            wlan.disconnect()
-        except:
-            pass
+# --------------------------------------------------------------------------------
+# Network Session
+# --------------------------------------------------------------------------------
+class NetworkJob:
+    """
+    A unit of network work waiting for the next radio window. run(deadline)
+    does the I/O; its result goes to on_done, an exception to on_fail, and
+    values passed to NetworkSession.progress() to on_progress.
 
-        # Then force radio off
-        try:
-            wlan.active(False)
-        except:
-            pass
+    A run() that is a generator is stepped instead: each yield hands the loop
+    back until the next step, and its return value goes to on_done. Jobs that
+    wait on the network (peer discovery) use this rather than blocking.
+    """
+    def __init__(self, name, run, priority, on_fail=None, on_done=None, on_progress=None):
+        self.name = name
+        self.run = run
+        self.priority = priority
+        self.on_fail = on_fail
+        self.on_done = on_done
+        self.on_progress = on_progress
+        self.steps = None  # The generator of a stepped job once started
+
+class NetworkSession:
+    """
+    Network session broker: batches all network work into one radio window.
+
+    Subsystems register jobs; the broker brings the radio up once, runs the
+    jobs in priority order (one per network task step) within a shared time
+    budget (time the window is only held open doesn't count), and powers the
+    radio down once the queue has been idle for NET_SESSION_LINGER ms. With
+    NET_DUAL_CORE it runs on the second core instead, behind a
+    dualcore.NetworkWorker.
+    """
+    IDLE = "idle"
+    CONNECTING = "connecting"
+    ACTIVE = "active"
+
+    def __init__(self, budget=NET_SESSION_BUDGET):
+        self.budget = budget
+        self.jobs = []
+        self.holders = []
+        self.running = None  # Job whose run() is in progress
+        self.state = self.IDLE
+        self.connect_start = 0
+        self.connect_steps = None  # WiFiManager.start_connection() while it runs
+        self.connect_wait = 0
+        self.deadline = 0
+        self.idle_since = 0
+
+    def register(self, name, run, priority=NET_PRIORITY_NORMAL, on_fail=None, on_done=None, on_progress=None):
+        """
+        Queue run(deadline) for the next radio window.
 
-        time.sleep(1)
-    except:
-        pass
+        Jobs registered while a window is open join it. A job with the same
+        name already waiting is not queued twice.
+        """
+        for job in self.jobs:
+            if job.name == name:
+                return
+        job = NetworkJob(name, run, priority, on_fail, on_done, on_progress)
+        idx = len(self.jobs)
+        while idx > 0 and self.jobs[idx - 1].priority > priority:
+            idx -= 1
+        self.jobs.insert(idx, job)
+
+    def hold(self, name):
+        """Keep the radio window open (e.g. while serving peers) until released."""
+        if name not in self.holders:
+            self.holders.append(name)
+
+    def release(self, name):
+        if name in self.holders:
+            self.holders.remove(name)
+
+    def is_connected(self):
+        return self.state == self.ACTIVE
+
+    def progress(self, value):
+        """Report progress of the running job; called from inside its run()."""
+        if self.running:
+            self.deliver(self.running, 'progress', value)
+
+    def deliver(self, job, event, value):
+        """
+        Hand a job's 'done', 'fail' or 'progress' value to its callback, or act
+        on a 'state' change of the radio window. The dual-core worker replaces
+        this on core 1, to pass everything to core 0 instead.
+        """
+        if event == 'state':
+            if value == self.IDLE:
+                unload_network()
+            return
+        if event == 'fail':
+            print(f"Network job '{job.name}' failed: {value}")
+            callback = job.on_fail
+        elif event == 'done':
+            callback = job.on_done
+        else:
+            callback = job.on_progress
+        if callback:
+            callback(value)
 
-    machine.reset()
+    def update(self, current_time):
+        """Advance the session; runs at most one job per call."""
+        if self.state == self.IDLE:
+            if self.jobs or self.holders:
+                self._open(current_time)
+
+        elif self.state == self.CONNECTING:
+            if self.connect_steps:
+                if time.ticks_diff(current_time, self.connect_wait) >= 0:
+                    self._connect_step(current_time)
+            elif load_network().WiFiManager.check_connection():
+                print(f"Network window open for {len(self.jobs)} job(s)")
+                self._set_state(self.ACTIVE)
+                self.deadline = time.ticks_add(current_time, self.budget)
+                self.idle_since = current_time
+            elif time.ticks_diff(current_time, self.connect_start) > WIFI_TIMEOUT_SECONDS * 1000:
+                self._fail_all(Exception("WiFi connection timeout"))
+                self.holders = []
+                self.close()
+
+        elif self.state == self.ACTIVE:
+            if self.jobs:
+                if time.ticks_diff(current_time, self.deadline) >= 0:
+                    self._fail_all(Exception("Network time budget exhausted"))
+                    self.close()
+                    return
 
-class WiFiManager:
-    """Centralized WiFi connection management."""
-    
-    @staticmethod
-    def start_connection():
-        """Initialize WiFi connection process."""
+                job = self.jobs.pop(0)
+                self.running = job
+                try:
+                    if job.steps is None:
+                        result = job.run(self.deadline)
+                        if hasattr(result, 'send'):
+                            job.steps = result
+                    if job.steps is not None:
+                        next(job.steps)
+                except StopIteration as e:
+                    self.deliver(job, 'done', e.value)
+                except Exception as e:
+                    self.deliver(job, 'fail', e)
+                else:
+                    if job.steps is not None:
+                        self._requeue(job)  # Yielded: next step on the next update
+                    else:
+                        self.deliver(job, 'done', result)
+                self.running = None
+                self.idle_since = time.ticks_ms()
+
+            elif self.holders:
+                # Held time (peer seeding) has its own limit; jobs queued later get a full budget
+                self.idle_since = current_time
+                self.deadline = time.ticks_add(current_time, self.budget)
+            elif time.ticks_diff(current_time, self.idle_since) >= NET_SESSION_LINGER:
+                self.close()
+
+    def close(self):
+        """End the radio window."""
+        if self.state != self.IDLE:
+            load_network().WiFiManager.disconnect()
+            self._set_state(self.IDLE)
+
+    def _set_state(self, state):
+        self.state = state
+        self.deliver(None, 'state', state)
+
+    def _open(self, current_time):
+        # Units without WiFi credentials never load the network code at all
         try:
-            from wifi_config import WIFI_SSID, WIFI_PASSWORD
-            if not WIFI_SSID or not WIFI_PASSWORD:
-                raise Exception("No WiFi credentials")
-
-            wlan = network.WLAN(network.STA_IF)
-
-            # If already connected, do nothing
-            if wlan.isconnected():
-                return True, "Already connected"
-
-            # Force a clean interface start (helps after soft resets / wedged driver)
-            try:
-                wlan.disconnect()
-            except:
-                pass
-            try:
-                wlan.active(False)
-                time.sleep(0.2)
-            except:
-                pass
-
-            wlan.active(True)
-            time.sleep(0.2)
-
-            print(f"Connecting to WiFi: {WIFI_SSID}")
-            wlan.connect(WIFI_SSID, WIFI_PASSWORD)
-            return True, WIFI_SSID
-
+            import wifi_config
         except ImportError:
-            return False, "No WiFi credentials file"
-        except Exception as e:
-            return False, str(e)
-    
-    @staticmethod
-    def check_connection():
-        """Check current connection status."""
-        wlan = network.WLAN(network.STA_IF)
-        return wlan.isconnected()
-    
-    @staticmethod
-    def disconnect():
-        """Safely disconnect from WiFi."""
-        if WIFI_DISCONNECT_AFTER_USE:
-            try:
-                wlan = network.WLAN(network.STA_IF)
-                if wlan.isconnected():
-                    wlan.disconnect()
-                    wlan.active(False)
-                    print("WiFi disconnected")
-            except Exception as e:
-                print(f"WiFi disconnect error: {e}")
-
-# --------------------------------------------------------------------------------
-# Base State Class
-# --------------------------------------------------------------------------------
-class BaseState:
-    """Abstract base class for states."""
-    def __init__(self, controller):
-        self.controller = controller
-        self.sub_state = None  # Used for consistent sub-state handling.
-        self.entry_time = None  # Used for timing management.
-
-    def on_enter(self, **kwargs):
-        """Called when entering this state, with kwargs for flexible state transitions."""
-        self.entry_time = time.ticks_ms()
-    
-    def on_exit(self):
-        """Called when leaving this state."""
-        pass
-    
-    def update(self, current_time):
-        """Periodic update (e.g., for time-based transitions)."""
-        pass
-    
-    def handle_short_press(self):
-        """Handle short button press."""
-        pass
-    
-    def handle_long_press(self):
-        """Handle long button press."""
-        pass
-    
-    def update_display(self):
-        """Set LEDs appropriately for this state."""
-        pass
-
-    def _fill_solid_color(self, color):
-        """Helper: fill display with solid color."""
-        color = tuple(int(c * BRIGHTNESS) for c in color)
-        self.controller.np.fill(color)
-        self.controller.np.write()
-
-    def ticks_since_entry(self):
-            """Helper: get ms since state entry."""
-            return time.ticks_diff(time.ticks_ms(), self.entry_time)
-    
-    def _get_pixel_index(self, row, col):
-        """Convert row and column to LED index."""
-        return row * 8 + col
-    
-    def _get_border_pixels(self):
-        """Get all border pixels in clockwise order."""
-        pixels = []
-        # Top edge
-        pixels.extend([(0, i) for i in range(8)])
-        # Right edge
-        pixels.extend([(i, 7) for i in range(1, 8)])
-        # Bottom edge (right to left)
-        pixels.extend([(7, i) for i in range(6, -1, -1)])
-        # Left edge (bottom to top)
-        pixels.extend([(i, 0) for i in range(6, 0, -1)])
-        return pixels
-
-# --------------------------------------------------------------------------------
-# Character Definition and Processing
-# --------------------------------------------------------------------------------
-def decode_pattern_to_pixels(hex_pattern):
-    """Convert hex pattern directly to pixel coordinates"""
-    pixels = []
-    for row in range(8):
-        # Get the byte for this row
-        byte = int(hex_pattern[row*2:row*2+2], 16)
-        
-        # Check each bit
-        for col in range(8):
-            if byte & (1 << (7-col)):
-                pixels.append((row, col))
-    return pixels
-
-class CharacterDefinition:
-    """Process compressed character definitions into pixel data"""
-    @staticmethod
-    def create_character(data):
-            
-        """Convert a character definition into processed pixel data"""
-        character = {
-            'id': data['id'],
-            'name': data['name'],
-            'pixels': []
-        }
-
-        # Add body_color if present
-        if 'body_color' in data:
-            character['body_color'] = data['body_color']
-            
-        # Process body pattern
-        if 'body' in data:
-            body_pixels = decode_pattern_to_pixels(data['body'])
-            for pixel in body_pixels:
-                character['pixels'].append({
-                    'row': pixel[0],
-                    'col': pixel[1],
-                    'type': 'body'
-                })
-                
-        # Process highlight layer
-        if 'hl' in data:
-            highlight_pixels = decode_pattern_to_pixels(data['hl'])
-            for pixel in highlight_pixels:
-                character['pixels'].append({
-                    'row': pixel[0],
-                    'col': pixel[1],
-                    'type': 'highlight'
-                })
-                
-        # Process shadow layer
-        if 'sdw' in data:
-            shadow_pixels = decode_pattern_to_pixels(data['sdw'])
-            for pixel in shadow_pixels:
-                character['pixels'].append({
-                    'row': pixel[0],
-                    'col': pixel[1],
-                    'type': 'shadow'
-                })
-        
-        # Handle custom colored pixels - list format [col, row, color]
-        if 'custom' in data:
-            for pixel in data['custom']:
-                character['pixels'].append({
-                    'row': pixel[1],      # Index 1: row
-                    'col': pixel[0],      # Index 0: col
-                    'type': 'fixed',
-                    'color': pixel[2]     # Index 2: color
-                })
-        
-        # Process animations - handle list format
-        if 'animations' in data:
-            character['animations'] = []
-            for anim in data['animations']:
-                # Process list format
-                processed_anim = {
-                    'name': anim[0],                # Index 0: name
-                    'interval': anim[1],            # Index 1: interval
-                    'frame_duration': anim[2],      # Index 2: frame_duration
-                    'frames': [decode_pattern_to_pixels(frame) for frame in anim[3]],  # Index 3: frames
-                    'color': anim[4],               # Index 4: color
-                    'reverse': anim[5]              # Index 5: reverse
-                }
-                character['animations'].append(processed_anim)
-                
-        return character
-
-class Character:
-    def __init__(self, data):
-        self.id = data['id']
-        self.name = data['name']
-        self.pixels = data['pixels']
-        self.rainbow_offset = 0
-
-        # Animation handling
-        self.animations = {}
-
-        # Store custom body color if present
-        if 'body_color' in data:
-            self.body_color = data['body_color']
-
-        # Process animations if they exist in the data
-        if 'animations' in data:
-            for anim in data['animations']:
-                self.animations[anim['name']] = {
-                    'interval': anim['interval'],
-                    'frame_duration': anim['frame_duration'],
-                    'reverse': anim.get('reverse', False),
-                    'color': anim.get('color', (255, 255, 255)),
-                    'frames': anim['frames'],
-                    'last_trigger': time.ticks_ms(),
-                    'current_frame': 0,
-                    'direction': 1
-                }
-        
-    def _update_animations(self, current_time):
-        """Update all animation states"""
-        animation_pixels = []
-        
-        for anim_name, anim in self.animations.items():
-            # Check time since last trigger
-            time_since_trigger = time.ticks_diff(current_time, anim['last_trigger'])
-            
-            # If we haven't reached the interval yet, show first frame
-            if time_since_trigger < anim['interval']:
-                frame_pixels = anim['frames'][0]
-                animation_pixels.extend([
-                    {'row': pixel[0], 'col': pixel[1], 'color': anim['color']}
-                    for pixel in frame_pixels
-                ])
-                continue
-                
-            # Calculate which frame to show
-            animation_duration = anim['frame_duration'] * len(anim['frames'])
-            time_into_interval = time_since_trigger % anim['interval']
-            
-            if time_into_interval < animation_duration:
-                frame_number = (time_into_interval // anim['frame_duration'])
-                if frame_number >= len(anim['frames']):
-                    frame_number = 0
-            else:
-                frame_number = 0
-                
-            # Add current frame's pixels to animation list
-            frame_pixels = anim['frames'][frame_number]
-            animation_pixels.extend([
-                {'row': pixel[0], 'col': pixel[1], 'color': anim['color']}
-                for pixel in frame_pixels
-            ])
-                
-        return animation_pixels
-
-    def render(self, mode, np, brightness=0.1, row_offset=0, selection_color=None):
-        """Updated render to handle animations and custom body color"""
-        np.fill((0, 0, 0))
-
-        # Determine what color to use for rendering
-        render_color = selection_color
-        if not render_color:
-            # Check if this character/icon has a custom body color
-            if hasattr(self, 'body_color'):
-                render_color = self.body_color
-        
-        # Render base character first
-        if render_color:  # ← FIXED: Use render_color instead of selection_color
-            self._render_solid(np, mode, brightness, row_offset, render_color)
-        else:
-            if mode == 'social':
-                self._render_rainbow(np, brightness, row_offset)
-            else:
-                self._render_solid(np, mode, brightness, row_offset)
-        
-        # Then overlay animation pixels
-        animation_pixels = self._update_animations(time.ticks_ms())
-        for pixel in animation_pixels:
-            new_row = pixel['row'] + row_offset
-            if 0 <= new_row < 8:
-                color = tuple(int(c * brightness) for c in pixel['color'])
-                np[self._get_pixel_index(new_row, pixel['col'])] = color
-                
-        np.write()
-                
-    def _render_solid(self, np, mode, brightness, row_offset=0, override_color=None):
-        base_colors = {
-            'available': (0, 255, 0),  # Green
-            'busy': (255, 0, 0),      # Red
-        }
-        base_color = override_color if override_color else base_colors.get(mode, (255, 255, 255))
-        
-        for pixel in self.pixels:
-            new_row = pixel['row'] + row_offset
-            if 0 <= new_row < 8:  # Only render if pixel is on screen
-                color = self._process_pixel(pixel, base_color, brightness)
-                np[self._get_pixel_index(new_row, pixel['col'])] = color
-
+            self._fail_all(Exception("No WiFi credentials file"))
+            self.holders = []
+            return
 
-    def _render_rainbow(self, np, brightness, row_offset=0):
+        self.connect_steps = load_network().WiFiManager.start_connection()
+        self.connect_start = current_time
+        self.connect_wait = current_time
+        self._set_state(self.CONNECTING)
 
-        # Set speed of rainbow effect
-        self.rainbow_offset = (self.rainbow_offset + 3) % 255
-        
-        for pixel in self.pixels:
-            new_row = pixel['row'] + row_offset
-            if 0 <= new_row < 8:  # Only render if pixel is on screen
-                if pixel['type'] == 'fixed':
-                    color = pixel['color']
-                else:
-                    # Set smoothness of gradient (Lower = smoother)
-                    hue = (self.rainbow_offset + (new_row + pixel['col']) * 6) % 255
-                    color = self._wheel(hue)
-                
-                color = tuple(int(c * brightness) for c in color)
-                np[self._get_pixel_index(new_row, pixel['col'])] = color
-
-    def _process_pixel(self, pixel, base_color, brightness):
-        if pixel['type'] == 'fixed':
-            color = pixel['color']
-        elif pixel['type'] == 'highlight':
-            color = tuple(min(255, c + 50) for c in base_color)
-        elif pixel['type'] == 'shadow':
-            color = tuple(int(c * 0.3) for c in base_color)
-        else:  # 'body'
-            color = base_color
-            
-        return tuple(int(c * brightness) for c in color)
-    
-    @staticmethod
-    def _wheel(pos):
-        """Generate rainbow colors with softer tones."""
-        # Minimum value creates the "softness" - higher = softer colors
-        min_value = 10  # Try values between 50-100
-        # Max value stays at 255 but the difference between min and max is smaller
-        max_value = 255
-        
-        if pos < 85:
-            return (
-                min_value + int(pos * 3 * (max_value-min_value)/255), 
-                min_value + int((255 - pos * 3) * (max_value-min_value)/255), 
-                min_value
-            )
-        elif pos < 170:
-            pos -= 85
-            return (
-                min_value + int((255 - pos * 3) * (max_value-min_value)/255), 
-                min_value, 
-                min_value + int(pos * 3 * (max_value-min_value)/255)
-            )
+    def _connect_step(self, current_time):
+        # Run the connection start up to its next wait, in place of blocking sleeps
+        try:
+            wait = next(self.connect_steps)
+        except StopIteration as e:
+            self.connect_steps = None
+            success, message = e.value
+            if not success:
+                self._fail_all(Exception(message))
+                self.holders = []
+                self.close()  # Also lets the network code go again
         else:
-            pos -= 170
-            return (
-                min_value, 
-                min_value + int(pos * 3 * (max_value-min_value)/255), 
-                min_value + int((255 - pos * 3) * (max_value-min_value)/255)
-            )
-
-    @staticmethod
-    def _get_pixel_index(row, col):
-        return row * 8 + col
-    
-# --------------------------------------------------------------------------------
-# Icon Definitions
-# --------------------------------------------------------------------------------
-# BEGIN COMPRESSED ICON DATA
-ICONS_RAW = [
-    {
-        'animations': [['steam', 1200, 200, ['2814280000000000', '1414280000000000', '1428280000000000', '2850280000000000', '5050280000000000', '5028280000000000'], (101, 67, 33), True]],
-        'body': 'FFFFFFFFFFFFFFFF',
-        'body_color': (40, 26, 13),
-        'custom': [[1, 3, (255, 255, 255)], [2, 3, (255, 255, 255)], [3, 3, (255, 255, 255)], [4, 3, (255, 255, 255)], [5, 3, (255, 255, 255)], [1, 4, (255, 255, 255)], [1, 5, (255, 255, 255)], [1, 6, (255, 255, 255)], [5, 4, (255, 255, 255)], [5, 5, (255, 255, 255)], [5, 6, (255, 255, 255)], [2, 7, (255, 255, 255)], [3, 7, (255, 255, 255)], [4, 7, (255, 255, 255)], [6, 4, (255, 255, 255)], [6, 5, (255, 255, 255)], [2, 4, (101, 67, 33)], [3, 4, (101, 67, 33)], [4, 4, (101, 67, 33)], [2, 5, (101, 67, 33)], [3, 5, (101, 67, 33)], [4, 5, (101, 67, 33)], [2, 6, (101, 67, 33)], [3, 6, (101, 67, 33)], [4, 6, (101, 67, 33)]],
-        'id': 'coffee',
-        'name': 'Coffee Break'
-    }
-]
-# END COMPRESSED ICON DATA
+            self.connect_wait = time.ticks_add(current_time, wait)
 
-# Process the raw icon definitions
-ICONS_DATA = [CharacterDefinition.create_character(icon) for icon in ICONS_RAW]
-    
-# --------------------------------------------------------------------------------
-# Character Definitions
-# --------------------------------------------------------------------------------
-# BEGIN COMPRESSED CHARACTER DATA
-CHARACTERS_RAW = [
-    {
-        'animations': [['blink', 3000, 50, ['0000000024240000', '0000000000240000', '0000000000000000'], (255, 255, 255), False]],
-        'body': '3C7EFFFFFFFFFFAA',
-        'id': 'ghost_plain',
-        'name': 'Plain Ghost'
-    },
-    {
-        'animations': [['blink_heart', 7000, 50, ['0000002424000000', '0000000024000000', '0000000000000000'], (255, 255, 255), False]],
-        'body': '0066FFFF7E3C1800',
-        'hl': '0006030100000000',
-        'id': 'heart',
-        'name': 'Heart',
-        'sdw': '0000008040201000'
-    },
-    {
-        'animations': [['blik_invader', 7000, 50, ['0000002400000000', '0000000000000000'], (255, 255, 255), False]],
-        'body': '423C7EFF7E422400',
-        'id': 'invader',
-        'name': 'Space Invader'
-    },
-    {
-        'animations': [['blik_invader', 7000, 50, ['006666187E7E4200', '000066187E7E4200', '000000187E7E4200'], (255, 255, 255), False]],
-        'body': 'FFFFFFFFFFFFFFFF',
-        'id': 'creeper',
-        'name': 'Creeper'
-    },
-    {
-        'animations': [['cat_walk', 1200, 300, ['000000000000AA00', '000000000000BB00', '000000000000AA00', '000000000000EE00'], (0, 0, 0), False]],
-        'body': '0255717F7F7F7F00',
-        'custom': [[0, 7, (195, 126, 74)], [1, 7, (195, 126, 74)], [2, 7, (195, 126, 74)], [3, 7, (195, 126, 74)], [4, 7, (195, 126, 74)], [5, 7, (195, 126, 74)], [6, 7, (195, 126, 74)], [7, 7, (195, 126, 74)]],
-        'hl': '0004000000200000',
-        'id': 'cat',
-        'name': 'The Cat',
-        'sdw': '0000000A0A000C00'
-    },
-    {
-        'animations': [['cat_blink', 7000, 50, ['0000000050000000', '0000000000000000'], (255, 255, 0), False]],
-        'body': 'FFFFFFFFFFFFFFFF',
-        'custom': [[1, 2, (20, 20, 20)], [4, 2, (20, 20, 20)], [1, 3, (20, 20, 20)], [2, 3, (20, 20, 20)], [3, 3, (20, 20, 20)], [4, 3, (20, 20, 20)], [1, 4, (20, 20, 20)], [2, 4, (20, 20, 20)], [3, 4, (20, 20, 20)], [4, 4, (20, 20, 20)], [1, 5, (20, 20, 20)], [2, 5, (20, 20, 20)], [3, 5, (20, 20, 20)], [4, 5, (20, 20, 20)], [6, 5, (50, 50, 50)], [7, 5, (20, 20, 20)], [2, 6, (20, 20, 20)], [3, 6, (20, 20, 20)], [4, 6, (20, 20, 20)], [5, 6, (20, 20, 20)], [7, 6, (20, 20, 20)], [2, 7, (50, 50, 50)], [3, 7, (20, 20, 20)], [4, 7, (50, 50, 50)], [5, 7, (20, 20, 20)], [6, 7, (20, 20, 20)], [7, 7, (20, 20, 20)]],
-        'id': 'cat2',
-        'name': 'The Sitting Cat'
-    },
-    {
-        'animations': [['squack', 11000, 500, ['60202020383E1800', '6020273E3C3E1800'], (255, 255, 255), False]],
-        'body': 'FFFFFFFFFFFFFFFF',
-        'custom': [[0, 1, (255, 127, 0)], [1, 1, (255, 127, 0)], [3, 7, (255, 127, 0)], [4, 7, (255, 127, 0)], [7, 5, (140, 140, 140)], [2, 6, (140, 140, 140)], [6, 6, (140, 140, 140)], [5, 6, (140, 140, 140)]],
-        'id': 'goose',
-        'name': 'The Goose'
-    },
-    {
-        'animations': [['wag', 4000, 100, ['0000402020000000', '00000020A0000000', '00000080A0000000', '0000408080000000', '00000080A0000000', '00000020A0000000', '0000402020000000'], (0, 0, 0), True]],
-        'body': '61315FFFFF5E7E3E',
-        'custom': [[4, 3, (255, 255, 255)], [7, 3, (255, 255, 255)]],
-        'hl': '0000084046404000',
-        'id': 'pika',
-        'name': 'Toothless',
-        'sdw': '412046A0B100000C'
-    },
-    {
-        'animations': [['blink_doggo', 6000, 60, ['0000000000000000', '0000003C00000000'], (118, 82, 50), False]],
-        'body': 'FFFFFFFFFFFFFFFF',
-        'custom': [[2, 3, (0, 0, 0)], [3, 3, (246, 246, 246)], [4, 3, (0, 0, 0)], [5, 3, (246, 246, 246)], [6, 4, (0, 0, 0)], [0, 1, (118, 82, 50)], [1, 1, (190, 135, 85)], [4, 1, (190, 135, 85)], [5, 1, (190, 135, 85)], [1, 2, (118, 82, 50)], [2, 2, (190, 135, 85)], [3, 2, (190, 135, 85)], [4, 2, (118, 82, 50)], [1, 3, (118, 82, 50)], [1, 4, (118, 82, 50)], [2, 4, (118, 82, 50)], [3, 4, (118, 82, 50)], [4, 4, (118, 82, 50)], [5, 4, (118, 82, 50)], [0, 5, (190, 135, 85)], [1, 5, (118, 82, 50)], [2, 5, (118, 82, 50)], [3, 5, (118, 82, 50)], [4, 5, (118, 82, 50)], [5, 5, (118, 82, 50)], [0, 6, (118, 82, 50)], [1, 6, (118, 82, 50)], [2, 6, (118, 82, 50)], [3, 6, (118, 82, 50)], [0, 7, (118, 82, 50)], [1, 7, (118, 82, 50)], [2, 7, (118, 82, 50)], [3, 7, (118, 82, 50)], [4, 6, (237, 121, 36)], [5, 6, (246, 246, 246)], [6, 6, (246, 246, 246)], [7, 6, (223, 38, 44)], [4, 7, (50, 35, 20)]],
-        'id': 'smoking_doggo',
-        'name': 'Smoking Doggo'
-    }
-]
-# END COMPRESSED CHARACTER DATA
+    def _requeue(self, job):
+        # Ahead of jobs of the same priority, so a stepped job runs to the end first
+        idx = 0
+        while idx < len(self.jobs) and self.jobs[idx].priority < job.priority:
+            idx += 1
+        self.jobs.insert(idx, job)
 
-# Process the raw definitions into our final character data
-CHARACTERS_DATA = [CharacterDefinition.create_character(char) for char in CHARACTERS_RAW]
+    def _fail_all(self, error):
+        jobs, self.jobs = self.jobs, []
+        for job in jobs:
+            self.deliver(job, 'fail', error)
 
 # --------------------------------------------------------------------------------
-# DefaultState
+# Scheduler
 # --------------------------------------------------------------------------------
-class DefaultSubState:
-    """Default mode states"""
-    INTRO = "intro"
-    AVAILABLE = "available"
-    BUSY = "busy"
-    SOCIAL = "social"
-    FRIYAY = "friyay"
-    
-    # Base states that we always cycle through
-    BASE_CYCLE_STATES = [AVAILABLE, BUSY, SOCIAL]
-    
-    # Dynamic cycle states (will be updated at runtime)
-    CYCLE_STATES = BASE_CYCLE_STATES.copy()
-
-class DefaultState(BaseState):
-    """Main 'Default' state with sub-states: INTRO, AVAILABLE, BUSY, SOCIAL."""
-
-    ANIMATION_DURATION = 600  # Total duration in milliseconds
-
-    def __init__(self, controller):
-        super().__init__(controller)
-        self.sub_state = DefaultSubState.INTRO
-        self.character = Character(CHARACTERS_DATA[controller.selected_character])
-        self.animation_start = None
+class TimerJob:
+    """A callback due at a ticks_ms deadline, optionally repeating."""
+    def __init__(self, due, callback, period=None):
+        self.due = due
+        self.callback = callback
+        self.period = period
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+class WallClockTrigger:
+    """
+    Calendar event at a fixed time of day (or week when weekday is set).
 
-        # Coffee combo detection
-        self.tap_combo = []
-        self.last_tap_time = 0
+    The trigger also fires when armed inside its window, so a device that
+    syncs time at 03:10 still catches the 03:00-03:45 update window, but only
+    once per occurrence: rechecks and resyncs later in the window don't fire it.
+    """
+    DAY = 86400
+    WEEK = 7 * 86400
+
+    def __init__(self, hour, minute, callback, weekday=None, window=0, second=0):
+        self.callback = callback
+        self.window = window * 60
+        self.period = self.WEEK if weekday is not None else self.DAY
+        self.offset = (weekday or 0) * self.DAY + hour * 3600 + minute * 60 + second
+        self.job = None
+        self.fired = False  # Fired for the current occurrence, until its window ends
+
+    def elapsed(self, dt):
+        """Seconds since the most recent occurrence, given an RTC datetime tuple."""
+        _, _, _, wd, h, mi, s, _ = dt
+        now = h * 3600 + mi * 60 + s
+        if self.period == self.WEEK:
+            now += wd * self.DAY
+        return (now - self.offset) % self.period
+
+class Scheduler:
+    """
+    Timer wheel for relative timers plus RTC-driven wall-clock triggers.
 
-        # Initialize FRIYAY-related attributes
-        self.friyay_scroll_position = 0
-        self.last_scroll_time = 0
-    
-    def on_enter(self):
-        print("Entering DefaultState / INTRO")
-        self.sub_state = DefaultSubState.INTRO
-        self.animation_start = time.ticks_ms()
-        self.character = Character(CHARACTERS_DATA[self.controller.selected_character])
-    
-    def _ease_out_cubic(self, t):
-        """Cubic easing function for smooth animation"""
-        t = 1 - t
-        return 1 - (t * t * t)
-    
-    def update(self, current_time):
-        if self.sub_state == DefaultSubState.INTRO:
-            progress = time.ticks_diff(current_time, self.animation_start) / self.ANIMATION_DURATION
-            
-            if progress >= 1:
-                print(f"Auto: Default {DefaultSubState.INTRO} → {DefaultSubState.AVAILABLE}")
-                self.sub_state = DefaultSubState.AVAILABLE
-    
-    # def handle_short_press(self):
-    #     if self.sub_state != DefaultSubState.INTRO:  # Don't interrupt intro
-    #         # Find current state in cycle and move to next
-    #         try:
-    #             current_idx = DefaultSubState.CYCLE_STATES.index(self.sub_state)
-    #         except ValueError:
-    #             # If current state not in cycle (shouldn't happen), go to first state
-    #             current_idx = -1
-                
-    #         next_idx = (current_idx + 1) % len(DefaultSubState.CYCLE_STATES)
-    #         self.sub_state = DefaultSubState.CYCLE_STATES[next_idx]
-    #         print(f"Short press: Default → {self.sub_state}")
+    Jobs are hashed into SCHEDULER_SLOTS buckets of SCHEDULER_RESOLUTION ms.
+    Each advance only visits the buckets that elapsed since the last call, and
+    a job is only run once its own deadline has passed, so long timers simply
+    survive extra revolutions of the wheel.
+    """
+    def __init__(self, time_manager, slots=SCHEDULER_SLOTS, resolution=SCHEDULER_RESOLUTION):
+        self.time_manager = time_manager
+        self.resolution = resolution
+        self.slots = [[] for _ in range(slots)]
+        self.cursor = 0
+        self.last_tick = time.ticks_ms()
+        self.triggers = []
+
+    def call_later(self, delay, callback, period=None):
+        """Run callback after delay ms, then every period ms if given."""
+        job = TimerJob(time.ticks_add(time.ticks_ms(), delay), callback, period)
+        self._insert(job)
+        return job
+
+    def call_every(self, period, callback):
+        """Run callback every period ms."""
+        return self.call_later(period, callback, period)
+
+    def at(self, hour, minute, callback, weekday=None, window=0, second=0):
+        """Run callback at hour:minute:second (on weekday, 0=Monday) by the RTC."""
+        trigger = WallClockTrigger(hour, minute, callback, weekday, window, second)
+        self.triggers.append(trigger)
+        self._arm(trigger)
+        return trigger
+
+    def rearm_wallclock(self):
+        """Recompute wall-clock deadlines, e.g. after the RTC has been synced."""
+        for trigger in self.triggers:
+            self._arm(trigger)
+
+    def _arm(self, trigger):
+        if trigger.job:
+            trigger.job.cancel()
+            trigger.job = None
+
+        # Wall-clock jobs stay dormant until the RTC is trustworthy
+        if not self.time_manager.is_time_set():
+            return
 
-    def handle_short_press(self):
-        if self.sub_state != DefaultSubState.INTRO:  # Don't interrupt intro
-            current_time = time.ticks_ms()
-            
-            # Check if this tap is part of a rapid sequence
-            if (len(self.tap_combo) == 0 or 
-                time.ticks_diff(current_time, self.last_tap_time) <= RAPID_TAP_THRESHOLD):
-                
-                self.tap_combo.append(current_time)
-                self.last_tap_time = current_time
-                
-                # Check for rapid taps
-                if len(self.tap_combo) >= COFFEE_COMBO_TAPS:
-                    print(f"🎉 {COFFEE_COMBO_TAPS} rapid taps detected - Coffee time!")
-                    self.controller.switch_to(CoffeeState(self.controller))
-                    self.tap_combo = []  # Reset combo
-                    return
-                    
-            else:
-                # Too slow, reset combo
-                self.tap_combo = [current_time]
-                self.last_tap_time = current_time
-            
-            # Clean up old taps from combo
-            self.tap_combo = [tap for tap in self.tap_combo 
-                            if time.ticks_diff(current_time, tap) <= COMBO_TIMEOUT]
-            
-            # Normal mode switching behavior
-            try:
-                current_idx = DefaultSubState.CYCLE_STATES.index(self.sub_state)
-            except ValueError:
-                current_idx = -1
-                
-            next_idx = (current_idx + 1) % len(DefaultSubState.CYCLE_STATES)
-            self.sub_state = DefaultSubState.CYCLE_STATES[next_idx]
-            print(f"Short press: Default → {self.sub_state}")
-    
-    # def handle_long_press(self):
-    #     if self.sub_state != DefaultSubState.INTRO:  # Don't interrupt intro
-    #         print("Long press: Default → Pomodoro INTRO")
-    #         self.controller.switch_to(PomodoroState(self.controller))
-
-    def handle_long_press(self):
-        if self.sub_state != DefaultSubState.INTRO:  # Don't interrupt intro
-            if POMODORO_ENABLED:
-                print("Long press: Default → Pomodoro INTRO")
-                self.controller.switch_to(PomodoroState(self.controller))
-            else:
-                print("Long press: Pomodoro disabled")
-                # Optional: could do something else here, like flash a color briefly
-                pass
-    
-    def update_display(self):
-        if self.sub_state == DefaultSubState.INTRO:
-            # Calculate smooth animation progress
-            progress = time.ticks_diff(time.ticks_ms(), self.animation_start) / self.ANIMATION_DURATION
-            if progress > 1:
-                progress = 1
-                
-            # Apply easing function
-            eased_progress = self._ease_out_cubic(progress)
-            
-            # Calculate row offset (8 to 0)
-            row_offset = (1 - eased_progress) * 8
-            
-            # Render with calculated offset
-            self.character.render(
-                mode=DefaultSubState.AVAILABLE,
-                np=self.controller.np,
-                brightness=BRIGHTNESS,
-                row_offset=int(row_offset)
-            )
-        elif self.sub_state == DefaultSubState.FRIYAY:
-            # Render the scrolling "FRIYAY!" text
-            self._render_scrolling_text(self.FRIYAY_TEXT, color=(255, 255, 0))  # Yellow text
+        elapsed = trigger.elapsed(self.time_manager.rtc.datetime())
+        if elapsed > trigger.window:
+            trigger.fired = False  # Past the window: the next occurrence is due
+        if not trigger.fired and elapsed <= trigger.window:
+            delay = 0
         else:
-            # Normal rendering
-            self.character.render(
-                mode=self.sub_state,
-                np=self.controller.np,
-                brightness=BRIGHTNESS
-            )
-    
-    # Add these new properties
-    FRIYAY_TEXT = "FRIYAY!"
-    friyay_scroll_position = 0
-    last_scroll_time = 0
-    SCROLL_SPEED = 100  # ms between scroll steps
-    
-    def _render_scrolling_text(self, text, color=(255, 255, 0)):
-        # First create a rainbow background
-        rainbow_offset = (time.ticks_ms() // 15) % 256  # Slower color cycling
-        for row in range(8):
-            for col in range(8):
-                # Create a diagonal rainbow pattern
-                hue = (rainbow_offset + (row + col) * 8) % 256
-                bg_color = Character._wheel(hue)
-                # Dim background for contrast
-                bg_color = tuple(int(c * BRIGHTNESS) for c in bg_color)
-                pixel_index = self._get_pixel_index(row, col)
-                self.controller.np[pixel_index] = bg_color
-
-        font = {
-            'F': [(0,0), (0,1), (0,2), (0,3), (1,0), (2,0), (3,0), (3,1), (4,0), (5,0)],
-            'R': [(0,0), (0,1), (0,2), (0,3), (1,0), (1,3), (2,0), (2,3), (3,0), (3,1), (3,2), (4,0), (4,2), (5,0), (5,3)],
-            'I': [(0,1), (1,1), (2,1), (3,1), (4,1), (5,1)],
-            'Y': [(0,0), (0,4), (1,0), (1,4), (2,1), (2,2), (2,3), (3,2), (4,2), (5,2)],
-            'A': [(0,1), (0,2), (0,3), (1,0), (1,4), (2,0), (2,4), (3,0), (3,1), (3,2), (3,3), (3,4), (4,0), (4,4), (5,0), (5,4)],
-            '!': [(0,2), (1,2), (2,2), (3,2), (5,2)]
-        }
-        
-        # Calculate character widths
-        char_widths = {char: max(col for _, col in pixels) - min(col for _, col in pixels) + 1
-                    for char, pixels in font.items()}
-        
-        # Total width of the text (including 1px gap between characters) plus 8px extra padding
-        total_width = sum(char_widths.get(char, 0) + 1 for char in text) + 8
-        
-        # Update scroll position
-        current_time = time.ticks_ms()
-        if time.ticks_diff(current_time, self.last_scroll_time) > self.SCROLL_SPEED:
-            self.friyay_scroll_position = (self.friyay_scroll_position + 1) % total_width
-            self.last_scroll_time = current_time
-        
-        # Calculate starting position
-        x_pos = 8 - self.friyay_scroll_position
-        vertical_offset = 1  # Move down 1px
-        
-        # Make text bright white for maximum contrast
-        text_color = (int(255 * BRIGHTNESS), int(255 * BRIGHTNESS), int(255 * BRIGHTNESS))
-        
-        # Render the text only once
-        text_x_pos = x_pos
-        for char in text:
-            if char in font:
-                min_col = min(col for _, col in font[char])
-                for row, col in font[char]:
-                    screen_row = row + vertical_offset
-                    screen_col = text_x_pos + (col - min_col)
-                    if 0 <= screen_row < 8 and 0 <= screen_col < 8:
-                        pixel_index = self._get_pixel_index(screen_row, screen_col)
-                        self.controller.np[pixel_index] = text_color
-                text_x_pos += char_widths[char] + 1  # Add a 1px gap between characters
-        
-        self.controller.np.write()
-
-# --------------------------------------------------------------------------------
-# CharactersState
-# --------------------------------------------------------------------------------
-class CharactersState(BaseState):
-    """State for selecting and saving characters."""
+            delay = (trigger.period - elapsed) * 1000
 
-    SELECTION_COLOR = (255, 0, 128)  # Pink color for selection mode
-    
-    def __init__(self, controller):
-        super().__init__(controller)
-        self.selected_index = controller.selected_character
-        self.preview_character = Character(CHARACTERS_DATA[self.selected_index])
-    
-    def on_enter(self):
-        print(f"Entering CharactersState - Showing: {CHARACTERS_DATA[self.selected_index]['name']}")
-    
-    def update(self, current_time):
-        pass
-    
-    def handle_short_press(self):
-        # Cycle through characters
-        self.selected_index = (self.selected_index + 1) % len(CHARACTERS_DATA)
-        
-        # Create new character and force animation to start from beginning of interval
-        new_character = Character(CHARACTERS_DATA[self.selected_index])
-        current_time = time.ticks_ms()
-        
-        # Force animations to start from the beginning of their interval
-        for anim in new_character.animations.values():
-            anim['last_trigger'] = current_time  # Set to current time
-        
-        self.preview_character = new_character
-        print(f"Selected character: {CHARACTERS_DATA[self.selected_index]['name']}")
-    
-    def handle_long_press(self):
-        # Save selection and return to DefaultState
-        self.controller.selected_character = self.selected_index
-        success = self.controller.save_character(self.selected_index)
-        if success:
-            print(f"Saved character selection: {CHARACTERS_DATA[self.selected_index]['name']}")
+        # Long waits are split up so RTC drift and resyncs are picked up, and
+        # so the deadline stays well inside the ticks_ms wraparound range
+        if delay > WALLCLOCK_RECHECK:
+            trigger.job = self.call_later(WALLCLOCK_RECHECK, lambda: self._arm(trigger))
         else:
-            print("Warning: Failed to save character selection")
-        self.controller.switch_to(DefaultState(self.controller))
-    
-    def update_display(self):
-        # Render the character with the selection color
-        self.preview_character.render(
-            mode="available",  # Use available mode as base
-            np=self.controller.np,
-            brightness=BRIGHTNESS,
-            selection_color=self.SELECTION_COLOR
-        )
-
-# --------------------------------------------------------------------------------
-# PomodoroState
-# --------------------------------------------------------------------------------
-class PomodoroState(BaseState):
-    """State for Pomodoro timers with sub-states: INTRO, SETUP, ACTIVE, COMPLETE."""
-    
-    COLORS = {
-        "intro": (255, 128, 0),    # Light orange
-        "setup": (255, 165, 0),    # Orange
-        "active": (255, 69, 0),    # Red-orange
-        "complete": (255, 215, 0), # Gold
-    }
-    
-    def __init__(self, controller):
-        super().__init__(controller)
-        self.sub_state = "intro"
-        self.intro_start_time = time.ticks_ms()
-        self.pomodoro_setup_start = None
-        self.pomodoro_start_time = None
-        self.pomodoro_duration = 15  # Start with 15 minutes
-    
-    def on_enter(self):
-        print("Entering PomodoroState / INTRO")
-        self.sub_state = "intro"
-        self.intro_start_time = time.ticks_ms()
-    
-    def update(self, current_time):
-        # Transition from INTRO to SETUP
-        if self.sub_state == "intro":
-            if time.ticks_diff(current_time, self.intro_start_time) >= INTRO_DURATION:
-                self.sub_state = "setup"
-                self.pomodoro_setup_start = current_time
-                print("Auto: Pomodoro INTRO → SETUP")
-        
-        # Transition from SETUP to ACTIVE if time runs out
-        elif self.sub_state == "setup":
-            if time.ticks_diff(current_time, self.pomodoro_setup_start) >= POMODORO_SETUP_TIMEOUT:
-                self.sub_state = "active"
-                self.pomodoro_start_time = current_time
-                print("Auto: Pomodoro SETUP → ACTIVE (timeout)")
-    
-    def handle_short_press(self):
-        # Adjust or switch sub-states
-        if self.sub_state == "setup":
-            # Increase pomodoro duration in increments of 15, up to 60
-            self.pomodoro_duration += 15
-            if self.pomodoro_duration > 60:
-                self.pomodoro_duration = 15
-            # Reset the setup timeout start
-            self.pomodoro_setup_start = time.ticks_ms()
-            print(f"Short press: Pomodoro duration: {self.pomodoro_duration} minutes")
-        
-        elif self.sub_state == "active":
-            # Interrupt pomodoro
-            self.sub_state = "complete"
-            print("Short press: Pomodoro ACTIVE → COMPLETE (interrupted)")
-        
-        elif self.sub_state == "complete":
-            # Restart pomodoro from intro
-            self.sub_state = "intro"
-            self.intro_start_time = time.ticks_ms()
-            print("Short press: Pomodoro COMPLETE → INTRO (restart)")
-    
-    def handle_long_press(self):
-        # Long press: go back to DefaultState (intro)
-        print("Long press: Pomodoro → Default INTRO")
-        self.controller.switch_to(DefaultState(self.controller))
-    
-    def update_display(self):
-        color = self.COLORS.get(self.sub_state, (255, 255, 255))
-        self._fill_solid_color(color)
-
-# --------------------------------------------------------------------------------
-# UpdateState
-# --------------------------------------------------------------------------------
-class UpdateSubState:
-    """Update process states"""
-    CONNECTING = "connecting"
-    CHECKING = "checking"
-    DOWNLOADING = "downloading"
-    INSTALLING = "installing"
-    ERROR = "error"
-
-class UpdateState(BaseState):
-    """Handles WiFi connection and update process."""
-
-    COLORS = {
-        'CONNECTING': (0, 0, 255),    # Blue
-        'CHECKING': (128, 0, 255),    # Purple
-        'DOWNLOADING': (80, 0, 0),    # Red
-        'INSTALLING': (255, 128, 0),  # Orange
-        'ERROR': (255, 0, 0),         # Red
-    }
-
-    # Define spinner properties
-    BACKGROUND_BRIGHTNESS = 0.1  # Background at 10% brightness
-    SPINNER_BRIGHTNESS = 0.4  # Spinner will be 40% brighter than background
-    SPINNER_SPEED = 100  # ms per step
-    
-    def __init__(self, controller):
-        super().__init__(controller)
-        self.error = None
-        self.spinner_position = 0
-        self.last_spinner_update = time.ticks_ms()
-    
-    def _update_spinner(self, base_color):
-        """Update spinner animation."""
-        current_time = time.ticks_ms()
-        if time.ticks_diff(current_time, self.last_spinner_update) >= self.SPINNER_SPEED:
-            self.spinner_position = (self.spinner_position + 1) % 28
-            self.last_spinner_update = current_time
-        
-        # Create dimmer background color
-        background_color = tuple(int(c * self.BACKGROUND_BRIGHTNESS) for c in base_color)
-        
-        # Create brighter spinner color
-        spinner_color = tuple(int(c * self.SPINNER_BRIGHTNESS) for c in base_color)
-        
-        # Fill with dim background
-        self.controller.np.fill(background_color)
-        
-        # Draw spinner with trail
-        border_pixels = self._get_border_pixels()
-        for i in range(5):  # 5 pixel trail
-            pos = (self.spinner_position - i) % len(border_pixels)
-            row, col = border_pixels[pos]
-            brightness = (5 - i) / 5  # Fade trail from 100% to 0%
-            
-            # Calculate color for this trail pixel
-            color = tuple(
-                int(background_color[j] + (spinner_color[j] - background_color[j]) * brightness)
-                for j in range(3)
-            )
-            self.controller.np[self._get_pixel_index(row, col)] = color
-        
-        self.controller.np.write()
-        
-    def on_enter(self, **kwargs):
-        super().on_enter(**kwargs)
-        self.sub_state = UpdateSubState.CONNECTING
-        print("Starting update check...")
-        self._fill_solid_color(self.COLORS['CONNECTING'])
-        
-    def update(self, current_time):
-        # Handle spinner states
-        if self.sub_state in [UpdateSubState.CONNECTING, UpdateSubState.CHECKING, UpdateSubState.INSTALLING]:
-            self._update_spinner(self.COLORS[self.sub_state.upper()])
-        # Handle error state with solid color
-        elif self.sub_state == UpdateSubState.ERROR:
-            self._fill_solid_color(self.COLORS[self.sub_state.upper()])
-        # Download state is handled by progress bar in _handle_download
-        
-        # Regular state handling
-        if self.sub_state == UpdateSubState.CONNECTING:
-            self._handle_wifi_connection()
-        elif self.sub_state == UpdateSubState.CHECKING:
-            self._handle_version_check()
-        elif self.sub_state == UpdateSubState.DOWNLOADING:
-            self._handle_download()
-        elif self.sub_state == UpdateSubState.INSTALLING:
-            self._handle_install()
-
-    def _handle_wifi_connection(self):
-        """Handle WiFi connection attempt with animation."""
-        try:
-            # Only try to connect if we haven't started yet
-            if not hasattr(self, '_wifi_connection_started'):
-                self._wifi_connection_started = True
-                self._connection_start_time = time.ticks_ms()
-                
-                # Use shared WiFi connection start
-                success, message = WiFiManager.start_connection()
-                if not success:
-                    raise Exception(message)
-            
-            # Check connection status using shared function
-            if WiFiManager.check_connection():
-                print("WiFi connected!")
-                delattr(self, '_wifi_connection_started')
-                self.sub_state = UpdateSubState.CHECKING
-            elif time.ticks_diff(time.ticks_ms(), self._connection_start_time) > WIFI_TIMEOUT_SECONDS * 1000:
-                raise Exception("WiFi connection timeout")
-
-        except Exception as e:
-            self._handle_error("WiFi connection failed", e)
+            trigger.job = self.call_later(delay, lambda: self._fire(trigger))
+
+    def _fire(self, trigger):
+        trigger.job = None
+        elapsed = trigger.elapsed(self.time_manager.rtc.datetime())
+        if elapsed > trigger.period // 2:
+            # Woke up before the RTC reached the boundary - wait the remainder
+            self._arm(trigger)
+            return
+        trigger.fired = True
+        trigger.callback()
+        self._arm(trigger)
+
+    def _insert(self, job):
+        delay = time.ticks_diff(job.due, self.last_tick)
+        steps = max(1, (delay + self.resolution - 1) // self.resolution)
+        self.slots[(self.cursor + steps) % len(self.slots)].append(job)
+
+    def run(self, current_time):
+        """Advance the wheel to current_time and run every job that is due."""
+        steps = time.ticks_diff(current_time, self.last_tick) // self.resolution
+        if steps <= 0:
+            return
 
-    def _handle_version_check(self):
-        """Check for available updates."""
-        try:
-            # Only start version check if we haven't yet
-            if not hasattr(self, '_version_check_started'):
-                self._version_check_started = True
-                self._version_check_start_time = time.ticks_ms()
-                
-                # Do the actual version check
-                content = self._fetch_github_raw()
-                if not content:
-                    raise Exception("Failed to fetch version info")
-                    
-                self._update_info = json.loads(content)
-                print(f"Current version: {CURRENT_VERSION}")
-                print(f"Latest version: {self._update_info['version']}")
-            
-            # Check if enough time has passed (2 seconds)
-            if time.ticks_diff(time.ticks_ms(), self._version_check_start_time) >= 2000:
-                # Time has passed, proceed with state change
-                delattr(self, '_version_check_started')  # Reset for next time
-                
-                if self._update_info['version'] > CURRENT_VERSION or FORCE_UPDATE:
-                    if FORCE_UPDATE:
-                        print("Force update enabled - downloading firmware...")
-                    else:
-                        print(f"Update available: {self._update_info['version']}")
-                        
-                    # Store the URL before changing state
-                    self.controller.transition_data['update_url'] = self._update_info['url']
-                    self.sub_state = UpdateSubState.DOWNLOADING
+        due = []
+        for step in range(1, min(steps, len(self.slots)) + 1):
+            slot = self.slots[(self.cursor + step) % len(self.slots)]
+            pending = []
+            for job in slot:
+                if job.cancelled:
+                    continue
+                if time.ticks_diff(current_time, job.due) >= 0:
+                    due.append(job)
                 else:
-                    print("No update needed")
-                    safe_reset()
-                    
-        except Exception as e:
-            self._handle_error("Version check failed", e)
-        
-    def _fetch_github_raw(self):
-        try:
-            response = urequests.get(UPDATE_URL)
-            content = None
-            if response.status_code == 200:
-                content = response.text  # Store before closing
-            response.close()  # Always close even on error
-            return content.strip() if content else None
-        except Exception as e:
-            print(f"GitHub fetch failed: {e}")
-            return None
-            
-    def _fill_progress_bar(self, color, progress):
-        """
-        Fill display with a progress bar.
-        progress should be 0.0 to 1.0
-        """
-        # Create dimmed background color
-        background_color = tuple(int(c * self.BACKGROUND_BRIGHTNESS) for c in color)
-        
-        # Fill background
-        self.controller.np.fill(background_color)
-        
-        # Calculate how many columns to fill (out of 8)
-        filled_cols = min(8, int(progress * 8))
-        
-        # Fill the progress bar
-        for row in range(8):
-            for col in range(filled_cols):
-                self.controller.np[self._get_pixel_index(row, col)] = color
-                
-        self.controller.np.write()
+                    pending.append(job)
+            slot[:] = pending
 
-    def _handle_download(self):
-        """Download new firmware with progress bar."""
-        try:
-            url = self.controller.transition_data.get('update_url')
-            if not url:
-                raise Exception("No update URL")
-
-            print("Starting download...")
-    
-            # Get content length first
-            response = urequests.get(url, stream=True)
-            if response.status_code != 200:
-                raise Exception(f"Download failed: {response.status_code}")
+        self.cursor = (self.cursor + steps) % len(self.slots)
+        self.last_tick = time.ticks_add(self.last_tick, steps * self.resolution)
 
-            total_size = int(response.headers.get('Content-Length', 0))
-            bytes_downloaded = 0
-
-            
-            # Open file for immediate writing
-            with open('main.py.new', 'wb') as f:
-                # Use much smaller chunks (16 bytes)
-                chunk_size = 16
-
-                 # Progress tracking optimization
-                progress_interval = 512  # Only update UI every 512 bytes
-                last_progress_update = 0
-
-                while True:
-                    chunk = response.raw.read(chunk_size)
-                    if not chunk:
-                        break
-
-                    # Write each chunk immediately
-                    f.write(chunk)
-                    bytes_downloaded += len(chunk)
-
-                    # Update progress bar LESS frequently (not every 256 bytes)
-                    if bytes_downloaded - last_progress_update >= progress_interval:
-                        progress = bytes_downloaded / total_size
-                        self._fill_progress_bar(self.COLORS['DOWNLOADING'], progress)
-                        last_progress_update = bytes_downloaded
-
-                        # Print memory every 5KB
-                        if bytes_downloaded % 5120 == 0:
-                            print("Downloaded:", bytes_downloaded, "/", total_size, "bytes")
-                        
-                        # Force garbage collection after UI updates
-                        gc.collect()
-
-            response.close()
-            
-            # Show complete state briefly
-            self._fill_progress_bar(self.COLORS['DOWNLOADING'], 1.0)
-            time.sleep(0.3)
-            
-            self.sub_state = UpdateSubState.INSTALLING
-            
-        except Exception as e:
-            self._handle_error("Download failed", e)
-            
-    def _handle_install(self):
-        """Install new firmware and reset."""
-        try:
-            # Only start install if we haven't yet
-            if not hasattr(self, '_install_started'):
-                self._install_started = True
-                self._install_start_time = time.ticks_ms()
-                
-                try:
-                    os.remove('main.py.bak')
-                except:
-                    pass 
-                    
-                os.rename('main.py', 'main.py.bak')
-                os.rename('main.py.new', 'main.py')
-                print("Files renamed, waiting before reboot...")
-
-                # Ensure WiFi is disconnected before reboot
-                WiFiManager.disconnect()
-            
-            # Wait for 2 seconds while showing spinner
-            if time.ticks_diff(time.ticks_ms(), self._install_start_time) >= 2000:
-                print("Installation complete, rebooting...")
-                safe_reset()
-                
-        except Exception as e:
-            self._handle_error("Installation failed", e)
-    
-    def _handle_error(self, message, error):
-        """Centralized error handling with flashing animation."""
-        print(f"{message}: {error}")
-        self.error = str(error)
-        self.sub_state = UpdateSubState.ERROR
-        
-        # Flash red 3 times
-        for _ in range(3):
-            self._fill_solid_color((0, 0, 0))
-            time.sleep(0.2)
-            self._fill_solid_color(self.COLORS['ERROR'])
-            time.sleep(0.2)
-        
-        # Brief pause before reboot
-        time.sleep(0.5)
-        safe_reset()
+        for job in due:
+            if job.cancelled:
+                continue
+            if job.period:
+                job.due = time.ticks_add(job.due, job.period)
+                # Don't replay missed periods after a long blocking call
+                if time.ticks_diff(job.due, current_time) <= 0:
+                    job.due = time.ticks_add(current_time, job.period)
+                self._insert(job)
+            job.callback()
+
+    def next_deadline(self):
+        """Ticks of the earliest pending job, or None if nothing is scheduled."""
+        deadline = None
+        for slot in self.slots:
+            for job in slot:
+                if not job.cancelled and (deadline is None or time.ticks_diff(job.due, deadline) < 0):
+                    deadline = job.due
+        return deadline
+
+    def time_until_next(self, current_time, limit):
+        """Milliseconds the schedule task may sleep, capped at limit."""
+        deadline = self.next_deadline()
+        if deadline is None:
+            return limit
+        return max(0, min(limit, time.ticks_diff(deadline, current_time)))
 
 # --------------------------------------------------------------------------------
 # Time Management
@@ -1202,23 +452,13 @@ class TimeManager:
         self.timezone_offset = 1  # Sweden is UTC+1 by default (CET)
     
     def sync_time(self):
-        """Synchronize RTC with network time and adjust for timezone."""
+        """
+        Synchronize RTC with network time and adjust for timezone.
+        Expects an open network session (see NetworkSession).
+        """
         try:
-            # Start connection
-            success, message = WiFiManager.start_connection()
-            if not success:
-                print(f"WiFi connection failed: {message}")
-                return False
-                
-            # Wait for connection with timeout
-            start_time = time.ticks_ms()
-            while not WiFiManager.check_connection():
-                if time.ticks_diff(time.ticks_ms(), start_time) > WIFI_TIMEOUT_SECONDS * 1000:
-                    print("WiFi connection timeout")
-                    return False
-                time.sleep(0.1)
-                
-            # Proceed with time sync to get UTC time
+            # Get UTC time - ntptime is dropped again with the network code
+            import ntptime
             ntptime.settime()
             
             # Get and adjust for timezone
@@ -1244,8 +484,6 @@ class TimeManager:
         except Exception as e:
             print(f"Time sync failed: {e}")
             return False
-        finally:
-            WiFiManager.disconnect()
     
     def _is_dst_simplified(self, month, day):
         """
@@ -1278,15 +516,22 @@ class TimeManager:
         return dt[0], dt[1], dt[2], dt[4], dt[5], dt[6]  # Year, month, day, hour, minute, second
 
     def is_midnight(self):
-        """Check if it's update time (03:00-03:30)."""
+        """Check if it's update time (03:00-03:45)."""
         dt = self.rtc.datetime()
         _, _, _, _, h, m, _, _ = dt
 
         # Debug override: Uncomment to force test time interval between 17:00 and 17:10
         # return h == 17 and m < 10
 
-        # If after 3 AM and before 3:30 AM
-        return h == 3 and m < 45
+        # If after 3 AM and before 3:45 AM
+        return h == UPDATE_WINDOW_HOUR and m < UPDATE_WINDOW_MINUTES
+
+    def seconds_left_in_update_window(self):
+        """Seconds until the update window closes (0 outside the window)."""
+        if not self.is_midnight():
+            return 0
+        _, _, _, _, _, m, s, _ = self.rtc.datetime()
+        return UPDATE_WINDOW_MINUTES * 60 - (m * 60 + s)
     
     def is_friyay_time(self):
         """Check if it's FRIYAY time (Friday 15:00 to Saturday 02:00)."""
@@ -1323,9 +568,29 @@ class StateController:
         self.current_state = None
         self.transition_data = {}  # For passing data between states
         self.selected_character = self._load_saved_character()  # Load saved character
+        BOOT.mark('char_config')
         self.time_manager = TimeManager()  # Add time manager
+        self.network = NetworkSession()  # Shared radio window for all network jobs
+        if NET_DUAL_CORE:
+            # Same interface, with the session itself running on core 1
+            from dualcore import start_worker
+            self.network = start_worker(self.network, preload_network)
+        self.peer_cache = None  # Created while seeding firmware to LAN peers
         self.last_day_checked = None  # For tracking latest updated day
-        self.last_friyay_check = time.ticks_ms()  # Add this line
+
+        # Calendar events fire exactly at their boundaries once time is synced
+        self.scheduler = Scheduler(self.time_manager)
+
+        # Each device checks at its own fixed offset into the update window
+        stagger = device_hash() % (UPDATE_STAGGER_MINUTES * 60)
+        self.scheduler.at(UPDATE_WINDOW_HOUR, stagger // 60, self.check_scheduled_updates,
+                          window=UPDATE_WINDOW_MINUTES - stagger // 60 - 1, second=stagger % 60)
+        self.scheduler.at(15, 0, self.check_scheduled_friyay, weekday=4, window=11 * 60)  # Friday 15:00
+        self.scheduler.at(2, 0, self.check_scheduled_friyay, weekday=5)  # Saturday 02:00
+
+        # Asset packs are small, so they're checked for far more often than firmware
+        self.scheduler.call_every(ASSET_CHECK_INTERVAL + device_hash("assets") % ASSET_CHECK_JITTER,
+                                  self.request_asset_check)
     
     def _load_saved_character(self):
         """Load the saved character ID from storage."""
@@ -1333,9 +598,9 @@ class StateController:
             with open("char_config.json", "r") as f:
                 saved_id = json.load(f)
                 # Find the index of the character with this ID
-                for idx, char_data in enumerate(CHARACTERS_DATA):
-                    if char_data['id'] == saved_id:
-                        return idx
+                idx = assets.CHARACTERS.index_of(saved_id)
+                if idx is not None:
+                    return idx
         except:
             pass  # Any error, return default
         return 0  # Default to first character
@@ -1343,7 +608,7 @@ class StateController:
     def save_character(self, index):
         """Save the selected character ID to storage."""
         try:
-            char_id = CHARACTERS_DATA[index]['id']
+            char_id = assets.CHARACTERS.id_at(index)
             with open("char_config.json", "w") as f:
                 json.dump(char_id, f)
             return True
@@ -1351,7 +616,7 @@ class StateController:
             print(f"Failed to save character config: {e}")
             return False
     
-    def switch_to(self, new_state, **kwargs):
+    async def switch_to(self, new_state, **kwargs):
         """
         Enhanced state transition with data passing.
         
@@ -1360,26 +625,113 @@ class StateController:
             **kwargs: Optional data to pass to the new state
         """
         if self.current_state:
-            self.current_state.on_exit()
-            
+            await self.current_state.on_exit()
+
+        # Zones start dark in every state; the states that use one set it each frame
+        for name, _ in EXTRA_ZONES:
+            self.np.set_color(name, (0, 0, 0))
+
         self.current_state = new_state
-        self.current_state.on_enter(**kwargs)
+        await self.current_state.on_enter(**kwargs)
     
-    def update(self, current_time):
+    async def start_update(self, scheduled=False):
+        """Switch to UpdateState, loading the network and OTA code for it."""
+        await self.switch_to(load_network().UpdateState(self, scheduled=scheduled))
+
+    def request_time_sync(self):
+        """Queue an NTP sync for the next network window."""
+        self.network.register('time_sync', self._sync_time, NET_PRIORITY_TIME, on_done=self._time_synced)
+
+    def request_asset_check(self):
+        """Queue an asset pack check for the next network window."""
+        self.network.register('asset_check', self._check_assets, NET_PRIORITY_NORMAL,
+                              on_done=self._assets_checked)
+
+    def _check_assets(self, deadline):
+        """Network job: download a changed asset pack; returns its path or None."""
+        return load_network().download_asset_pack(deadline)
+
+    def _assets_checked(self, path):
+        if path:
+            self.install_assets(path)
+
+    def install_assets(self, path):
+        """Replace the asset pack with the one at path and hot-swap it in."""
+        selected_id = assets.CHARACTERS.id_at(self.selected_character)
+
+        try:
+            os.remove(ASSET_PACK_FILE + '.bak')
+        except OSError:
+            pass
+        try:
+            os.rename(ASSET_PACK_FILE, ASSET_PACK_FILE + '.bak')
+        except OSError:
+            pass  # First pack on this device
+        os.rename(path, ASSET_PACK_FILE)
+
+        assets.load_assets()
+        if not assets.ASSET_PACK:
+            # The new pack doesn't load - put the previous one back
+            print("New asset pack is invalid, rolling back")
+            os.remove(ASSET_PACK_FILE)
+            try:
+                os.rename(ASSET_PACK_FILE + '.bak', ASSET_PACK_FILE)
+            except OSError:
+                pass
+            assets.load_assets()
+
+        index = assets.CHARACTERS.index_of(selected_id)
+        self.selected_character = index if index is not None else 0
         if self.current_state:
-            self.current_state.update(current_time)
+            self.current_state.on_assets_changed()
+        print("Asset pack installed")
+
+    def _sync_time(self, deadline):
+        """Network job: set the clock over NTP."""
+        return self.time_manager.sync_time()
+
+    def _time_synced(self, synced):
+        if synced:
+            print("Background time sync successful")
+            self.scheduler.rearm_wallclock()
+        else:
+            print("Background time sync failed")
+
+    def seed_firmware(self, manifest):
+        """Serve our (verified) firmware to LAN peers for the rest of the update window."""
+        if not PEER_CACHE_ENABLED:
+            return
+        peer_cache = load_network().PeerCache()
+        if not peer_cache.start_seeding(manifest):
+            return
+        self.peer_cache = peer_cache
+        self.network.hold('peer_seed')
+        remaining = self.time_manager.seconds_left_in_update_window()
+        self.scheduler.call_later(remaining * 1000, self.stop_seeding)
+
+    def stop_seeding(self):
+        if self.peer_cache:
+            self.peer_cache.stop_seeding()
+            self.peer_cache = None
+        self.network.release('peer_seed')
+
+    async def update(self, current_time):
+        """Advance the current state; the scheduler and network have tasks of their own."""
+        if self.current_state:
+            await self.current_state.update(current_time)
     
-    def handle_short_press(self):
+    async def handle_short_press(self):
         if self.current_state:
-            self.current_state.handle_short_press()
+            await self.current_state.handle_short_press()
     
-    def handle_long_press(self):
+    async def handle_long_press(self):
         if self.current_state:
-            self.current_state.handle_long_press()
+            await self.current_state.handle_long_press()
     
-    def update_display(self):
+    async def update_display(self):
         if self.current_state:
-            self.current_state.update_display()
+            await self.current_state.update_display()
+        self.np.show()  # Zones changed outside a matrix frame
 
     def check_scheduled_updates(self):
         """Check if it's time for a scheduled update."""
@@ -1393,14 +745,22 @@ class StateController:
         current_date = self.time_manager.get_datetime()[:3]
 
         # Only proceed if:
-        # 1. It's update time (3:00-3:30)
+        # 1. It's update time (3:00-3:45)
         # 2. We haven't updated today
         if (self.time_manager.is_midnight() and 
             current_date != self.last_day_checked):
             
             print("🔄 Update time detected - initiating scheduled update")
             self.last_day_checked = current_date
-            self.switch_to(UpdateState(self))
+            asyncio.create_task(self.start_update(scheduled=True))  # Scheduler callbacks can't await
+
+    def retry_scheduled_update(self, seconds):
+        """Retry today's scheduled update check after a server-requested delay."""
+        # Spread the retries too, or the whole fleet comes back at once
+        delay = seconds + device_hash("retry") % (UPDATE_RETRY_JITTER + 1)
+        print(f"Retrying update check in {delay} seconds")
+        self.last_day_checked = None
+        self.scheduler.call_later(delay * 1000, self.check_scheduled_updates)
 
     def check_scheduled_friyay(self):
         """Check if it's time for FRIYAY mode."""
@@ -1446,131 +806,93 @@ class StateController:
                     print("Switching from FRIYAY to AVAILABLE (no longer Friyay time)")
 
 
-class CoffeeState(BaseState):
-    """Coffee break mode - shows coffee mug until tapped again."""
-    
-    def __init__(self, controller):
-        super().__init__(controller)
-        self.coffee_icon = None
-        
-    def on_enter(self):
-        print("☕ Coffee break mode activated!")
-        # Find the coffee icon
-        for icon_data in ICONS_DATA:
-            if icon_data['id'] == 'coffee':
-                self.coffee_icon = Character(icon_data)  # Reuse Character class
-                break
-        
-        if not self.coffee_icon:
-            # Fallback to red screen if icon not found
-            pass
-    
-    def handle_short_press(self):
-        print("☕ Coffee break over - returning to normal mode")
-        self.controller.switch_to(DefaultState(self.controller))
-    
-    def handle_long_press(self):
-        self.handle_short_press()
-    
-    def update_display(self):
-        if self.coffee_icon:
-            # Just render normally - it will automatically use the brown body_color
-            self.coffee_icon.render(
-                mode='available',  # This gets ignored because of body_color
-                np=self.controller.np,
-                brightness=BRIGHTNESS
-            )
-        else:
-            self._fill_solid_color((255, 0, 0))
-
-
 # --------------------------------------------------------------------------------
-# Main Loop
+# Compositor - Owns the LED strip and its zones
 # --------------------------------------------------------------------------------
+class Zone:
+    """A named run of LEDs on the strip, drawn by its producer when dirty."""
+    def __init__(self, name, start, count, producer):
+        self.name = name
+        self.start = start
+        self.count = count
+        self.producer = producer  # producer(buf, start, count) draws into the strip buffer
+        self.dirty = True
+
+class Compositor:
+    """
+    The whole LED strip: the matrix zone, then EXTRA_ZONES. States draw on the
+    8x8 canvas (buf, LED index row * 8 + col) and call write() when a frame is
+    done; every dirty zone is then drawn into the strip buffer, which goes out
+    in one bus write under the power budget.
+    """
+    def __init__(self, pin):
+        leds = NUM_LEDS + sum(count for _, count in EXTRA_ZONES)
+        self.pixels = open_strip(pin, leds)
+        self.power = PowerBudget(leds)
+        self.panel = panel_map()
+        # A plain 8x8 panel is drawn on directly
+        self.buf = memoryview(self.pixels.buf)[:64 * 3] if self.panel is None else bytearray(64 * 3)
+
+        self.dimmed = False
+        self.zones = {}
+        self.add_zone('matrix', NUM_LEDS, self._present)
+        for name, count in EXTRA_ZONES:
+            self.add_zone(name, count, SolidZone())
+
+    def add_zone(self, name, count, producer):
+        start = sum(zone.count for zone in self.zones.values())
+        self.zones[name] = Zone(name, start, count, producer)
+
+    def set_color(self, name, color):
+        """Set a solid color zone; does nothing if the strip has no such zone."""
+        zone = self.zones.get(name)
+        if zone and zone.producer.set(color):
+            zone.dirty = True
+
+    def _present(self, buf, start, count):
+        if self.panel:
+            kernels.present(buf, self.buf, self.panel, count)
+
+    def __setitem__(self, index, color):
+        self.buf[index * 3] = color[1]
+        self.buf[index * 3 + 1] = color[0]
+        self.buf[index * 3 + 2] = color[2]
+
+    def fill(self, color):
+        kernels.fill(self.buf, len(self.buf), color[1] << 16 | color[0] << 8 | color[2])
+
+    def write(self):
+        """The canvas holds a finished frame: show it, with any other changed zones."""
+        self.zones['matrix'].dirty = True
+        self.show()
+
+    def show(self):
+        """Draw the dirty zones and write the strip once, if anything changed."""
+        if not any(zone.dirty for zone in self.zones.values()):
+            return
+        for zone in self.zones.values():
+            # After a dimmed frame every zone is redrawn, as the budget scaled them in place
+            if zone.dirty or self.dimmed:
+                zone.producer(self.pixels.buf, zone.start, zone.count)
+                zone.dirty = False
+        self.dimmed = self.power.apply(self.pixels.buf)
+        self.pixels.write()
 
-def main():
-    # Initialize hardware
-    np = neopixel.NeoPixel(machine.Pin(LED_PIN), NUM_LEDS)
-
-    # IMMEDIATE CLEAR - turn off all LEDs as the very first action
-    np.fill((0, 0, 0))
-    np.write()
-
-    button = machine.Pin(BUTTON_PIN, machine.Pin.IN, machine.Pin.PULL_UP)
-    controller = StateController(np)
-
-    # Check if button is disconnected at boot time
-    button_disconnected = check_button_disconnected(button, BUTTON_DISCONNECT_THRESHOLD)
-    if button_disconnected:
-        print("WARNING: Button appears to be disconnected at boot")
-    
-    # Initialize state variables
+# --------------------------------------------------------------------------------
+# Tasks
+# --------------------------------------------------------------------------------
+async def input_task(controller, button, disconnected):
+    """Poll the button every BUTTON_POLL_TIME ms and turn presses into state events."""
     button_state = {
         'pressed': False,
         'press_start': 0,
         'last_action_time': 0,
-        'disconnected': button_disconnected,
+        'disconnected': disconnected,
         'last_state': button.value()
     }
-    
-    background_state = {
-        'intro_complete': False,
-        'wifi_started': False,
-        'time_synced': False,
-        'wifi_start_time': None,
-        'last_schedule_check': time.ticks_ms(),
-        'last_friyay_check': time.ticks_ms()
-    }
 
-    # Normal boot - always start in default mode
-    controller.switch_to(DefaultState(controller))
-    print("Starting in DEFAULT mode")
-
-    # Main loop
     while True:
         current_time = time.ticks_ms()
-        
-        # Handle background tasks
-        if isinstance(controller.current_state, DefaultState):
-            # Track intro completion
-            if not background_state['intro_complete']:
-                if controller.current_state.sub_state != DefaultSubState.INTRO:
-                    background_state['intro_complete'] = True
-                    background_state['wifi_start_time'] = current_time
-            
-            # Handle WiFi and time sync
-            elif not background_state['time_synced']:
-                if not background_state['wifi_started']:
-                    success, message = WiFiManager.start_connection()
-                    background_state['wifi_started'] = True
-                    if not success:
-                        print(f"Background WiFi connection failed: {message}")
-                        background_state['time_synced'] = True
-                
-                elif WiFiManager.check_connection():
-                    if controller.time_manager.sync_time():
-                        print("Background time sync successful")
-                    else:
-                        print("Background time sync failed")
-                    background_state['time_synced'] = True
-                    WiFiManager.disconnect()
-                
-                elif time.ticks_diff(current_time, background_state['wifi_start_time']) > WIFI_TIMEOUT_SECONDS * 1000:
-                    print("Background WiFi connection timed out")
-                    background_state['time_synced'] = True
-
-        # Update state and check schedules
-        controller.update(current_time)
-        if time.ticks_diff(current_time, background_state['last_schedule_check']) >= SCHEDULED_UPDATE_CHECK:
-            controller.check_scheduled_updates()
-            background_state['last_schedule_check'] = current_time
-
-        # Check if it's FRIYAY time
-        if time.ticks_diff(current_time, background_state['last_friyay_check']) >= SCHEDULED_FRIYAY_CHECK:
-            controller.check_scheduled_friyay()
-            background_state['last_friyay_check'] = current_time
-
-        # Handle button input
         current_button_value = button.value()
 
         # Check for button reconnection or disconnection
@@ -1584,7 +906,7 @@ def main():
         elif current_button_value == BUTTON_PRESSED_VALUE and not button_state['pressed'] and not button_state['disconnected']:
             # Button just went high and not previously flagged as disconnected
             # Verify it's a real press by waiting briefly to see if it changes
-            if check_button_disconnected(button, BUTTON_DISCONNECT_THRESHOLD):
+            if await check_button_disconnected(button, BUTTON_DISCONNECT_THRESHOLD):
                 print("Button appears to be disconnected")
                 button_state['disconnected'] = True
 
@@ -1605,34 +927,102 @@ def main():
                     # First threshold: Normal long press (mode switch) at 0.7 seconds
                     if press_duration >= LONG_PRESS_TIME and press_duration < CHARACTER_SELECT_TIME:
                         if button_state['last_action_time'] < LONG_PRESS_TIME:
-                            controller.handle_long_press()  # Original long press handler
+                            await controller.handle_long_press()  # Original long press handler
                             button_state['last_action_time'] = LONG_PRESS_TIME
                     
                     # Second threshold: Character select at 3 seconds
                     elif press_duration >= CHARACTER_SELECT_TIME and press_duration < FORCE_UPDATE_TIME:
                         if button_state['last_action_time'] < CHARACTER_SELECT_TIME:
-                            controller.switch_to(CharactersState(controller))
+                            await controller.switch_to(CharactersState(controller))
                             button_state['last_action_time'] = CHARACTER_SELECT_TIME
                     
                     # Third threshold: Force update at 6 seconds
                     elif press_duration >= FORCE_UPDATE_TIME:
                         if button_state['last_action_time'] < FORCE_UPDATE_TIME:
-                            controller.switch_to(UpdateState(controller))
+                            await controller.start_update()
                             button_state['last_action_time'] = FORCE_UPDATE_TIME
             else:  # Released
                 if button_state['pressed']:
                     press_duration = time.ticks_diff(current_time, button_state['press_start'])
                     if press_duration < LONG_PRESS_TIME and button_state['last_action_time'] == 0:
-                        controller.handle_short_press()
+                        await controller.handle_short_press()
                     button_state['pressed'] = False
                     button_state['last_action_time'] = 0
 
-        # Update display
-        controller.update_display()
-        time.sleep(0.01)
+        await asyncio.sleep_ms(BUTTON_POLL_TIME)
+
+async def render_task(controller):
+    """Advance the current state and draw a frame every FRAME_TIME ms."""
+    while True:
+        frame_start = time.ticks_ms()
+        await controller.update(frame_start)
+        await controller.update_display()
+        BOOT.finish()  # Saves the boot timeline after the first frame, then does nothing
+
+        # Sleep out the rest of the frame, but always yield to the other tasks
+        await asyncio.sleep_ms(max(0, FRAME_TIME - time.ticks_diff(time.ticks_ms(), frame_start)))
+
+async def schedule_task(scheduler):
+    """Run timer and wall-clock jobs as they fall due."""
+    while True:
+        scheduler.run(time.ticks_ms())
+        # A job added while this sleeps can't be due before the next wheel slot
+        await asyncio.sleep_ms(scheduler.time_until_next(time.ticks_ms(), SCHEDULER_RESOLUTION))
+
+async def network_task(controller):
+    """Step the network session (or deliver core 1's results) and the LAN peer cache."""
+    intro_complete = False
+    while True:
+        # Sync time in the first network window once the intro is done
+        state = controller.current_state
+        if not intro_complete and isinstance(state, DefaultState) and state.sub_state != DefaultSubState.INTRO:
+            intro_complete = True
+            controller.request_time_sync()
+            controller.request_asset_check()  # Rides the same radio window
+
+        # Single-core, a running job holds up the other tasks until it returns
+        controller.network.update(time.ticks_ms())
+        if controller.peer_cache and controller.network.is_connected():
+            controller.peer_cache.poll()
+        await asyncio.sleep_ms(NET_STEP_PERIOD)
+
+async def run(controller, button):
+    """Boot into DEFAULT mode, then run the input, render, schedule and network tasks."""
+    # Check if button is disconnected at boot time
+    button_disconnected = await check_button_disconnected(button, BUTTON_DISCONNECT_THRESHOLD)
+    BOOT.mark('button_check')
+    if button_disconnected:
+        print("WARNING: Button appears to be disconnected at boot")
+
+    # Normal boot - always start in default mode
+    await controller.switch_to(DefaultState(controller))
+    print("Starting in DEFAULT mode")
+    BOOT.mark('default_state')
+
+    # An exception in any task ends them all
+    await asyncio.gather(
+        input_task(controller, button, button_disconnected),
+        render_task(controller),
+        schedule_task(controller.scheduler),
+        network_task(controller))
+
+def main():
+    # Initialize hardware
+    np = Compositor(machine.Pin(LED_PIN))
+
+    # IMMEDIATE CLEAR - turn off all LEDs as the very first action
+    np.fill((0, 0, 0))
+    np.write()
+    BOOT.mark('np_clear')
+
+    button = machine.Pin(BUTTON_PIN, machine.Pin.IN, machine.Pin.PULL_UP)
+    controller = StateController(np)
+    BOOT.mark('controller')
+
+    asyncio.run(run(controller, button))
 
 # Function to check if button is disconnected
-def check_button_disconnected(button_pin, verify_time_ms):
+async def check_button_disconnected(button_pin, verify_time_ms):
     """
     Check if button appears to be disconnected (constantly high)
     Returns True if disconnected, False if connected
@@ -1646,7 +1036,7 @@ def check_button_disconnected(button_pin, verify_time_ms):
     while time.ticks_diff(time.ticks_ms(), start_time) < verify_time_ms:
         if button_pin.value() != BUTTON_PRESSED_VALUE:
             return False  # Button changed state, it's connected
-        time.sleep(0.01)
+        await asyncio.sleep_ms(10)
     
     # If we get here, button was constantly high - likely disconnected
     return True
@@ -1655,4 +1045,4 @@ if __name__ == '__main__':
     try:
         main()
     except KeyboardInterrupt:
-        print("\nProgram terminated by user")
\ No newline at end of file
+        print("\nProgram terminated by user")
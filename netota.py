@@ -0,0 +1,1065 @@
+"""
+LED Matrix Controller - Network and OTA
+
+WiFi, the HTTP client, the update manifest, the LAN peer cache, UpdateState
+and the network jobs. Nothing here is imported at boot: the controller loads
+this module when a radio window opens or an update starts, and drops it again
+once the radio is off (see load_network/unload_network in main.py).
+"""
+import os
+import time
+import errno
+import asyncio
+import json
+import gc
+import socket
+import hashlib
+import binascii
+import struct
+
+from config import *
+from states import BaseState, DefaultState
+from display import scale_color, grb
+import assets
+import kernels
+
+# --------------------------------------------------------------------------------
+# WiFi Management
+# --------------------------------------------------------------------------------
+# network and machine are imported where they're used, so this module also
+# imports on a computer (see device_hash in config.py)
+
+def safe_reset():
+    """
+    Reset the device, but first shut down WiFi to avoid CYW43 getting stuck
+    across soft resets.
+    """
+    import machine
+    import network
+    try:
+        wlan = network.WLAN(network.STA_IF)
+
+        # Always try disconnect first (even if not active)
+        try:
+            wlan.disconnect()
+        except:
+            pass
+
+        # Then force radio off
+        try:
+            wlan.active(False)
+        except:
+            pass
+
+        time.sleep(1)
+    except:
+        pass
+
+    machine.reset()
+
+class WiFiManager:
+    """Centralized WiFi connection management."""
+    SETTLE_MS = 200  # Time the driver gets after the radio is switched off or on
+    
+    @staticmethod
+    def start_connection():
+        """
+        Initialize WiFi connection process. A generator, so the network
+        session can wait without blocking: it yields the ms to wait before the
+        next step and returns (success, message).
+        """
+        try:
+            from wifi_config import WIFI_SSID, WIFI_PASSWORD
+            if not WIFI_SSID or not WIFI_PASSWORD:
+                raise Exception("No WiFi credentials")
+
+            import network
+
+            wlan = network.WLAN(network.STA_IF)
+
+            # If already connected, do nothing
+            if wlan.isconnected():
+                return True, "Already connected"
+
+            # Force a clean interface start (helps after soft resets / wedged driver)
+            try:
+                wlan.disconnect()
+            except:
+                pass
+            try:
+                wlan.active(False)
+            except:
+                pass
+            yield WiFiManager.SETTLE_MS
+
+            wlan.active(True)
+            yield WiFiManager.SETTLE_MS
+
+            print(f"Connecting to WiFi: {WIFI_SSID}")
+            wlan.connect(WIFI_SSID, WIFI_PASSWORD)
+            return True, WIFI_SSID
+
+        except ImportError:
+            return False, "No WiFi credentials file"
+        except Exception as e:
+            return False, str(e)
+    
+    @staticmethod
+    def check_connection():
+        """Check current connection status."""
+        import network
+        wlan = network.WLAN(network.STA_IF)
+        return wlan.isconnected()
+    
+    @staticmethod
+    def disconnect():
+        """Safely disconnect from WiFi."""
+        if WIFI_DISCONNECT_AFTER_USE:
+            try:
+                import network
+                wlan = network.WLAN(network.STA_IF)
+                if wlan.isconnected():
+                    wlan.disconnect()
+                    wlan.active(False)
+                    print("WiFi disconnected")
+            except Exception as e:
+                print(f"WiFi disconnect error: {e}")
+
+# --------------------------------------------------------------------------------
+# HTTP Client
+# --------------------------------------------------------------------------------
+def _split_url(url):
+    """Split a URL into (scheme, host, port, path)."""
+    scheme, _, rest = url.partition('://')
+    hostport, _, path = rest.partition('/')
+    host, _, port = hostport.partition(':')
+    port = int(port) if port else (443 if scheme == 'https' else 80)
+    return scheme, host, port, '/' + path
+
+def _wrap_tls(sock, host):
+    import ssl
+    if hasattr(ssl, 'create_default_context'):  # CPython
+        return ssl.create_default_context().wrap_socket(sock, server_hostname=host)
+    return ssl.wrap_socket(sock, server_hostname=host)
+
+def stream_to_file(response, path, progress=None, deadline=None):
+    """
+    Stream a response body to a file through one reused buffer.
+    Calls progress(bytes_done, total) after every buffer and returns
+    (bytes_written, sha256 hex digest).
+    """
+    total = response.remaining
+    buf = bytearray(DOWNLOAD_BUFFER_SIZE)
+    mv = memoryview(buf)
+    digest = hashlib.sha256()
+    written = 0
+    with open(path, 'wb') as f:
+        while True:
+            n = response.readinto(buf)
+            if not n:
+                break
+            f.write(mv[:n])
+            digest.update(mv[:n])
+            written += n
+            if progress:
+                progress(written, total)
+            if deadline is not None and time.ticks_diff(time.ticks_ms(), deadline) >= 0:
+                raise Exception("Network time budget exhausted")
+    return written, binascii.hexlify(digest.digest()).decode()
+
+class HTTPResponse:
+    """
+    Response body reader. Bodies are never buffered: callers pull them with
+    readinto() into their own buffers, and chunked encoding is decoded on the fly.
+    """
+    def __init__(self, client, status, headers, keep_alive, method):
+        self.client = client
+        self.stream = client.stream
+        self.status = status
+        self.headers = headers
+        self.done = False
+        self.chunked = False
+        self.chunk_left = 0
+        self.remaining = None  # None = read until the server closes
+
+        if method == 'HEAD' or status in (204, 304) or status < 200:
+            self.remaining = 0
+        elif 'chunked' in headers.get('transfer-encoding', ''):
+            self.chunked = True
+        elif 'content-length' in headers:
+            self.remaining = int(headers['content-length'])
+
+        # Without a length the only end-of-body marker is the connection closing
+        self.keep_alive = keep_alive and (self.chunked or self.remaining is not None)
+        if self.remaining == 0:
+            self._finish()
+
+    def readinto(self, buf):
+        """Read up to len(buf) body bytes into buf; returns 0 at the end of the body."""
+        if self.done:
+            return 0
+        mv = memoryview(buf)
+
+        if self.chunked:
+            if self.chunk_left == 0:
+                line = self.stream.readline()
+                if not line:
+                    raise OSError("Truncated chunked response")
+                self.chunk_left = int(line.split(b';')[0].strip(), 16)
+                if self.chunk_left == 0:
+                    # Skip trailers
+                    while self.stream.readline() not in (b'', b'\r\n', b'\n'):
+                        pass
+                    self._finish()
+                    return 0
+            n = self.stream.readinto(mv[:min(len(buf), self.chunk_left)])
+            if not n:
+                raise OSError("Truncated chunked response")
+            self.chunk_left -= n
+            if self.chunk_left == 0:
+                self.stream.readline()  # CRLF after the chunk data
+            return n
+
+        if self.remaining is None:
+            n = self.stream.readinto(mv)
+            if not n:
+                self._finish()
+            return n
+
+        n = self.stream.readinto(mv[:min(len(buf), self.remaining)])
+        if not n:
+            raise OSError("Truncated response")
+        self.remaining -= n
+        if self.remaining == 0:
+            self._finish()
+        return n
+
+    def read(self):
+        """Read the whole body. Only meant for small bodies like the manifest."""
+        body = bytearray()
+        buf = bytearray(256)
+        while True:
+            n = self.readinto(buf)
+            if not n:
+                return bytes(body)
+            body.extend(buf[:n])
+
+    def close(self):
+        """Release the response; an unfinished body costs the connection."""
+        if not self.done:
+            self.done = True
+            self.client.close()
+
+    def _finish(self):
+        self.done = True
+        if not self.keep_alive:
+            self.client.close()
+
+class HTTPClient:
+    """
+    Minimal HTTP/1.1 client with socket timeouts and a single keep-alive
+    connection, so the manifest check and the firmware download can share
+    one TCP (and TLS) handshake.
+    """
+    def __init__(self, timeout=HTTP_TIMEOUT):
+        self.timeout = timeout
+        self.sock = None
+        self.stream = None
+        self.key = None
+
+    def get(self, url, headers=None):
+        return self.request('GET', url, headers)
+
+    def request(self, method, url, headers=None):
+        """Send a request, following redirects; returns an HTTPResponse."""
+        for _ in range(HTTP_MAX_REDIRECTS + 1):
+            scheme, host, port, path = _split_url(url)
+            response = self._request(method, scheme, host, port, path, headers)
+            location = response.headers.get('location')
+            if response.status not in (301, 302, 303, 307, 308) or not location:
+                return response
+
+            # Drain the (small) redirect body so the connection stays usable
+            buf = bytearray(64)
+            while response.readinto(buf):
+                pass
+            if location.startswith('/'):
+                location = f"{scheme}://{host}:{port}{location}"
+            url = location
+        raise Exception("Too many redirects")
+
+    def close(self):
+        if self.sock:
+            try:
+                self.sock.close()
+            except OSError:
+                pass
+        self.sock = None
+        self.stream = None
+        self.key = None
+
+    def _request(self, method, scheme, host, port, path, headers):
+        lines = [f"{method} {path} HTTP/1.1", f"Host: {host}",
+                 "Connection: keep-alive", f"User-Agent: dnd/{CURRENT_VERSION}"]
+        if headers:
+            for name, value in headers.items():
+                lines.append(f"{name}: {value}")
+        request = ("\r\n".join(lines) + "\r\n\r\n").encode()
+
+        reused = self.key == (scheme, host, port)
+        try:
+            if not reused:
+                self._connect(scheme, host, port)
+            return self._exchange(request, method)
+        except OSError:
+            if not reused:
+                raise
+        # The server dropped our idle keep-alive connection - retry once
+        self._connect(scheme, host, port)
+        return self._exchange(request, method)
+
+    def _connect(self, scheme, host, port):
+        self.close()
+        addr = socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM)[0]
+        sock = socket.socket(addr[0], socket.SOCK_STREAM)
+        try:
+            sock.settimeout(self.timeout)
+            sock.connect(addr[-1])
+            if scheme == 'https':
+                sock = _wrap_tls(sock, host)
+        except:
+            sock.close()
+            raise
+        self.sock = sock
+        self.stream = sock.makefile('rb') if hasattr(sock, 'makefile') else sock
+        self.key = (scheme, host, port)
+
+    def _exchange(self, request, method):
+        try:
+            if hasattr(self.sock, 'sendall'):
+                self.sock.sendall(request)
+            else:
+                self.sock.write(request)
+
+            status_line = self.stream.readline().split(None, 2)
+            if len(status_line) < 2:
+                raise OSError("Connection closed")
+            headers = {}
+            while True:
+                line = self.stream.readline()
+                if line in (b'', b'\r\n', b'\n'):
+                    break
+                name, _, value = line.decode().partition(':')
+                headers[name.strip().lower()] = value.strip()
+        except:
+            self.close()
+            raise
+
+        connection = headers.get('connection', '').lower()
+        keep_alive = connection == 'keep-alive' or (
+            status_line[0] == b'HTTP/1.1' and connection != 'close')
+        return HTTPResponse(self, int(status_line[1]), headers, keep_alive, method)
+
+# --------------------------------------------------------------------------------
+# Manifest
+# --------------------------------------------------------------------------------
+def fetch_manifest(http):
+    """
+    Fetch manifest.json, revalidating the cached copy with its ETag.
+    Returns (content, retry_after) - content is None on failure, retry_after is
+    the server's Retry-After in seconds on a 429/503, otherwise None.
+    """
+    etag, cached = _load_manifest_cache()
+    content = None
+    retry_after = None
+    try:
+        response = http.get(UPDATE_URL, {'If-None-Match': etag} if etag else None)
+        try:
+            if response.status == 304 and cached:
+                print("Manifest not modified")
+                content = cached
+            elif response.status == 200:
+                content = response.read().decode().strip()
+                if response.headers.get('etag'):
+                    _save_manifest_cache(response.headers['etag'], content)
+            elif response.status in (429, 503):
+                header = response.headers.get('retry-after')
+                if header and header.isdigit():
+                    retry_after = int(header)
+        finally:
+            response.close()  # Always close even on error
+    except Exception as e:
+        print(f"GitHub fetch failed: {e}")
+    return content, retry_after
+
+def _load_manifest_cache():
+    """Return (etag, manifest) from the last successful fetch, or (None, None)."""
+    try:
+        with open(MANIFEST_CACHE, 'r') as f:
+            etag = f.readline().strip()
+            return etag, f.read()
+    except OSError:
+        return None, None
+
+def _save_manifest_cache(etag, content):
+    try:
+        with open(MANIFEST_CACHE, 'w') as f:
+            f.write(etag + "\n" + content)
+    except OSError as e:
+        print(f"Failed to cache manifest: {e}")
+
+def firmware_files(manifest):
+    """
+    (name, url, sha256) for every firmware file in a manifest. Files are
+    fetched from next to the manifest's main.py url; sha256 may be None.
+    """
+    files = manifest.get('files')
+    if not files:
+        # Manifests from before the firmware was split into modules
+        return [('main.py', manifest['url'], manifest.get('sha256'))]
+    base = manifest['url'].rsplit('/', 1)[0]
+    return [(name, f"{base}/{name}", sha) for name, sha in files.items()]
+
+def in_rollout(version, percent):
+    """Check if this device is part of a staged rollout of version."""
+    # Salting with the version gives each release a different set of early devices
+    return device_hash(version) % 100 < percent
+
+# --------------------------------------------------------------------------------
+# LAN Peer Cache
+# --------------------------------------------------------------------------------
+def file_sha256(path):
+    """Hex SHA-256 of a file, read in small chunks."""
+    digest = hashlib.sha256()
+    buf = bytearray(512)
+    mv = memoryview(buf)
+    with open(path, 'rb') as f:
+        while True:
+            n = f.readinto(buf)
+            if not n:
+                break
+            digest.update(mv[:n])
+    return binascii.hexlify(digest.digest()).decode()
+
+class PeerCache:
+    """
+    Opt-in LAN cache so the fleet only pulls each firmware from GitHub once.
+
+    A device whose firmware files all match the manifest hashes seeds them:
+    it answers broadcast discovery queries with a compact announcement and
+    serves the files over a minimal HTTP endpoint (GET /<file name>, with
+    /firmware kept as an alias for main.py). Devices that need the update ask
+    the LAN first and only keep files whose SHA-256 matches the manifest,
+    falling back to the origin URL otherwise.
+
+    Query:        b"DNDQ" + version
+    Announcement: b"DNDA" + port (u16) + len(version) (u8) + version + sha256[:8]
+    (the hash is main.py's, which names the whole release)
+    """
+    QUERY = b"DNDQ"
+    ANNOUNCE = b"DNDA"
+    HASH_PREFIX = 8
+
+    def __init__(self, http_port=PEER_HTTP_PORT, udp_port=PEER_UDP_PORT,
+                 broadcast_addr=PEER_BROADCAST_ADDR):
+        self.http_port = http_port
+        self.udp_port = udp_port
+        self.broadcast_addr = broadcast_addr
+        self.seed = None  # (version, sha256) while seeding
+        self.files = ()   # Names of the files being seeded
+        self.peers = None  # Peers found by discover()
+        self.udp = None
+        self.server = None
+        self.client = None       # Socket of the peer being served
+        self.client_file = None  # File being sent to it
+        self.request = None      # Request head received so far, until it's complete
+        self.pending = None      # Bytes waiting for room in the socket
+        self.client_active = 0   # ticks_ms of the peer's last progress
+
+    # Seeding ----------------------------------------------------------------
+    def start_seeding(self, manifest):
+        """Start serving our firmware if it is the verified manifest version."""
+        sha = manifest.get('sha256')
+        if not sha or manifest.get('version') != CURRENT_VERSION:
+            return False
+        files = firmware_files(manifest)
+        for name, _, file_sha in files:
+            if not file_sha or file_sha256(name) != file_sha:
+                print(f"Peer cache: local {name} doesn't match manifest, not seeding")
+                return False
+        self.seed = (manifest['version'], sha)
+        self.files = [name for name, _, _ in files]
+        print(f"Peer cache: seeding firmware {manifest['version']}")
+        return True
+
+    def stop_seeding(self):
+        self.seed = None
+        self._close_client()
+        for sock in (self.udp, self.server):
+            if sock:
+                sock.close()
+        self.udp = None
+        self.server = None
+
+    def poll(self):
+        """Answer discovery queries and serve peers; never blocks."""
+        if not self.seed:
+            return
+        if not self.server:
+            self._listen()
+        self._poll_udp()
+        self._poll_http()
+
+    def _listen(self):
+        self.udp = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.udp.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.udp.bind(('0.0.0.0', self.udp_port))
+        self.udp.setblocking(False)
+
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server.bind(('0.0.0.0', self.http_port))
+        self.server.listen(2)
+        self.server.setblocking(False)
+
+    def _announcement(self):
+        version, sha = self.seed
+        return (self.ANNOUNCE + struct.pack('>HB', self.http_port, len(version)) +
+                version.encode() + binascii.unhexlify(sha)[:self.HASH_PREFIX])
+
+    def _poll_udp(self):
+        try:
+            data, addr = self.udp.recvfrom(64)
+        except OSError:
+            return
+        if data[:4] == self.QUERY and data[4:].decode() == self.seed[0]:
+            self.udp.sendto(self._announcement(), addr)
+
+    def _poll_http(self):
+        if not self.client:
+            try:
+                sock, addr = self.server.accept()
+            except OSError:
+                return
+            sock.setblocking(False)
+            self.client = sock
+            self.request = b''
+            self.pending = None
+            self.client_file = None
+            self.client_active = time.ticks_ms()
+            return
+
+        # Never wait on the peer: take what the socket has or sends right now,
+        # at most one chunk per pass, so the display keeps running
+        try:
+            if self.request is not None:
+                self._read_request()
+            elif self._send_pending():
+                chunk = self.client_file.read(PEER_SERVE_CHUNK) if self.client_file else None
+                if not chunk:
+                    self._close_client()  # Response complete
+                    return
+                self.pending = memoryview(chunk)
+                self._send_pending()
+        except Exception as e:
+            print(f"Peer cache: transfer failed: {e}")
+            self._close_client()
+            return
+
+        if time.ticks_diff(time.ticks_ms(), self.client_active) > PEER_TIMEOUT * 1000:
+            print("Peer cache: peer stopped responding")
+            self._close_client()
+
+    def _read_request(self):
+        """Collect the request head; once it's complete, queue the response."""
+        try:
+            data = self.client.recv(128)
+        except OSError as e:
+            if e.args[0] != errno.EAGAIN:
+                raise
+            return
+        if not data:
+            raise OSError("Connection closed by peer")
+        self.request += data
+        self.client_active = time.ticks_ms()
+        if b'\r\n\r\n' not in self.request and b'\n\n' not in self.request:
+            if len(self.request) > 512:
+                raise OSError("Request too long")
+            return
+
+        request = self.request.split(b'\n', 1)[0].split()
+        self.request = None
+        name = request[1].decode()[1:] if len(request) > 1 else ''
+        if name == 'firmware':
+            name = 'main.py'
+        if request[:1] != [b'GET'] or name not in self.files:
+            # No file: the connection closes once this is sent
+            self.pending = memoryview(b"HTTP/1.0 404 Not Found\r\nContent-Length: 0\r\n\r\n")
+            return
+
+        size = os.stat(name)[6]
+        self.pending = memoryview(("HTTP/1.0 200 OK\r\nContent-Type: application/octet-stream\r\n"
+                                   "Content-Length: %d\r\n\r\n" % size).encode())
+        self.client_file = open(name, 'rb')
+
+    def _send_pending(self):
+        """Send as much of the pending bytes as the socket takes; True once all are out."""
+        if self.pending:
+            try:
+                n = self.client.send(self.pending)
+            except OSError as e:
+                if e.args[0] != errno.EAGAIN:
+                    raise
+                n = 0
+            if n:
+                self.pending = self.pending[n:]
+                self.client_active = time.ticks_ms()
+        return not self.pending
+
+    def _close_client(self):
+        if self.client:
+            if self.client_file:
+                self.client_file.close()
+            self.client.close()
+            self.client = None
+            self.client_file = None
+
+    # Fetching ---------------------------------------------------------------
+    def discover(self, manifest):
+        """
+        Broadcast a query for the manifest's release and collect (host, port)
+        of peers seeding it into self.peers. A generator for the network
+        session: it yields instead of waiting, so up to PEER_DISCOVERY_TIME
+        passes without holding up the display.
+        """
+        self.peers = []
+        version = manifest['version']
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            try:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+            except (AttributeError, OSError):
+                pass  # Not every port exposes SO_BROADCAST
+            sock.setblocking(False)
+            sock.sendto(self.QUERY + version.encode(), (self.broadcast_addr, self.udp_port))
+
+            prefix = binascii.unhexlify(manifest['sha256'])[:self.HASH_PREFIX]
+            start = time.ticks_ms()
+            while time.ticks_diff(time.ticks_ms(), start) < PEER_DISCOVERY_TIME:
+                try:
+                    data, addr = sock.recvfrom(64)
+                except OSError:
+                    yield
+                    continue
+                peer = self._parse_announcement(data)
+                if peer and peer[1] == version and peer[2] == prefix:
+                    self.peers.append((addr[0], peer[0]))
+                    break  # One peer is enough; more would only add queries
+        finally:
+            sock.close()
+        return self.peers
+
+    def _parse_announcement(self, data):
+        """Return (port, version, hash prefix) or None for malformed packets."""
+        if len(data) < 7 or data[:4] != self.ANNOUNCE:
+            return None
+        port, vlen = struct.unpack('>HB', data[4:7])
+        if len(data) != 7 + vlen + self.HASH_PREFIX:
+            return None
+        return port, data[7:7 + vlen].decode(), data[7 + vlen:]
+
+    def fetch(self, manifest, name, sha, dest, progress=None):
+        """
+        Download one of the manifest's firmware files from a LAN peer into dest.
+        Returns True only if the file was written and its hash verified.
+        Uses the peers found by discover(), for all of the release's files.
+        """
+        if not self.peers or not manifest.get('sha256') or not sha:
+            return False
+        for host, port in self.peers:
+            print(f"Peer cache: fetching {name} from {host}:{port}")
+            try:
+                if self._fetch_from(host, port, name, dest, sha, progress):
+                    return True
+            except Exception as e:
+                print(f"Peer cache: fetch from {host} failed: {e}")
+        return False
+
+    def _fetch_from(self, host, port, name, dest, sha, progress):
+        client = HTTPClient(PEER_TIMEOUT)
+        try:
+            response = client.get(f"http://{host}:{port}/{name}")
+            if response.status != 200:
+                return False
+            _, digest = stream_to_file(response, dest, progress)
+        finally:
+            client.close()
+
+        if digest != sha:
+            print("Peer cache: hash mismatch, discarding peer copy")
+            os.remove(dest)
+            return False
+        return True
+
+# --------------------------------------------------------------------------------
+# Asset Pack Updates
+# --------------------------------------------------------------------------------
+def download_asset_pack(deadline):
+    """
+    Download the manifest's asset pack if it differs from the loaded one.
+    Returns the path of the verified download, or None if there's nothing new.
+    """
+    http = HTTPClient()
+    try:
+        content, _ = fetch_manifest(http)
+        info = json.loads(content).get('assets') if content else None
+        if not info or (assets.ASSET_PACK and info['revision'] == assets.ASSET_PACK.revision):
+            return None
+
+        print(f"New asset pack available: {info['revision']}")
+        response = http.get(info['url'])
+        try:
+            if response.status != 200:
+                raise Exception(f"Asset download failed: {response.status}")
+            size, sha = stream_to_file(response, ASSET_PACK_FILE + '.new', None, deadline)
+        finally:
+            response.close()
+    finally:
+        http.close()
+
+    if sha != info['sha256']:
+        os.remove(ASSET_PACK_FILE + '.new')
+        raise Exception("Asset pack hash mismatch")
+    print(f"Downloaded asset pack ({size} bytes)")
+    return ASSET_PACK_FILE + '.new'
+
+# --------------------------------------------------------------------------------
+# UpdateState
+# --------------------------------------------------------------------------------
+class UpdateSubState:
+    """Update process states"""
+    CONNECTING = "connecting"
+    CHECKING = "checking"
+    DOWNLOADING = "downloading"
+    INSTALLING = "installing"
+    ERROR = "error"
+
+class UpdateState(BaseState):
+    """Handles WiFi connection and update process."""
+
+    COLORS = {
+        'CONNECTING': (0, 0, 255),    # Blue
+        'CHECKING': (128, 0, 255),    # Purple
+        'DOWNLOADING': (151, 0, 0),   # Red
+        'INSTALLING': (255, 128, 0),  # Orange
+        'ERROR': (255, 0, 0),         # Red
+    }
+
+    # Define spinner properties
+    BACKGROUND_LEVEL = 90  # Background brightness level (drives the LEDs at ~10%)
+    SPINNER_LEVEL = 168  # Spinner brightness level (~40%)
+    SPINNER_SPEED = 100  # ms per step
+    
+    def __init__(self, controller, scheduled=False):
+        super().__init__(controller)
+        self.scheduled = scheduled  # Scheduled checks honour rollouts and Retry-After
+        self.error = None
+        self.spinner_position = 0
+        self.last_spinner_update = time.ticks_ms()
+    
+    def _update_spinner(self, base_color):
+        """Update spinner animation."""
+        current_time = time.ticks_ms()
+        if time.ticks_diff(current_time, self.last_spinner_update) >= self.SPINNER_SPEED:
+            self.spinner_position = (self.spinner_position + 1) % 28
+            self.last_spinner_update = current_time
+        
+        # Fill with dim background
+        buf = self.controller.np.buf
+        kernels.fill(buf, len(buf), grb(base_color, self.BACKGROUND_LEVEL))
+        
+        # Draw spinner with trail
+        border_pixels = self._get_border_pixels()
+        for i in range(5):  # 5 pixel trail
+            pos = (self.spinner_position - i) % len(border_pixels)
+            row, col = border_pixels[pos]
+            # Fade trail from the spinner level down to the background
+            level = self.BACKGROUND_LEVEL + (self.SPINNER_LEVEL - self.BACKGROUND_LEVEL) * (5 - i) // 5
+            self.controller.np[self._get_pixel_index(row, col)] = scale_color(base_color, level)
+        
+        self.controller.np.write()
+        
+    async def on_enter(self, **kwargs):
+        await super().on_enter(**kwargs)
+        self.sub_state = UpdateSubState.CONNECTING
+        self._update_info = None
+        self._retry_after = None
+        self._download_done = False
+        self.http = HTTPClient()  # One keep-alive connection for manifest and firmware
+        print("Starting update check...")
+        self._fill_solid_color(self.COLORS['CONNECTING'])
+        self.controller.network.register(
+            'manifest', self._check_version, NET_PRIORITY_MANIFEST,
+            on_fail=lambda e: self._handle_error("Version check failed", e),
+            on_done=self._version_checked)
+        
+    async def update(self, current_time):
+        # Handle spinner states
+        if self.sub_state in [UpdateSubState.CONNECTING, UpdateSubState.CHECKING, UpdateSubState.INSTALLING]:
+            self._update_spinner(self.COLORS[self.sub_state.upper()])
+        # Flash the error, then reset
+        elif self.sub_state == UpdateSubState.ERROR:
+            await self._show_error()
+        # Download state is handled by the progress bar callbacks
+        
+        # Regular state handling - network I/O runs as jobs in the network session
+        if self.sub_state == UpdateSubState.CONNECTING:
+            if self.controller.network.is_connected():
+                print("WiFi connected!")
+                self.sub_state = UpdateSubState.CHECKING
+        elif self.sub_state == UpdateSubState.CHECKING:
+            await self._handle_version_check()
+        elif self.sub_state == UpdateSubState.DOWNLOADING:
+            if self._download_done:
+                # Show complete state briefly
+                self._fill_progress_bar(self.COLORS['DOWNLOADING'], 1.0)
+                await asyncio.sleep_ms(300)
+                self.sub_state = UpdateSubState.INSTALLING
+        elif self.sub_state == UpdateSubState.INSTALLING:
+            self._handle_install()
+
+    def _check_version(self, deadline):
+        """Network job: fetch and parse the firmware manifest."""
+        content = self._fetch_github_raw()
+        if self._retry_after is not None and self.scheduled:
+            return {'version': CURRENT_VERSION, 'retry_after': self._retry_after}
+        if not content:
+            raise Exception("Failed to fetch version info")
+        return json.loads(content)
+
+    def _version_checked(self, info):
+        """Manifest fetched: show the check, then act on it in _handle_version_check."""
+        self.sub_state = UpdateSubState.CHECKING
+        self._version_check_start_time = time.ticks_ms()
+        self._update_info = info
+        print(f"Current version: {CURRENT_VERSION}")
+        print(f"Latest version: {info['version']}")
+
+    async def _handle_version_check(self):
+        """Act on the fetched manifest once the check has been shown for 2 seconds."""
+        if not self._update_info:
+            return
+
+        if time.ticks_diff(time.ticks_ms(), self._version_check_start_time) >= 2000:
+            if self.scheduled and self._defer_update():
+                await self._finish_scheduled()
+                return
+
+            # Only fetch the modules that changed; with none, even a forced
+            # update has nothing to do and we already run the manifest firmware
+            self._files = []
+            if self._update_info['version'] > CURRENT_VERSION or FORCE_UPDATE:
+                self._files = [f for f in firmware_files(self._update_info) if self._needs_file(f)]
+
+            if self._files:
+                if FORCE_UPDATE:
+                    print("Force update enabled - downloading firmware...")
+                else:
+                    print(f"Update available: {self._update_info['version']}")
+
+                self._downloaded = []
+                self.sub_state = UpdateSubState.DOWNLOADING
+
+                # Still inside the radio window opened for the manifest
+                self.controller.network.register(
+                    'firmware', self._download, NET_PRIORITY_DOWNLOAD,
+                    on_fail=lambda e: self._handle_error("Download failed", e),
+                    on_done=self._downloaded_all, on_progress=self._show_progress)
+            else:
+                print("No update needed")
+                if self.scheduled:
+                    # We run the manifest version - let LAN peers fetch it from us
+                    self.controller.seed_firmware(self._update_info)
+                    await self._finish_scheduled()
+                else:
+                    safe_reset()
+
+    def _defer_update(self):
+        """
+        Apply server-side staging from the manifest to a scheduled check.
+        Returns True if the update was deferred (the check should end).
+        """
+        info = self._update_info
+        retry_after = info.get('retry_after')
+        if retry_after:
+            print(f"Server asked to retry after {retry_after} seconds")
+            self.controller.retry_scheduled_update(int(retry_after))
+            return True
+
+        rollout = info.get('rollout', 100)
+        if info['version'] > CURRENT_VERSION and not in_rollout(info['version'], rollout):
+            print(f"Update {info['version']} is rolling out to {rollout}% - not this device yet")
+            return True
+        return False
+
+    async def _finish_scheduled(self):
+        """End a scheduled check without an update and go back to normal mode."""
+        # The network session powers the radio down by itself once idle
+        await self.controller.switch_to(DefaultState(self.controller))
+
+    def _fetch_github_raw(self):
+        content, self._retry_after = fetch_manifest(self.http)
+        return content
+            
+    def _fill_progress_bar(self, color, progress):
+        """
+        Fill display with a progress bar.
+        progress should be 0.0 to 1.0
+        """
+        # Fill dimmed background
+        buf = self.controller.np.buf
+        kernels.fill(buf, len(buf), grb(color, self.BACKGROUND_LEVEL))
+        
+        # Calculate how many columns to fill (out of 8)
+        filled_cols = min(8, int(progress * 8))
+        
+        # Fill the progress bar
+        bar_color = scale_color(color, 255)
+        for row in range(8):
+            for col in range(filled_cols):
+                self.controller.np[self._get_pixel_index(row, col)] = bar_color
+                
+        self.controller.np.write()
+
+    @staticmethod
+    def _needs_file(entry):
+        """True unless the installed file already has the manifest hash."""
+        name, _, sha = entry
+        try:
+            return not sha or file_sha256(name) != sha
+        except OSError:
+            return True  # Not on this device yet
+
+    def _download(self, deadline):
+        """
+        Network job: download the changed firmware files, reporting progress.
+        A generator, so the session steps it while it looks for LAN peers.
+        """
+        print(f"Downloading {len(self._files)} firmware file(s)...")
+        peers = None
+        if PEER_CACHE_ENABLED and self._update_info.get('sha256'):
+            peers = PeerCache()
+            yield from peers.discover(self._update_info)
+        try:
+            for index, (name, url, sha) in enumerate(self._files):
+                self._file_index = index
+
+                # Try a LAN peer first; it's only used if the manifest hash matches
+                if peers and peers.fetch(self._update_info, name, sha, name + '.new', self._download_progress):
+                    print(f"{name} fetched from LAN peer")
+                else:
+                    self._download_origin(url, name, sha, deadline)
+                self._downloaded.append(name)
+        finally:
+            self.http.close()
+
+    def _downloaded_all(self, result):
+        self._download_done = True  # update() shows the full bar, then installs
+
+    def _download_origin(self, url, name, sha, deadline):
+        """Download one firmware file, verifying its hash if the manifest has one."""
+        print(f"Starting download of {name}...")
+
+        response = self.http.get(url)
+        try:
+            if response.status != 200:
+                raise Exception(f"Download of {name} failed: {response.status}")
+            _, digest = stream_to_file(response, name + '.new', self._download_progress, deadline)
+        finally:
+            response.close()
+
+        if sha and digest != sha:
+            raise Exception(f"Firmware hash mismatch for {name}")
+
+    def _download_progress(self, bytes_downloaded, total_size):
+        """Progress callback for firmware downloads."""
+        if total_size:
+            progress = (self._file_index + bytes_downloaded / total_size) / len(self._files)
+            self.controller.network.progress(progress)  # Drawn by _show_progress
+
+        # Print memory every 5KB
+        if bytes_downloaded % 5120 == 0:
+            print("Downloaded:", bytes_downloaded, "/", total_size, "bytes")
+
+        # Force garbage collection after UI updates
+        gc.collect()
+
+    def _show_progress(self, progress):
+        self._fill_progress_bar(self.COLORS['DOWNLOADING'], progress)
+
+    def _handle_install(self):
+        """Install new firmware and reset."""
+        try:
+            # Only start install if we haven't yet
+            if not hasattr(self, '_install_started'):
+                self._install_started = True
+                self._install_start_time = time.ticks_ms()
+                
+                self._install_files()
+                print("Files renamed, waiting before reboot...")
+
+                # Ensure WiFi is disconnected before reboot
+                self.controller.network.close()
+            
+            # Wait for 2 seconds while showing spinner
+            if time.ticks_diff(time.ticks_ms(), self._install_start_time) >= 2000:
+                print("Installation complete, rebooting...")
+                safe_reset()
+                
+        except Exception as e:
+            self._handle_error("Installation failed", e)
+    
+    def _install_files(self):
+        """Swap the downloaded files in, putting the old ones back if a rename fails."""
+        installed = []
+        try:
+            for name in self._downloaded:
+                try:
+                    os.remove(name + '.bak')
+                except OSError:
+                    pass
+                try:
+                    os.rename(name, name + '.bak')
+                except OSError:
+                    pass  # A module this device doesn't have yet
+                installed.append(name)
+                os.rename(name + '.new', name)
+        except Exception:
+            for name in installed:
+                try:
+                    os.remove(name)
+                except OSError:
+                    pass
+                try:
+                    os.rename(name + '.bak', name)
+                except OSError:
+                    pass
+            raise
+
+    def _handle_error(self, message, error):
+        """Centralized error handling; update() then flashes the error and resets."""
+        print(f"{message}: {error}")
+        self.error = str(error)
+        self.sub_state = UpdateSubState.ERROR
+
+    async def _show_error(self):
+        # Flash red 3 times
+        for _ in range(3):
+            self._fill_solid_color((0, 0, 0))
+            await asyncio.sleep_ms(200)
+            self._fill_solid_color(self.COLORS['ERROR'])
+            await asyncio.sleep_ms(200)
+        
+        # Brief pause before reboot
+        await asyncio.sleep_ms(500)
+        safe_reset()
@@ -0,0 +1,162 @@
+"""
+LED Matrix Controller - Boot Profiler
+
+Records a timeline of each boot: microseconds since main.py started and free
+heap at every phase up to the first displayed frame. The last
+BOOT_PROFILE_BOOTS timelines are kept in BOOT_PROFILE_FILE.
+
+On the device, print them over serial from the REPL:
+    import profiler; profiler.summary()
+
+On a computer (e.g. with a file copied off a device, or written by the
+firmware running under a simulator):
+    python3 profiler.py boot.prof
+"""
+import time
+import gc
+import struct
+
+from config import *
+
+if hasattr(time, 'ticks_us'):
+    ticks_us = time.ticks_us
+    ticks_diff = time.ticks_diff
+else:  # CPython
+    def ticks_us():
+        return time.perf_counter_ns() // 1000
+
+    def ticks_diff(a, b):
+        return a - b
+
+# Boot phases in the order main.py reaches them; the file stores them by position
+PHASES = (
+    'assets',         # display and assets imported, asset pack header read
+    'states',         # state classes imported
+    'np_clear',       # LEDs cleared
+    'char_config',    # saved character read from char_config.json
+    'controller',     # StateController built
+    'button_check',   # button disconnect check (up to BUTTON_DISCONNECT_THRESHOLD ms)
+    'default_state',  # DefaultState entered, selected character decoded
+    'first_frame',    # first frame written to the LEDs
+)
+
+# File layout (little endian):
+#   header  '<4sBBBI'  magic, phase count, slot count, next slot, boots recorded
+#   slots   '<I' boot number, then '<II' (us since start, free heap) per phase;
+#           phases a boot didn't reach are 0xFFFFFFFF
+HEADER = '<4sBBBI'
+MAGIC = b'BOOT'
+MISSING = 0xFFFFFFFF
+
+def mem_free():
+    return gc.mem_free() if hasattr(gc, 'mem_free') else 0
+
+class BootTimeline:
+    """Timeline of the current boot, saved once the first frame is shown."""
+    def __init__(self, enabled=BOOT_PROFILE_ENABLED):
+        self.enabled = enabled
+        self.start = ticks_us()
+        self.marks = {}
+        self.saved = False
+
+    def mark(self, phase):
+        """Record that phase has been reached (the first time only)."""
+        if self.enabled and phase not in self.marks:
+            self.marks[phase] = (ticks_diff(ticks_us(), self.start), mem_free())
+
+    def finish(self, path=BOOT_PROFILE_FILE, boots=BOOT_PROFILE_BOOTS):
+        """Mark the first frame and add this boot to the file."""
+        if not self.enabled or self.saved:
+            return
+        self.mark('first_frame')
+        self.saved = True
+        try:
+            save_boot(path, boots, self.marks)
+        except OSError as e:
+            print(f"Boot profile not saved: {e}")
+        if DEBUG:
+            total, free = self.marks['first_frame']
+            print(f"Boot: first frame after {total // 1000} ms, {free} bytes free")
+
+def slot_format(phases):
+    return '<I' + 'II' * phases
+
+def load_boots(path=BOOT_PROFILE_FILE):
+    """
+    Return (boots recorded, timelines) with the oldest timeline first. Each
+    timeline is (boot number, [(us, free) or None per phase in PHASES]).
+    """
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except OSError:
+        return 0, []
+    if len(data) < struct.calcsize(HEADER):
+        return 0, []
+    magic, phases, slots, next_slot, recorded = struct.unpack_from(HEADER, data)
+    fmt = slot_format(phases)
+    size = struct.calcsize(fmt)
+    if magic != MAGIC or phases != len(PHASES) or len(data) != struct.calcsize(HEADER) + slots * size:
+        return 0, []  # Written by firmware with other phases; start over
+
+    timelines = []
+    for i in range(slots):
+        slot = (next_slot + i) % slots  # Oldest first
+        values = struct.unpack_from(fmt, data, struct.calcsize(HEADER) + slot * size)
+        if values[0] == MISSING:
+            continue
+        marks = []
+        for p in range(phases):
+            us, free = values[1 + 2 * p], values[2 + 2 * p]
+            marks.append(None if us == MISSING else (us, free))
+        timelines.append((values[0], marks))
+    return recorded, timelines
+
+def save_boot(path, boots, marks):
+    """Add one boot's marks to the file, dropping the oldest boot when it's full."""
+    recorded, timelines = load_boots(path)
+    timelines = timelines[-(boots - 1):] if boots > 1 else []
+    timelines.append((recorded + 1, [marks.get(phase) for phase in PHASES]))
+
+    fmt = slot_format(len(PHASES))
+    data = bytearray(struct.pack(HEADER, MAGIC, len(PHASES), boots, len(timelines) % boots, recorded + 1))
+    for slot in range(boots):
+        values = [MISSING] * (1 + 2 * len(PHASES))
+        if slot < len(timelines):
+            number, phase_marks = timelines[slot]
+            values[0] = number
+            for p, mark in enumerate(phase_marks):
+                if mark:
+                    values[1 + 2 * p], values[2 + 2 * p] = mark[0] & 0xFFFFFFFF, mark[1] & 0xFFFFFFFF
+        data.extend(struct.pack(fmt, *values))
+    with open(path, 'wb') as f:
+        f.write(data)
+
+def summary(path=BOOT_PROFILE_FILE):
+    """Print the recorded boot timelines: the latest boot plus min/max per phase."""
+    recorded, timelines = load_boots(path)
+    if not timelines:
+        print("No boot timelines recorded")
+        return
+    number, latest = timelines[-1]
+    print(f"Boot timeline: boot #{number}, {len(timelines)} of {recorded} boots kept")
+    print("phase            at ms  took ms   min ms   max ms  free KB")
+    previous = 0
+    for p, phase in enumerate(PHASES):
+        took = [marks[p][0] - (marks[p - 1][0] if p and marks[p - 1] else 0)
+                for _, marks in timelines if marks[p]]
+        mark = latest[p]
+        if not mark:
+            print(f"{phase:<14}        -")
+            continue
+        print("%-14s %7.1f %8.1f %8.1f %8.1f %8.1f" % (
+            phase, mark[0] / 1000, (mark[0] - previous) / 1000,
+            min(took) / 1000, max(took) / 1000, mark[1] / 1024))
+        previous = mark[0]
+
+# Timeline of this boot; main.py marks the phases
+BOOT = BootTimeline()
+
+if __name__ == '__main__':
+    import sys
+    summary(sys.argv[1] if len(sys.argv) > 1 else BOOT_PROFILE_FILE)
@@ -0,0 +1,511 @@
+"""
+LED Matrix Controller - States
+
+The display modes the controller switches between. UpdateState lives in
+netota, which is only imported while an update runs.
+"""
+import time
+
+from config import *
+from display import Character, wheel_lut, grb
+import assets
+import kernels
+
+# --------------------------------------------------------------------------------
+# Base State Class
+# --------------------------------------------------------------------------------
+class BaseState:
+    """
+    Abstract base class for states. The hooks are coroutines awaited by the
+    main.py tasks (update and update_display by the render task, the button
+    handlers by the input task), so a hook that awaits holds up only its task.
+    """
+    def __init__(self, controller):
+        self.controller = controller
+        self.sub_state = None  # Used for consistent sub-state handling.
+        self.entry_time = None  # Used for timing management.
+
+    async def on_enter(self, **kwargs):
+        """Called when entering this state, with kwargs for flexible state transitions."""
+        self.entry_time = time.ticks_ms()
+    
+    async def on_exit(self):
+        """Called when leaving this state."""
+        pass
+    
+    async def update(self, current_time):
+        """Periodic update (e.g., for time-based transitions)."""
+        pass
+    
+    async def handle_short_press(self):
+        """Handle short button press."""
+        pass
+    
+    async def handle_long_press(self):
+        """Handle long button press."""
+        pass
+    
+    async def update_display(self):
+        """Set LEDs appropriately for this state."""
+        pass
+
+    def on_assets_changed(self):
+        """Called after a new asset pack was swapped in; refresh any held assets."""
+        pass
+
+    def _fill_solid_color(self, color):
+        """Helper: fill display with solid color."""
+        buf = self.controller.np.buf
+        kernels.fill(buf, len(buf), grb(color))
+        self.controller.np.write()
+
+    def ticks_since_entry(self):
+            """Helper: get ms since state entry."""
+            return time.ticks_diff(time.ticks_ms(), self.entry_time)
+    
+    def _get_pixel_index(self, row, col):
+        """Convert row and column to a canvas index (the panel geometry maps it to the LEDs)."""
+        return row * 8 + col
+    
+    def _get_border_pixels(self):
+        """Get all border pixels in clockwise order."""
+        pixels = []
+        # Top edge
+        pixels.extend([(0, i) for i in range(8)])
+        # Right edge
+        pixels.extend([(i, 7) for i in range(1, 8)])
+        # Bottom edge (right to left)
+        pixels.extend([(7, i) for i in range(6, -1, -1)])
+        # Left edge (bottom to top)
+        pixels.extend([(i, 0) for i in range(6, 0, -1)])
+        return pixels
+
+# --------------------------------------------------------------------------------
+# DefaultState
+# --------------------------------------------------------------------------------
+class DefaultSubState:
+    """Default mode states"""
+    INTRO = "intro"
+    AVAILABLE = "available"
+    BUSY = "busy"
+    SOCIAL = "social"
+    FRIYAY = "friyay"
+    
+    # Base states that we always cycle through
+    BASE_CYCLE_STATES = [AVAILABLE, BUSY, SOCIAL]
+    
+    # Dynamic cycle states (will be updated at runtime)
+    CYCLE_STATES = BASE_CYCLE_STATES.copy()
+
+class DefaultState(BaseState):
+    """Main 'Default' state with sub-states: INTRO, AVAILABLE, BUSY, SOCIAL."""
+
+    ANIMATION_DURATION = 600  # Total duration in milliseconds
+
+    def __init__(self, controller):
+        super().__init__(controller)
+        self.sub_state = DefaultSubState.INTRO
+        self.character = assets.CHARACTERS.character(controller.selected_character)
+        self.animation_start = None
+
+        # Coffee combo detection
+        self.tap_combo = []
+        self.last_tap_time = 0
+
+        # Initialize FRIYAY-related attributes
+        self.friyay_scroll_position = 0
+        self.last_scroll_time = 0
+    
+    async def on_enter(self):
+        print("Entering DefaultState / INTRO")
+        self.sub_state = DefaultSubState.INTRO
+        self.animation_start = time.ticks_ms()
+        self.character = assets.CHARACTERS.character(self.controller.selected_character)
+    
+    def on_assets_changed(self):
+        # Pick up the new look without replaying the intro
+        self.character = assets.CHARACTERS.character(self.controller.selected_character)
+
+    def _ease_out_cubic(self, t):
+        """Cubic easing function for smooth animation"""
+        t = 1 - t
+        return 1 - (t * t * t)
+    
+    async def update(self, current_time):
+        if self.sub_state == DefaultSubState.INTRO:
+            progress = time.ticks_diff(current_time, self.animation_start) / self.ANIMATION_DURATION
+            
+            if progress >= 1:
+                print(f"Auto: Default {DefaultSubState.INTRO} → {DefaultSubState.AVAILABLE}")
+                self.sub_state = DefaultSubState.AVAILABLE
+                # Catch up on a FRIYAY boundary that passed while we were elsewhere
+                self.controller.check_scheduled_friyay()
+    
+    # def handle_short_press(self):
+    #     if self.sub_state != DefaultSubState.INTRO:  # Don't interrupt intro
+    #         # Find current state in cycle and move to next
+    #         try:
+    #             current_idx = DefaultSubState.CYCLE_STATES.index(self.sub_state)
+    #         except ValueError:
+    #             # If current state not in cycle (shouldn't happen), go to first state
+    #             current_idx = -1
+                
+    #         next_idx = (current_idx + 1) % len(DefaultSubState.CYCLE_STATES)
+    #         self.sub_state = DefaultSubState.CYCLE_STATES[next_idx]
+    #         print(f"Short press: Default → {self.sub_state}")
+
+    async def handle_short_press(self):
+        if self.sub_state != DefaultSubState.INTRO:  # Don't interrupt intro
+            current_time = time.ticks_ms()
+            
+            # Check if this tap is part of a rapid sequence
+            if (len(self.tap_combo) == 0 or 
+                time.ticks_diff(current_time, self.last_tap_time) <= RAPID_TAP_THRESHOLD):
+                
+                self.tap_combo.append(current_time)
+                self.last_tap_time = current_time
+                
+                # Check for rapid taps
+                if len(self.tap_combo) >= COFFEE_COMBO_TAPS:
+                    print(f"🎉 {COFFEE_COMBO_TAPS} rapid taps detected - Coffee time!")
+                    await self.controller.switch_to(CoffeeState(self.controller))
+                    self.tap_combo = []  # Reset combo
+                    return
+                    
+            else:
+                # Too slow, reset combo
+                self.tap_combo = [current_time]
+                self.last_tap_time = current_time
+            
+            # Clean up old taps from combo
+            self.tap_combo = [tap for tap in self.tap_combo 
+                            if time.ticks_diff(current_time, tap) <= COMBO_TIMEOUT]
+            
+            # Normal mode switching behavior
+            try:
+                current_idx = DefaultSubState.CYCLE_STATES.index(self.sub_state)
+            except ValueError:
+                current_idx = -1
+                
+            next_idx = (current_idx + 1) % len(DefaultSubState.CYCLE_STATES)
+            self.sub_state = DefaultSubState.CYCLE_STATES[next_idx]
+            print(f"Short press: Default → {self.sub_state}")
+    
+    # def handle_long_press(self):
+    #     if self.sub_state != DefaultSubState.INTRO:  # Don't interrupt intro
+    #         print("Long press: Default → Pomodoro INTRO")
+    #         self.controller.switch_to(PomodoroState(self.controller))
+
+    async def handle_long_press(self):
+        if self.sub_state != DefaultSubState.INTRO:  # Don't interrupt intro
+            if POMODORO_ENABLED:
+                print("Long press: Default → Pomodoro INTRO")
+                await self.controller.switch_to(PomodoroState(self.controller))
+            else:
+                print("Long press: Pomodoro disabled")
+                # Optional: could do something else here, like flash a color briefly
+                pass
+    
+    BACK_COLORS = {
+        DefaultSubState.INTRO: (0, 255, 0),      # Green, as available
+        DefaultSubState.AVAILABLE: (0, 255, 0),  # Green
+        DefaultSubState.BUSY: (255, 0, 0),       # Red
+    }
+
+    def _update_back_led(self):
+        """Show the sub-state on the back LED zone, if the strip has one."""
+        if self.sub_state == DefaultSubState.SOCIAL:
+            color = Character._wheel((time.ticks_ms() // 10) % 255)
+        else:
+            color = self.BACK_COLORS.get(self.sub_state, (0, 0, 0))  # Off for other modes
+        self.controller.np.set_color('back', color)
+
+    async def update_display(self):
+        # Zones set before the frame's write() go out in the same bus write
+        self._update_back_led()
+
+        if self.sub_state == DefaultSubState.INTRO:
+            # Calculate smooth animation progress
+            progress = time.ticks_diff(time.ticks_ms(), self.animation_start) / self.ANIMATION_DURATION
+            if progress > 1:
+                progress = 1
+                
+            # Apply easing function
+            eased_progress = self._ease_out_cubic(progress)
+            
+            # Calculate row offset (8 to 0)
+            row_offset = (1 - eased_progress) * 8
+            
+            # Render with calculated offset
+            self.character.render(
+                mode=DefaultSubState.AVAILABLE,
+                np=self.controller.np,
+                brightness=BRIGHTNESS,
+                row_offset=int(row_offset)
+            )
+        elif self.sub_state == DefaultSubState.FRIYAY:
+            # Render the scrolling "FRIYAY!" text
+            self._render_scrolling_text(self.FRIYAY_TEXT, color=(255, 255, 0))  # Yellow text
+        else:
+            # Normal rendering
+            self.character.render(
+                mode=self.sub_state,
+                np=self.controller.np,
+                brightness=BRIGHTNESS
+            )
+    
+    # Add these new properties
+    FRIYAY_TEXT = "FRIYAY!"
+    friyay_scroll_position = 0
+    last_scroll_time = 0
+    SCROLL_SPEED = 100  # ms between scroll steps
+    
+    FONT = {
+        'F': [(0,0), (0,1), (0,2), (0,3), (1,0), (2,0), (3,0), (3,1), (4,0), (5,0)],
+        'R': [(0,0), (0,1), (0,2), (0,3), (1,0), (1,3), (2,0), (2,3), (3,0), (3,1), (3,2), (4,0), (4,2), (5,0), (5,3)],
+        'I': [(0,1), (1,1), (2,1), (3,1), (4,1), (5,1)],
+        'Y': [(0,0), (0,4), (1,0), (1,4), (2,1), (2,2), (2,3), (3,2), (4,2), (5,2)],
+        'A': [(0,1), (0,2), (0,3), (1,0), (1,4), (2,0), (2,4), (3,0), (3,1), (3,2), (3,3), (3,4), (4,0), (4,4), (5,0), (5,4)],
+        '!': [(0,2), (1,2), (2,2), (3,2), (5,2)]
+    }
+    _text_strips = {}  # text -> (columns, total width)
+
+    def _text_strip(self, text):
+        """
+        Lay text out once as columns (bit n = row n), with 8 blank columns on
+        each side so every scroll position is the 8 columns starting there.
+        """
+        strip = self._text_strips.get(text)
+        if strip:
+            return strip
+
+        # Calculate character widths
+        char_widths = {char: max(col for _, col in pixels) - min(col for _, col in pixels) + 1
+                    for char, pixels in self.FONT.items()}
+
+        # Total width of the text (including 1px gap between characters) plus 8px extra padding
+        total_width = sum(char_widths.get(char, 0) + 1 for char in text) + 8
+        columns = bytearray(total_width + 16)
+        vertical_offset = 1  # Move down 1px
+
+        x_pos = 8
+        for char in text:
+            if char in self.FONT:
+                min_col = min(col for _, col in self.FONT[char])
+                for row, col in self.FONT[char]:
+                    if row + vertical_offset < 8:
+                        columns[x_pos + col - min_col] |= 1 << (row + vertical_offset)
+                x_pos += char_widths[char] + 1  # Add a 1px gap between characters
+
+        strip = self._text_strips[text] = (columns, total_width)
+        return strip
+
+    def _render_scrolling_text(self, text, color=(255, 255, 0)):
+        buf = self.controller.np.buf
+
+        # First create a diagonal rainbow background, dimmed for contrast
+        rainbow_offset = (time.ticks_ms() // 15) % 256  # Slower color cycling
+        kernels.rainbow_fill(buf, wheel_lut(BRIGHTNESS), rainbow_offset, 8)
+
+        columns, total_width = self._text_strip(text)
+
+        # Update scroll position
+        current_time = time.ticks_ms()
+        if time.ticks_diff(current_time, self.last_scroll_time) > self.SCROLL_SPEED:
+            self.friyay_scroll_position = (self.friyay_scroll_position + 1) % total_width
+            self.last_scroll_time = current_time
+
+        # Make text bright white for maximum contrast
+        kernels.blit_columns(buf, columns, self.friyay_scroll_position, grb((255, 255, 255)))
+
+        self.controller.np.write()
+
+# --------------------------------------------------------------------------------
+# CharactersState
+# --------------------------------------------------------------------------------
+class CharactersState(BaseState):
+    """State for selecting and saving characters."""
+
+    SELECTION_COLOR = (255, 0, 128)  # Pink color for selection mode
+    
+    def __init__(self, controller):
+        super().__init__(controller)
+        self.selected_index = controller.selected_character
+        self.preview_character = assets.CHARACTERS.character(self.selected_index)
+        self.prefetch_job = None
+    
+    async def on_enter(self):
+        print(f"Entering CharactersState - Showing: {self.preview_character.name}")
+        self._schedule_prefetch()
+
+    async def on_exit(self):
+        if self.prefetch_job:
+            self.prefetch_job.cancel()
+
+    def on_assets_changed(self):
+        # Stay on the same character if the new pack still has it
+        index = assets.CHARACTERS.index_of(self.preview_character.id)
+        self.selected_index = index if index is not None else 0
+        self.preview_character = assets.CHARACTERS.character(self.selected_index)
+        self._schedule_prefetch()
+
+    def _schedule_prefetch(self):
+        """Decode the neighbouring characters once the user pauses browsing."""
+        if self.prefetch_job:
+            self.prefetch_job.cancel()
+        index = self.selected_index
+        self.prefetch_job = self.controller.scheduler.call_later(
+            CHARACTER_PREFETCH_DELAY, lambda: assets.CHARACTERS.prefetch(index))
+    
+    async def update(self, current_time):
+        pass
+    
+    async def handle_short_press(self):
+        # Cycle through characters
+        self.selected_index = (self.selected_index + 1) % len(assets.CHARACTERS)
+        
+        # Get the (usually prefetched) character and force animation to start from beginning of interval
+        new_character = assets.CHARACTERS.character(self.selected_index)
+        current_time = time.ticks_ms()
+        
+        # Force animations to start from the beginning of their interval
+        for anim in new_character.animations.values():
+            anim['last_trigger'] = current_time  # Set to current time
+        
+        self.preview_character = new_character
+        self._schedule_prefetch()
+        print(f"Selected character: {new_character.name}")
+    
+    async def handle_long_press(self):
+        # Save selection and return to DefaultState
+        self.controller.selected_character = self.selected_index
+        success = self.controller.save_character(self.selected_index)
+        if success:
+            print(f"Saved character selection: {self.preview_character.name}")
+        else:
+            print("Warning: Failed to save character selection")
+        await self.controller.switch_to(DefaultState(self.controller))
+    
+    async def update_display(self):
+        # Back LED matches the selection color
+        self.controller.np.set_color('back', self.SELECTION_COLOR)
+
+        # Render the character with the selection color
+        self.preview_character.render(
+            mode="available",  # Use available mode as base
+            np=self.controller.np,
+            brightness=BRIGHTNESS,
+            selection_color=self.SELECTION_COLOR
+        )
+
+# --------------------------------------------------------------------------------
+# PomodoroState
+# --------------------------------------------------------------------------------
+class PomodoroState(BaseState):
+    """State for Pomodoro timers with sub-states: INTRO, SETUP, ACTIVE, COMPLETE."""
+    
+    COLORS = {
+        "intro": (255, 128, 0),    # Light orange
+        "setup": (255, 165, 0),    # Orange
+        "active": (255, 69, 0),    # Red-orange
+        "complete": (255, 215, 0), # Gold
+    }
+    
+    def __init__(self, controller):
+        super().__init__(controller)
+        self.sub_state = "intro"
+        self.intro_start_time = time.ticks_ms()
+        self.pomodoro_setup_start = None
+        self.pomodoro_start_time = None
+        self.pomodoro_duration = 15  # Start with 15 minutes
+    
+    async def on_enter(self):
+        print("Entering PomodoroState / INTRO")
+        self.sub_state = "intro"
+        self.intro_start_time = time.ticks_ms()
+    
+    async def update(self, current_time):
+        # Transition from INTRO to SETUP
+        if self.sub_state == "intro":
+            if time.ticks_diff(current_time, self.intro_start_time) >= INTRO_DURATION:
+                self.sub_state = "setup"
+                self.pomodoro_setup_start = current_time
+                print("Auto: Pomodoro INTRO → SETUP")
+        
+        # Transition from SETUP to ACTIVE if time runs out
+        elif self.sub_state == "setup":
+            if time.ticks_diff(current_time, self.pomodoro_setup_start) >= POMODORO_SETUP_TIMEOUT:
+                self.sub_state = "active"
+                self.pomodoro_start_time = current_time
+                print("Auto: Pomodoro SETUP → ACTIVE (timeout)")
+    
+    async def handle_short_press(self):
+        # Adjust or switch sub-states
+        if self.sub_state == "setup":
+            # Increase pomodoro duration in increments of 15, up to 60
+            self.pomodoro_duration += 15
+            if self.pomodoro_duration > 60:
+                self.pomodoro_duration = 15
+            # Reset the setup timeout start
+            self.pomodoro_setup_start = time.ticks_ms()
+            print(f"Short press: Pomodoro duration: {self.pomodoro_duration} minutes")
+        
+        elif self.sub_state == "active":
+            # Interrupt pomodoro
+            self.sub_state = "complete"
+            print("Short press: Pomodoro ACTIVE → COMPLETE (interrupted)")
+        
+        elif self.sub_state == "complete":
+            # Restart pomodoro from intro
+            self.sub_state = "intro"
+            self.intro_start_time = time.ticks_ms()
+            print("Short press: Pomodoro COMPLETE → INTRO (restart)")
+    
+    async def handle_long_press(self):
+        # Long press: go back to DefaultState (intro)
+        print("Long press: Pomodoro → Default INTRO")
+        await self.controller.switch_to(DefaultState(self.controller))
+    
+    async def update_display(self):
+        color = self.COLORS.get(self.sub_state, (255, 255, 255))
+        self._fill_solid_color(color)
+
+class CoffeeState(BaseState):
+    """Coffee break mode - shows coffee mug until tapped again."""
+    
+    def __init__(self, controller):
+        super().__init__(controller)
+        self.coffee_icon = None
+        
+    async def on_enter(self):
+        print("☕ Coffee break mode activated!")
+        # Find the coffee icon
+        idx = assets.ICONS.index_of('coffee')
+        if idx is not None:
+            self.coffee_icon = assets.ICONS.character(idx)  # Reuse Character class
+        
+        if not self.coffee_icon:
+            # Fallback to red screen if icon not found
+            pass
+    
+    def on_assets_changed(self):
+        idx = assets.ICONS.index_of('coffee')
+        self.coffee_icon = assets.ICONS.character(idx) if idx is not None else None
+
+    async def handle_short_press(self):
+        print("☕ Coffee break over - returning to normal mode")
+        await self.controller.switch_to(DefaultState(self.controller))
+    
+    async def handle_long_press(self):
+        await self.handle_short_press()
+    
+    async def update_display(self):
+        if self.coffee_icon:
+            # Just render normally - it will automatically use the brown body_color
+            self.coffee_icon.render(
+                mode='available',  # This gets ignored because of body_color
+                np=self.controller.np,
+                brightness=BRIGHTNESS
+            )
+        else:
+            self._fill_solid_color((255, 0, 0))
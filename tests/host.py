@@ -0,0 +1,24 @@
+"""
+Host Test Support
+
+Lets the firmware modules run under CPython: puts the repository on sys.path,
+makes it the working directory (the firmware opens its files by bare name) and
+adds the MicroPython tick functions to time, as buildscripts/bench_render.py
+does. Test modules import this before any firmware module.
+"""
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.chdir(ROOT)
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+if not hasattr(time, 'ticks_ms'):
+    time.ticks_ms = lambda: time.monotonic_ns() // 1000000
+    time.ticks_diff = lambda a, b: a - b
+    time.ticks_add = lambda a, b: a + b
+    time.sleep_ms = lambda ms: time.sleep(ms / 1000)
+    time.ticks_us = lambda: time.monotonic_ns() // 1000
+    time.sleep_us = lambda us: time.sleep(us / 1000000)
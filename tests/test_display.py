@@ -0,0 +1,45 @@
+"""
+Character rendering tests (display.py) on the host.
+
+Run from the repository root:
+    python3 -m unittest discover tests
+"""
+import unittest
+
+import host  # noqa: F401  (sets up the firmware modules for CPython)
+import assets
+from config import BRIGHTNESS, NUM_LEDS
+from display import Character, PowerBudget
+
+class Frame:
+    """Stand-in for the LEDs object, as in buildscripts/bench_render.py"""
+    def __init__(self):
+        self.buf = bytearray(NUM_LEDS * 3)
+        self.power = PowerBudget()
+        self.writes = 0
+
+    def write(self):
+        self.writes += 1
+
+class RenderTest(unittest.TestCase):
+    def test_static_frames_are_prerendered(self):
+        character = Character(assets.CHARACTERS.get(0))
+        frame = Frame()
+        character.render('available', frame, BRIGHTNESS)
+        first = bytes(frame.buf)
+        self.assertTrue(any(first))
+        self.assertEqual(len(Character._prerendered), 1)
+
+        frame.buf[:] = bytes(len(frame.buf))
+        character.render('available', frame, BRIGHTNESS)
+        self.assertEqual(bytes(frame.buf), first)
+        self.assertEqual(frame.writes, 2)
+
+    def test_social_frames_render_live(self):
+        character = Character(assets.CHARACTERS.get(0))
+        frame = Frame()
+        character.render('social', frame, BRIGHTNESS)
+        self.assertTrue(any(frame.buf))
+
+if __name__ == '__main__':
+    unittest.main()
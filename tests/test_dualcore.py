@@ -0,0 +1,164 @@
+"""
+Dual-core networking tests (dualcore.py). Under CPython, _thread gives a real
+thread, so the worker runs its session loop next to the test, as on core 1.
+
+Run from the repository root:
+    python3 -m unittest discover tests
+"""
+import _thread
+import threading
+import time
+import unittest
+
+import host  # noqa: F401  (sets up the firmware modules for CPython)
+import dualcore
+from config import NET_QUEUE_SIZE
+
+class Job:
+    def __init__(self, name, run, on_fail, on_done, on_progress):
+        self.name = name
+        self.run = run
+        self.on_fail = on_fail
+        self.on_done = on_done
+        self.on_progress = on_progress
+
+class Session:
+    """The parts of main.NetworkSession the worker uses: runs one job per update."""
+    IDLE = "idle"
+    ACTIVE = "active"
+
+    def __init__(self):
+        self.jobs = []
+        self.running = None
+        self.holders = []
+
+    def register(self, name, run, priority, on_fail=None, on_done=None, on_progress=None):
+        self.jobs.append(Job(name, run, on_fail, on_done, on_progress))
+
+    def hold(self, name):
+        self.holders.append(name)
+
+    def release(self, name):
+        self.holders.remove(name)
+
+    def close(self):
+        self.deliver(None, 'state', self.IDLE)
+
+    def progress(self, value):
+        self.deliver(self.running, 'progress', value)
+
+    def update(self, current_time):
+        if self.jobs:
+            self.running = job = self.jobs.pop(0)
+            try:
+                result = job.run(0)
+            except Exception as e:
+                self.deliver(job, 'fail', e)
+            else:
+                self.deliver(job, 'done', result)
+            self.running = None
+
+    def deliver(self, job, event, value):
+        """Core 0 side: hand the outcome to the job's callback."""
+        if event == 'state':
+            return
+        callback = {'done': job.on_done, 'fail': job.on_fail, 'progress': job.on_progress}[event]
+        if callback:
+            callback(value)
+
+class MessageQueueTest(unittest.TestCase):
+    def test_fifo_and_full(self):
+        queue = dualcore.MessageQueue(3)
+        self.assertIsNone(queue.get())
+        for n in range(3):
+            self.assertTrue(queue.put(n))
+        self.assertFalse(queue.put(3))  # Full: refused, nothing overwritten
+        self.assertEqual(queue.get(), 0)
+        self.assertTrue(queue.put(4))
+        self.assertEqual([queue.get() for _ in range(4)], [1, 2, 4, None])
+
+class NetworkWorkerTest(unittest.TestCase):
+    def setUp(self):
+        self.session = Session()
+        self.worker = dualcore.start_worker(self.session)
+        self.assertIsInstance(self.worker, dualcore.NetworkWorker)
+
+    def tearDown(self):
+        self.worker.stop()
+
+    def pump(self, until, timeout=2):
+        """Run core 0's side (the network task) until until() is true."""
+        end = time.monotonic() + timeout
+        while not until():
+            self.assertLess(time.monotonic(), end, "worker didn't answer")
+            self.worker.update(0)
+            time.sleep(0.005)
+
+    def test_jobs_run_on_the_worker_and_report_back(self):
+        results = []
+        threads = []
+        main_thread = _thread.get_ident()
+
+        def run(deadline):
+            threads.append(_thread.get_ident())
+            self.worker.progress(0.5)
+            return 'ok'
+
+        def failing(deadline):
+            raise OSError("no route")
+
+        self.worker.register('a', run, on_done=lambda v: results.append(('done', v, _thread.get_ident())),
+                             on_progress=lambda v: results.append(('progress', v, _thread.get_ident())))
+        self.worker.register('b', failing, on_fail=lambda e: results.append(('fail', str(e), _thread.get_ident())))
+        self.pump(lambda: len(results) == 3)
+
+        self.assertNotEqual(threads, [main_thread])
+        self.assertEqual(results, [('progress', 0.5, main_thread), ('done', 'ok', main_thread),
+                                   ('fail', 'no route', main_thread)])
+
+    def test_hold_and_release_reach_the_session(self):
+        self.worker.hold('peer_seed')
+        self.pump(lambda: self.session.holders == ['peer_seed'])
+        self.worker.release('peer_seed')
+        self.pump(lambda: self.session.holders == [])
+
+    def test_commands_beyond_the_queue_wait_in_order(self):
+        done = []
+        for n in range(NET_QUEUE_SIZE * 3):
+            self.worker.register(f'job{n}', lambda deadline, n=n: n, on_done=done.append)
+        self.pump(lambda: len(done) == NET_QUEUE_SIZE * 3)
+        self.assertEqual(done, list(range(NET_QUEUE_SIZE * 3)))
+        self.assertEqual(self.worker.applied, self.worker.sent)
+
+    def test_progress_is_dropped_when_the_event_queue_is_full(self):
+        reports = []
+        done = []
+        queued = threading.Event()
+
+        def run(deadline):
+            for n in range(NET_QUEUE_SIZE * 4):
+                self.worker.progress(n)
+            queued.set()
+            return 'ok'
+
+        self.worker.register('chatty', run, on_done=done.append, on_progress=reports.append)
+        # Hand the command over, then stay away until the job has reported everything
+        self.worker.update(0)
+        self.assertTrue(queued.wait(2))
+        self.pump(lambda: done)
+
+        self.assertEqual(done, ['ok'])  # The result waits for room; it's never dropped
+        self.assertEqual(reports, list(range(NET_QUEUE_SIZE)))
+
+    def test_stop_ends_the_worker_loop(self):
+        self.worker.stop()
+        time.sleep(0.1)  # Lets the loop finish its last pass
+        ran = []
+        self.worker.register('late', lambda deadline: ran.append(1))
+        self.worker.update(0)
+        time.sleep(0.1)
+        self.assertEqual(ran, [])
+        self.assertEqual(self.worker.applied, 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,152 @@
+"""
+HTTP client tests (netota.HTTPClient) against a local socket server.
+
+Run from the repository root:
+    python3 -m unittest discover tests
+"""
+import os
+import socket
+import tempfile
+import threading
+import time
+import unittest
+
+import host  # noqa: F401  (sets up the firmware modules for CPython)
+import netota
+
+class Server:
+    """HTTP/1.1 server on a loopback port; one thread per connection, keep-alive."""
+    def __init__(self):
+        self.sock = socket.socket()
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind(('127.0.0.1', 0))
+        self.sock.listen(5)
+        self.url = f"http://127.0.0.1:{self.sock.getsockname()[1]}"
+        self.connections = 0
+        self.running = True
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def stop(self):
+        self.running = False
+        self.sock.close()
+
+    def _accept(self):
+        while self.running:
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                return
+            self.connections += 1
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def _serve(self, conn):
+        stream = conn.makefile('rb')
+        try:
+            while True:
+                line = stream.readline()
+                if not line:
+                    break
+                path = line.split()[1].decode()
+                while stream.readline() not in (b'\r\n', b''):
+                    pass
+                if not self._respond(conn, path):
+                    break
+        except OSError:
+            pass
+        finally:
+            conn.close()
+
+    def _respond(self, conn, path):
+        """Answer one request; returns False when the connection should end."""
+        if path == '/length':
+            conn.sendall(b'HTTP/1.1 200 OK\r\nContent-Length: 5\r\n\r\nhello')
+        elif path == '/chunked':
+            conn.sendall(b'HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n'
+                         b'3\r\nabc\r\n4;ext=1\r\ndefg\r\n0\r\n\r\n')
+        elif path == '/redirect':
+            conn.sendall(b'HTTP/1.1 302 Found\r\nLocation: /length\r\nContent-Length: 0\r\n\r\n')
+        elif path == '/close':
+            conn.sendall(b'HTTP/1.1 200 OK\r\nConnection: close\r\n\r\nuntil close')
+            return False
+        elif path == '/truncated':
+            conn.sendall(b'HTTP/1.1 200 OK\r\nContent-Length: 50\r\n\r\nshort')
+            return False
+        elif path == '/truncated-chunked':
+            conn.sendall(b'HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n10\r\nshort')
+            return False
+        elif path == '/slow':
+            time.sleep(1)
+            conn.sendall(b'HTTP/1.1 200 OK\r\nContent-Length: 1\r\n\r\nx')
+        else:
+            conn.sendall(b'HTTP/1.1 404 Not Found\r\nContent-Length: 0\r\n\r\n')
+        return True
+
+class HTTPClientTest(unittest.TestCase):
+    def setUp(self):
+        self.server = Server()
+        self.client = netota.HTTPClient(timeout=0.3)
+
+    def tearDown(self):
+        self.client.close()
+        self.server.stop()
+
+    def get(self, path):
+        return self.client.get(self.server.url + path)
+
+    def test_content_length(self):
+        response = self.get('/length')
+        self.assertEqual(response.status, 200)
+        self.assertEqual(response.remaining, 5)
+        self.assertEqual(response.read(), b'hello')
+
+    def test_chunked(self):
+        response = self.get('/chunked')
+        self.assertEqual(response.status, 200)
+        self.assertEqual(response.read(), b'abcdefg')
+
+    def test_redirect(self):
+        response = self.get('/redirect')
+        self.assertEqual(response.status, 200)
+        self.assertEqual(response.read(), b'hello')
+        self.assertEqual(self.server.connections, 1)
+
+    def test_keep_alive_reuse(self):
+        for path in ('/length', '/chunked', '/redirect', '/length'):
+            self.get(path).read()
+        self.assertEqual(self.server.connections, 1)
+
+    def test_read_until_close(self):
+        self.assertEqual(self.get('/close').read(), b'until close')
+        # The body ended with the connection, so the next request opens another
+        self.assertEqual(self.get('/length').read(), b'hello')
+        self.assertEqual(self.server.connections, 2)
+
+    def test_stream_to_file(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        path = os.path.join(tmp.name, 'body')
+        reports = []
+        written, sha = netota.stream_to_file(self.get('/chunked'), path,
+                                             lambda done, total: reports.append(done))
+        self.assertEqual(written, 7)
+        self.assertEqual(sha, netota.file_sha256(path))
+        self.assertEqual(reports[-1], 7)
+
+    def test_slow_response_times_out(self):
+        start = time.monotonic()
+        with self.assertRaises(OSError):
+            self.get('/slow')
+        self.assertLess(time.monotonic() - start, 1)
+
+    def test_truncated_body(self):
+        response = self.get('/truncated')
+        with self.assertRaises(OSError):
+            response.read()
+
+    def test_truncated_chunked_body(self):
+        response = self.get('/truncated-chunked')
+        with self.assertRaises(OSError):
+            response.read()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+"""
+LED output tests (ledstrip.py) with buildscripts/rp2.py standing in for rp2.
+The stand-in runs PIO programs with only the PIO names in scope, as
+MicroPython's asm_pio does, so a program that reads module globals fails here
+as it would on the device.
+
+Run from the repository root:
+    python3 -m unittest discover tests
+"""
+import os
+import sys
+import unittest
+
+import host
+sys.path.insert(0, os.path.join(host.ROOT, 'buildscripts'))
+import rp2
+import ledstrip
+
+DELAY = 1
+
+class WS2812ProgramTest(unittest.TestCase):
+    def test_assembles(self):
+        program = ledstrip.ws2812
+        self.assertEqual([i.op for i in program.instructions], ['out', 'jmp', 'jmp', 'nop'])
+        self.assertEqual(program.options['pull_thresh'], 8)
+
+    def test_bit_timing_matches_pio_freq(self):
+        out, jmp_zero, jmp_loop, nop = [1 + i.cycles for i in ledstrip.ws2812.instructions]
+        cycles = ledstrip.PIO_FREQ // 800000
+        self.assertEqual(out + jmp_zero + jmp_loop, cycles)  # A one bit
+        self.assertEqual(out + jmp_zero + nop, cycles)       # A zero bit
+
+    def test_module_globals_are_out_of_scope(self):
+        with self.assertRaises(NameError):
+            @rp2.asm_pio()
+            def program():
+                nop()[DELAY]  # noqa: F821  (a module global, like the old T1-T3)
+
+class PioStripTest(unittest.TestCase):
+    def tearDown(self):
+        rp2.StateMachine.machines.clear()
+        rp2.DMA.in_use = 0
+
+    def test_write_sends_the_buffer(self):
+        strip = ledstrip.open_strip(None, 4)
+        self.assertIsInstance(strip, ledstrip.PioStrip)
+        strip.buf[:] = bytes(range(12))
+        strip.write()
+        strip.buf[0] = 99  # Drawing the next frame doesn't touch the one being sent
+        self.assertEqual(strip.sm.frames, [bytes(range(12))])
+        self.assertEqual(strip.sm.freq, ledstrip.PIO_FREQ)
+
+if __name__ == '__main__':
+    unittest.main()
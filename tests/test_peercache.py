@@ -0,0 +1,197 @@
+"""
+LAN peer cache tests (netota.PeerCache): one instance seeds over loopback,
+another discovers it and downloads the firmware files. Also checks when a
+scheduled update check (netota.UpdateState) starts seeding.
+
+Run from the repository root:
+    python3 -m unittest discover tests
+"""
+import asyncio
+import os
+import socket
+import tempfile
+import threading
+import time
+import unittest
+
+import host
+import netota
+from config import CURRENT_VERSION
+
+def free_port(kind):
+    sock = socket.socket(socket.AF_INET, kind)
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+class PeerCacheTest(unittest.TestCase):
+    def setUp(self):
+        # The seeder serves files from the working directory, like on the device
+        self.seed_dir = tempfile.TemporaryDirectory()
+        self.fetch_dir = tempfile.TemporaryDirectory()
+        os.chdir(self.seed_dir.name)
+        self.files = {'main.py': os.urandom(5000), 'config.py': b'BRIGHTNESS = 148\n'}
+        for name, data in self.files.items():
+            with open(name, 'wb') as f:
+                f.write(data)
+        self.manifest = {
+            'version': CURRENT_VERSION,
+            'url': 'https://example.com/fw/main.py',
+            'files': {name: netota.file_sha256(name) for name in self.files},
+        }
+        self.manifest['sha256'] = self.manifest['files']['main.py']
+
+        http_port = free_port(socket.SOCK_STREAM)
+        udp_port = free_port(socket.SOCK_DGRAM)
+        self.seeder = netota.PeerCache(http_port, udp_port, '127.0.0.1')
+        self.fetcher = netota.PeerCache(http_port, udp_port, '127.0.0.1')
+        self.polling = False
+        self.thread = None
+
+    def tearDown(self):
+        self.polling = False
+        if self.thread:
+            self.thread.join()
+        self.seeder.stop_seeding()
+        os.chdir(host.ROOT)
+        self.seed_dir.cleanup()
+        self.fetch_dir.cleanup()
+
+    def start_polling(self):
+        """Poll the seeder as the network task does, from a thread of its own."""
+        self.assertTrue(self.seeder.start_seeding(self.manifest))
+        self.seeder.poll()  # Opens the sockets before anyone asks
+        self.polling = True
+
+        def run():
+            while self.polling:
+                self.seeder.poll()
+                time.sleep(0.002)
+        self.thread = threading.Thread(target=run)
+        self.thread.start()
+
+    def discover(self):
+        """Step discover() like the network session; returns (peers, steps)."""
+        steps = 0
+        generator = self.fetcher.discover(self.manifest)
+        try:
+            while True:
+                next(generator)
+                steps += 1
+                time.sleep(0.005)
+        except StopIteration as e:
+            return e.value, steps
+
+    def test_discover_and_fetch(self):
+        self.start_polling()
+        peers, _ = self.discover()
+        self.assertEqual(peers, [('127.0.0.1', self.seeder.http_port)])
+
+        for name, sha in self.manifest['files'].items():
+            dest = os.path.join(self.fetch_dir.name, name)
+            self.assertTrue(self.fetcher.fetch(self.manifest, name, sha, dest))
+            self.assertEqual(netota.file_sha256(dest), sha)
+            with open(dest, 'rb') as f:
+                self.assertEqual(f.read(), self.files[name])
+
+    def test_hash_mismatch_is_discarded(self):
+        self.start_polling()
+        self.discover()
+        dest = os.path.join(self.fetch_dir.name, 'main.py')
+        self.assertFalse(self.fetcher.fetch(self.manifest, 'main.py', '0' * 64, dest))
+        self.assertFalse(os.path.exists(dest))
+
+    def test_unknown_file_is_not_served(self):
+        self.start_polling()
+        self.discover()
+        dest = os.path.join(self.fetch_dir.name, 'wifi_config.py')
+        self.assertFalse(self.fetcher.fetch(self.manifest, 'wifi_config.py', '0' * 64, dest))
+
+    def test_discovery_yields_until_timeout(self):
+        # Nobody seeds: discovery gives up after PEER_DISCOVERY_TIME, yielding all along
+        start = time.monotonic()
+        peers, steps = self.discover()
+        self.assertEqual(peers, [])
+        self.assertGreater(steps, 10)
+        self.assertGreater(time.monotonic() - start, (netota.PEER_DISCOVERY_TIME - 10) / 1000)
+        self.assertFalse(self.fetcher.fetch(self.manifest, 'main.py', self.manifest['sha256'],
+                                            os.path.join(self.fetch_dir.name, 'main.py')))
+
+    def test_only_verified_current_firmware_is_seeded(self):
+        self.assertFalse(self.seeder.start_seeding(dict(self.manifest, version='0.0.1')))
+        with open('config.py', 'ab') as f:
+            f.write(b'# changed\n')
+        self.assertFalse(self.seeder.start_seeding(self.manifest))
+
+    def test_poll_never_waits_on_a_stalled_peer(self):
+        self.assertTrue(self.seeder.start_seeding(self.manifest))
+        self.seeder.poll()
+        peer = socket.create_connection(('127.0.0.1', self.seeder.http_port))
+        try:
+            peer.sendall(b'GET /main.py HTTP/1.0\r\n')  # Head never finished
+            for _ in range(20):
+                start = time.monotonic()
+                self.seeder.poll()
+                self.assertLess(time.monotonic() - start, 0.05)
+                time.sleep(0.002)
+            self.assertIsNotNone(self.seeder.client)
+        finally:
+            peer.close()
+
+class Network:
+    def __init__(self):
+        self.jobs = []
+
+    def register(self, name, run, priority, on_fail=None, on_done=None, on_progress=None):
+        self.jobs.append(name)
+
+class Controller:
+    """The parts of main.StateController a scheduled update check uses."""
+    def __init__(self):
+        self.network = Network()
+        self.selected_character = 0
+        self.seeded = []
+        self.state = None
+
+    def seed_firmware(self, manifest):
+        self.seeded.append(manifest['version'])
+
+    async def switch_to(self, state):
+        self.state = state
+
+class ScheduledCheckSeedingTest(unittest.TestCase):
+    def setUp(self):
+        # The check hashes the firmware files in the repository, as installed
+        files = {name: netota.file_sha256(name) for name in ('main.py', 'config.py')}
+        self.manifest = {'version': CURRENT_VERSION, 'url': 'https://example.com/fw/main.py',
+                         'files': files, 'sha256': files['main.py']}
+        self.force_update = netota.FORCE_UPDATE
+        self.controller = Controller()
+
+    def tearDown(self):
+        netota.FORCE_UPDATE = self.force_update
+
+    def check(self):
+        """Run the scheduled check's decision on self.manifest."""
+        state = netota.UpdateState(self.controller, scheduled=True)
+        state._version_checked(self.manifest)
+        state._version_check_start_time = time.ticks_add(time.ticks_ms(), -2000)
+        asyncio.run(state._handle_version_check())
+
+    def test_matching_firmware_is_seeded_even_when_forced(self):
+        for force in (False, True):
+            netota.FORCE_UPDATE = force
+            self.check()
+        self.assertEqual(self.controller.seeded, [CURRENT_VERSION, CURRENT_VERSION])
+        self.assertEqual(self.controller.network.jobs, [])
+
+    def test_changed_firmware_is_downloaded_when_forced(self):
+        netota.FORCE_UPDATE = True
+        self.manifest['files']['config.py'] = '0' * 64
+        self.check()
+        self.assertEqual(self.controller.seeded, [])
+        self.assertEqual(self.controller.network.jobs, ['firmware'])
+
+if __name__ == '__main__':
+    unittest.main()